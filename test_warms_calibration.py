@@ -0,0 +1,21 @@
+"""Test della calibrazione del modello (python -m pytest)."""
+import numpy as np
+
+from warms_calibration import CalibrationRun, calibrate
+from warms_core import MotorConfig
+
+
+def test_run_rms_follows_input_order():
+    """Con prove miste acqua e aria gli scarti restano nell'ordine delle prove"""
+    runs = []
+    for i, (air, pressure) in enumerate([(True, 4.0), (False, 5.0), (True, 6.0), (False, 3.5)]):
+        config = MotorConfig(pressure=pressure, include_air_phase=air)
+        t, thrust, _ = config.thrust_curve()
+        # La prova 0 è registrata con una scala di spinta diversa solo nella prima metà
+        if i == 0:
+            thrust = np.where(t < t[-1] / 2, thrust * 1.5, thrust)
+        runs.append(CalibrationRun(config, t, thrust))
+    result = calibrate(runs)
+    assert len(result.run_rms) == len(runs)
+    assert np.argmax(result.run_rms) == 0
+    assert result.run_rms[0] > 5 * result.run_rms[1:].max()
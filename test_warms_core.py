@@ -0,0 +1,35 @@
+"""Test del nucleo di calcolo (python -m pytest)."""
+import itertools
+
+import numpy as np
+import pytest
+
+from warms_core import PARAM_RANGES, CurveResult, calculate_thrust_curve, thrust_curve_adaptive
+
+# Vertici degli intervalli degli slider e configurazioni tipiche (L, %, bar, mm)
+CONFIGS = list(itertools.product(*(PARAM_RANGES[name] for name in
+                                   ('bottle_volume', 'water_ratio', 'pressure', 'nozzle_diameter'))))
+CONFIGS += [(2.0, 33.0, 3.0, 8.0), (2.0, 33.0, 6.0, 8.0), (1.5, 50.0, 4.5, 9.0), (0.6, 40.0, 9.4, 10.2)]
+
+# Campionamento a passo fisso abbastanza fitto da fare da riferimento
+REFERENCE_SAMPLING = (100000, 100000)
+
+
+@pytest.mark.parametrize('include_air_phase', [False, True])
+@pytest.mark.parametrize('rtol', [1e-3, 1e-4])
+def test_adaptive_matches_fixed_model(rtol, include_air_phase):
+    """L'integrazione adattiva risolve lo stesso modello del passo fisso: concordano entro rtol"""
+    for config in CONFIGS:
+        adaptive = CurveResult(*thrust_curve_adaptive(*config, include_air_phase, rtol=rtol))
+        fixed = CurveResult(*calculate_thrust_curve(*config, include_air_phase, sampling=REFERENCE_SAMPLING))
+        for name in ('total_impulse', 'water_impulse', 'peak_thrust'):
+            assert getattr(adaptive, name) == pytest.approx(getattr(fixed, name), rel=rtol, abs=1e-9), (config, name)
+        assert adaptive.water_end_time == pytest.approx(fixed.water_end_time, rel=1e-12)
+        # Il campionamento fisso chiude la combustione sul primo campione dopo lo spegnimento
+        assert adaptive.burn_time == pytest.approx(fixed.burn_time, rel=1e-3), config
+
+
+def test_adaptive_uses_fewer_points():
+    t, thrust, _ = thrust_curve_adaptive(2.0, 33.0, 6.0, 8.0, True)
+    assert len(t) < 500
+    assert np.all(np.diff(t) >= 0)
@@ -0,0 +1,16 @@
+"""Test del progetto inverso (python -m pytest)."""
+import pytest
+
+from warms_core import CurveResult
+from warms_design import design
+
+
+@pytest.mark.parametrize('include_air_phase', [False, True])
+def test_average_thrust_matches_curve_result(include_air_phase):
+    """La spinta media dei risultati è quella del motore esportato"""
+    results = design({'average_thrust': 30}, include_air_phase=include_air_phase, n_results=3)
+    for result in results:
+        curve = CurveResult(*result.config.thrust_curve())
+        assert result.average_thrust == pytest.approx(curve.average_thrust, rel=1e-9)
+        assert result.total_impulse == pytest.approx(curve.total_impulse, rel=1e-9)
+    assert results[0].average_thrust == pytest.approx(30, rel=0.05)
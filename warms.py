@@ -1,81 +1,217 @@
+import os
+import sys
+import time
+_STARTUP_NS = time.perf_counter_ns()  # Inizio dell'avvio, per la misura del tempo fino all'interattività
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
+from tkinter import ttk, filedialog, messagebox, simpledialog
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from datetime import datetime
+# matplotlib (e warms_plot, che lo usa) viene importato solo alla creazione del grafico
+from warms_cache import CurveCache
+from warms_calibration import CalibrationRun, calibrate, load_profiles, save_profile
+from warms_core import IMPULSE_CLASS_BOUNDARIES, SAMPLING_PROFILES, MotorConfig, calculate_thrust_curve, get_impulse_class, write_rasp, write_rasp_library
+from warms_design import DESIGN_PARAMS, design
+from warms_explorer import EXPLORER_METRICS, EXPLORER_PARAMS, HeatmapCache
+from warms_flight import DRAG_COEFFICIENT, config_flight
+from warms_library import INDEX_FILE_NAME, MotorLibrary
+from warms_loadcell import import_log
+from warms_montecarlo import DEFAULT_SAMPLES, DEFAULT_TOLERANCES, Tolerance, monte_carlo
+from warms_store import CurveStore
+from warms_trace import Tracer, span
+from warms_worker import BackgroundWorker
+
+# Ritardo di ricalcolo dell'anteprima durante il trascinamento degli slider
+PREVIEW_DELAY_MS = 30
+# Intervallo di controllo dei risultati dei calcoli in background
+WORKER_POLL_MS = 50
+# Righe mostrate al massimo nella finestra della libreria motori
+MAX_LIBRARY_ROWS = 500
+# Estensioni dei log binari delle prove statiche (float32, un canale)
+BINARY_LOG_EXTENSIONS = ('.bin', '.dat', '.raw')
+
+
+def italian_texts():
+    """Testi dell'interfaccia in italiano"""
+    return {
+        'title': "WaRMS - Simulatore Motore Razzo ad Acqua",
+        'motor_params': "Parametri Motore",
+        'length': "Lunghezza",
+        'diameter': "Diametro", 
+        'bottle_mass': "Massa bottiglia",
+        'operational_params': "Parametri Operativi",
+        'pressure': "Pressione",
+        'water_ratio': "Rapporto Acqua (%)",
+        'nozzle_diameter': "Diametro Ugello",
+        'bottle_volume': "Volume Bottiglia",
+        'options': "Opzioni",
+        'include_air_phase': "Includi fase ad aria",
+        'live_preview': "Anteprima dal vivo",
+        'unit_system': "Sistema unità:",
+        'integration': "Integrazione:",
+        'accuracy': "Precisione:",
+        'metric': "Metrico",
+        'imperial': "Imperiale", 
+        'language': "Lingua:",
+        'calculate': "Calcola",
+        'clear_all': "Cancella Tutto",
+        'export_rasp': "Esporta RASP",
+        'export_all': "Esporta Tutte",
+        'rasp_tolerance': "Riduzione RASP (%):",
+        'cancel': "Annulla",
+        'monte_carlo': "Monte Carlo",
+        'motor_library': "Libreria Motori",
+        'impulse_class': "Classe:",
+        'name_filter': "Nome:",
+        'search': "Cerca",
+        'overlay': "Sovrapponi",
+        'import_log': "Importa Prova",
+        'measured': "misurato",
+        'sample_rate': "Frequenza di campionamento (Hz):",
+        'calibrate': "Calibra",
+        'profile': "Profilo:",
+        'no_logs': "Nessuna prova importata. Importa prima il log di una prova statica.",
+        'profile_name': "Errore residuo {rms:.1%}. Nome del profilo:",
+        'design': "Progetto Inverso",
+        'targets': "Obiettivi",
+        'total_impulse': "Impulso totale",
+        'average_thrust': "Spinta media",
+        'burn_time': "Tempo di combustione (s)",
+        'bounds': "Intervalli ammessi (min - max)",
+        'apply': "Applica",
+        'flight': "Simula volo, Cd:",
+        'save_session': "Salva Sessione",
+        'open_session': "Apri Sessione",
+        'explorer': "Mappa Parametri",
+        'x_axis': "Asse X:",
+        'y_axis': "Asse Y:",
+        'explorer_metric': "Grandezza:",
+        'peak_thrust': "Spinta massima",
+        'export_trace': "Esporta Traccia",
+        'mc_samples': "Campioni MC:",
+        'mc_tolerances': "Tolleranze σ (%):",
+        'thrust_chart': "Curva di Spinta Razzo ad Acqua",
+        'time_ms': "Tempo (ms)",
+        'thrust_n': "Spinta (N)",
+        'time_s': "Tempo (s)",
+        'thrust_lbf': "Spinta (lbf)",
+        'export_success': "File esportato con successo!",
+        'no_data': "Nessun dato da esportare. Calcola prima una curva.",
+        'water_phase': "Fase Acqua",
+        'air_phase': "Fase Aria",
+        'total': "Totale"
+    }
+
+
+def english_texts():
+    """Testi dell'interfaccia in inglese"""
+    return {
+        'title': "WaRMS - Water Rocket Motor Simulator",
+        'motor_params': "Motor Parameters",
+        'length': "Length",
+        'diameter': "Diameter",
+        'bottle_mass': "Bottle mass", 
+        'operational_params': "Operational Parameters",
+        'pressure': "Pressure",
+        'water_ratio': "Water Ratio (%)",
+        'nozzle_diameter': "Nozzle Diameter",
+        'bottle_volume': "Bottle Volume",
+        'options': "Options",
+        'include_air_phase': "Include air phase",
+        'live_preview': "Live preview",
+        'unit_system': "Unit system:",
+        'integration': "Integration:",
+        'accuracy': "Accuracy:",
+        'metric': "Metric",
+        'imperial': "Imperial",
+        'language': "Language:",
+        'calculate': "Calculate", 
+        'clear_all': "Clear All",
+        'export_rasp': "Export RASP",
+        'export_all': "Export All",
+        'rasp_tolerance': "RASP reduction (%):",
+        'cancel': "Cancel",
+        'monte_carlo': "Monte Carlo",
+        'motor_library': "Motor Library",
+        'impulse_class': "Class:",
+        'name_filter': "Name:",
+        'search': "Search",
+        'overlay': "Overlay",
+        'import_log': "Import Test Log",
+        'measured': "measured",
+        'sample_rate': "Sample rate (Hz):",
+        'calibrate': "Calibrate",
+        'profile': "Profile:",
+        'no_logs': "No test logs imported. Import a static test log first.",
+        'profile_name': "Residual error {rms:.1%}. Profile name:",
+        'design': "Inverse Design",
+        'targets': "Targets",
+        'total_impulse': "Total impulse",
+        'average_thrust': "Average thrust",
+        'burn_time': "Burn time (s)",
+        'bounds': "Allowed ranges (min - max)",
+        'apply': "Apply",
+        'flight': "Simulate flight, Cd:",
+        'save_session': "Save Session",
+        'open_session': "Open Session",
+        'explorer': "Design Space",
+        'x_axis': "X axis:",
+        'y_axis': "Y axis:",
+        'explorer_metric': "Metric:",
+        'peak_thrust': "Peak thrust",
+        'export_trace': "Export Trace",
+        'mc_samples': "MC samples:",
+        'mc_tolerances': "Tolerances σ (%):",
+        'thrust_chart': "Water Rocket Thrust Curve",
+        'time_ms': "Time (ms)",
+        'thrust_n': "Thrust (N)",
+        'time_s': "Time (s)", 
+        'thrust_lbf': "Thrust (lbf)",
+        'export_success': "File exported successfully!",
+        'no_data': "No data to export. Calculate a curve first.",
+        'water_phase': "Water Phase",
+        'air_phase': "Air Phase", 
+        'total': "Total"
+    }
+
+
+class LazyTranslations(dict):
+    """Tabelle dei testi per lingua, costruite dalla rispettiva funzione solo quando servono"""
+
+    def __init__(self, builders):
+        super().__init__()
+        self.builders = builders
+
+    def __missing__(self, language):
+        table = self[language] = self.builders[language]()
+        return table
+
 
 class WaterRocketSimulator:
-    def __init__(self, root):
+    def __init__(self, root, report_startup=False):
         self.root = root
-        self.curves = []
-        self.impulses = []
-        
-        # Sistema di internazionalizzazione
-        self.translations = {
-            'it': {
-                'title': "WaRMS - Simulatore Motore Razzo ad Acqua",
-                'motor_params': "Parametri Motore",
-                'length': "Lunghezza",
-                'diameter': "Diametro", 
-                'bottle_mass': "Massa bottiglia",
-                'operational_params': "Parametri Operativi",
-                'pressure': "Pressione",
-                'water_ratio': "Rapporto Acqua (%)",
-                'nozzle_diameter': "Diametro Ugello",
-                'bottle_volume': "Volume Bottiglia",
-                'options': "Opzioni",
-                'include_air_phase': "Includi fase ad aria",
-                'unit_system': "Sistema unità:",
-                'metric': "Metrico",
-                'imperial': "Imperiale", 
-                'language': "Lingua:",
-                'calculate': "Calcola",
-                'clear_all': "Cancella Tutto",
-                'export_rasp': "Esporta RASP",
-                'thrust_chart': "Curva di Spinta Razzo ad Acqua",
-                'time_ms': "Tempo (ms)",
-                'thrust_n': "Spinta (N)",
-                'time_s': "Tempo (s)",
-                'thrust_lbf': "Spinta (lbf)",
-                'export_success': "File esportato con successo!",
-                'no_data': "Nessun dato da esportare. Calcola prima una curva.",
-                'water_phase': "Fase Acqua",
-                'air_phase': "Fase Aria",
-                'total': "Totale"
-            },
-            'en': {
-                'title': "WaRMS - Water Rocket Motor Simulator",
-                'motor_params': "Motor Parameters",
-                'length': "Length",
-                'diameter': "Diameter",
-                'bottle_mass': "Bottle mass", 
-                'operational_params': "Operational Parameters",
-                'pressure': "Pressure",
-                'water_ratio': "Water Ratio (%)",
-                'nozzle_diameter': "Nozzle Diameter",
-                'bottle_volume': "Bottle Volume",
-                'options': "Options",
-                'include_air_phase': "Include air phase",
-                'unit_system': "Unit system:",
-                'metric': "Metric",
-                'imperial': "Imperial",
-                'language': "Language:",
-                'calculate': "Calculate", 
-                'clear_all': "Clear All",
-                'export_rasp': "Export RASP",
-                'thrust_chart': "Water Rocket Thrust Curve",
-                'time_ms': "Time (ms)",
-                'thrust_n': "Thrust (N)",
-                'time_s': "Time (s)", 
-                'thrust_lbf': "Thrust (lbf)",
-                'export_success': "File exported successfully!",
-                'no_data': "No data to export. Calculate a curve first.",
-                'water_phase': "Water Phase",
-                'air_phase': "Air Phase", 
-                'total': "Total"
-            }
-        }
+        
+        # Tempi delle fasi delle operazioni, per la barra di stato e l'export della traccia;
+        # l'avvio è misurato dall'importazione del modulo fino al grafico pronto
+        self.tracer = Tracer(origin=_STARTUP_NS)
+        self.startup = self.tracer.operation('startup', start=_STARTUP_NS)
+        self.startup.add('imports', _STARTUP_NS, time.perf_counter_ns())
+        self.report_startup = report_startup
+        self.time_to_interactive = None
+        self.curve_store = CurveStore()  # Curve calcolate con configurazione e grandezze, per l'export
+        self.curve_rows = []  # Indice nell'archivio di ogni riga dell'elenco (None se non archiviata)
+        self.test_logs = []  # (MotorConfig, log) delle prove importate, per la calibrazione
+        self.motor_library = None
+        self.library_window = None
+        self.design_window = None
+        self.design_results = []
+        self.explorer_window = None
+        self.explorer_grid = None  # Griglia mostrata nella mappa dello spazio di progetto
+        self.heatmap_cache = HeatmapCache()
+        self._explorer_job = None
+        self._explorer_update = None
+        self.profiles = load_profiles()  # Coefficienti del modello calibrati, per nome
+        
+        # Sistema di internazionalizzazione: le tabelle dei testi si costruiscono alla prima richiesta
+        self.translations = LazyTranslations({'it': italian_texts, 'en': english_texts})
         
         # Stato dell'applicazione
         self.current_language = 'it'
@@ -90,13 +226,21 @@ class WaterRocketSimulator:
             'thrust': {'metric_to_imperial': 0.224809, 'imperial_to_metric': 4.44822}  # N <-> lbf
         }
         
-        self.setup_ui()
-        self.update_language()
+        # Cache delle curve calcolate (persistente se WARMS_CACHE_DIR è impostata)
+        self.curve_cache = CurveCache(directory=os.environ.get('WARMS_CACHE_DIR'))
+        
+        # Calcoli in background: i risultati arrivano tramite root.after
+        self.worker = BackgroundWorker()
+        self._poll_job = None
+        
+        with self.startup.span('controls'):
+            self.setup_ui()
+            self.update_language()
+        
+        # Il grafico si crea appena la finestra con i controlli è visibile
+        self._controls_ready = time.perf_counter_ns()
+        self.root.after_idle(self.window_shown)
         
-        # Memorizza l'ultima curva calcolata per l'export
-        self.last_time = None
-        self.last_thrust = None
-        self.last_water_time = None  # Tempo fine fase acqua
         
     def get_text(self, key):
         """Ottiene il testo tradotto per la lingua corrente"""
@@ -163,12 +307,23 @@ class WaterRocketSimulator:
         self.options_frame.grid(row=2, column=0, sticky="EW", padx=5, pady=5)
         
         self.include_air_phase_var = tk.BooleanVar(value=False)
+        self.live_preview_var = tk.BooleanVar(value=True)
+        self.rasp_tolerance_var = tk.DoubleVar(value=0.0)
+        self.profile_var = tk.StringVar(value='')
+        self.flight_var = tk.BooleanVar(value=False)
+        self.drag_coefficient_var = tk.DoubleVar(value=DRAG_COEFFICIENT)
+        self.mc_samples_var = tk.IntVar(value=DEFAULT_SAMPLES)
+        self.mc_tolerance_vars = {name: tk.DoubleVar(value=tolerance.spread * 100)
+                                  for name, tolerance in DEFAULT_TOLERANCES.items()}
+        self._preview_job = None
+        self._preview_background = None
         
         self.create_motor_params_widgets()
         self.create_operational_params_widgets() 
         self.create_options_widgets()
         self.create_buttons()
         self.create_plot()
+        self.create_status_bar()
         
     def create_motor_params_widgets(self):
         # Parametri bottiglia con Entry
@@ -231,9 +386,16 @@ class WaterRocketSimulator:
     def create_options_widgets(self):
         # Checkbox fase aria
         self.include_air_phase_check = ttk.Checkbutton(self.options_frame, text="Include air phase",
-                                                     variable=self.include_air_phase_var)
+                                                     variable=self.include_air_phase_var,
+                                                     command=self.params_changed)
         self.include_air_phase_check.grid(row=0, column=0, sticky="W", padx=5, pady=5)
         
+        # Checkbox anteprima dal vivo
+        self.live_preview_check = ttk.Checkbutton(self.options_frame, text="Live preview",
+                                                variable=self.live_preview_var,
+                                                command=self.toggle_preview)
+        self.live_preview_check.grid(row=1, column=0, sticky="W", padx=5, pady=5)
+        
         # Selezione lingua
         self.language_label = ttk.Label(self.options_frame, text="Language:")
         self.language_label.grid(row=0, column=1, sticky="W", padx=(20,5))
@@ -252,6 +414,56 @@ class WaterRocketSimulator:
         units_combo.grid(row=0, column=4, padx=5)
         units_combo.bind('<<ComboboxSelected>>', self.change_units)
         
+        # Selezione metodo di integrazione
+        self.integration_label = ttk.Label(self.options_frame, text="Integration:")
+        self.integration_label.grid(row=0, column=5, sticky="W", padx=(20,5))
+        self.integration_var = tk.StringVar(value='fixed')
+        integration_combo = ttk.Combobox(self.options_frame, textvariable=self.integration_var,
+                                       values=['fixed', 'adaptive'], width=8, state='readonly')
+        integration_combo.grid(row=0, column=6, padx=5)
+        integration_combo.bind('<<ComboboxSelected>>', self.schedule_preview)
+        
+        # Precisione del campionamento a passo fisso (profili di warms_convergence); l'anteprima usa sempre 'fast'
+        self.accuracy_label = ttk.Label(self.options_frame, text="Accuracy:")
+        self.accuracy_label.grid(row=2, column=5, sticky="W", padx=(20,5))
+        self.accuracy_var = tk.StringVar(value='accurate')
+        ttk.Combobox(self.options_frame, textvariable=self.accuracy_var, values=list(SAMPLING_PROFILES),
+                     width=8, state='readonly').grid(row=2, column=6, padx=5)
+        
+        # Parametri Monte Carlo: numero di campioni e tolleranze relative (deviazione standard)
+        self.mc_samples_label = ttk.Label(self.options_frame, text="MC samples:")
+        self.mc_samples_label.grid(row=1, column=1, sticky="W", padx=(20,5))
+        ttk.Entry(self.options_frame, textvariable=self.mc_samples_var, width=8).grid(row=1, column=2, padx=5)
+        self.mc_tolerances_label = ttk.Label(self.options_frame, text="Tolerances σ (%):")
+        self.mc_tolerances_label.grid(row=1, column=3, sticky="W", padx=(20,5))
+        tolerance_frame = ttk.Frame(self.options_frame)
+        tolerance_frame.grid(row=1, column=4, columnspan=3, sticky="W", padx=5)
+        symbols = {'pressure': 'P', 'water_ratio': 'W', 'cd': 'Cd', 'air_efficiency': 'ηA'}
+        for column, (name, var) in enumerate(self.mc_tolerance_vars.items()):
+            ttk.Label(tolerance_frame, text=symbols[name]).grid(row=0, column=2*column, padx=(5,2))
+            ttk.Entry(tolerance_frame, textvariable=var, width=5).grid(row=0, column=2*column + 1)
+        
+        # Riduzione dei punti nei file RASP (% della spinta massima, 0 = tutti i punti)
+        rasp_frame = ttk.Frame(self.options_frame)
+        rasp_frame.grid(row=2, column=0, sticky="W", padx=5, pady=5)
+        self.rasp_tolerance_label = ttk.Label(rasp_frame, text="RASP reduction (%):")
+        self.rasp_tolerance_label.grid(row=0, column=0, sticky="W")
+        ttk.Entry(rasp_frame, textvariable=self.rasp_tolerance_var, width=5).grid(row=0, column=1, padx=5)
+        
+        # Profilo di coefficienti del modello (vuoto = valori predefiniti)
+        self.profile_label = ttk.Label(self.options_frame, text="Profile:")
+        self.profile_label.grid(row=2, column=1, sticky="W", padx=(20,5))
+        self.profile_combo = ttk.Combobox(self.options_frame, textvariable=self.profile_var, width=12,
+                                          values=[''] + sorted(self.profiles), state='readonly')
+        self.profile_combo.grid(row=2, column=2, padx=5)
+        self.profile_combo.bind('<<ComboboxSelected>>', self.params_changed)
+        
+        # Simulazione del volo: apogeo nell'elenco delle curve (massa e diametro della bottiglia)
+        self.flight_check = ttk.Checkbutton(self.options_frame, text="Simulate flight, Cd:",
+                                            variable=self.flight_var)
+        self.flight_check.grid(row=2, column=3, sticky="W", padx=(20,5))
+        ttk.Entry(self.options_frame, textvariable=self.drag_coefficient_var, width=8).grid(row=2, column=4, padx=5)
+        
     def create_buttons(self):
         # Frame pulsanti
         button_frame = ttk.Frame(self.root)
@@ -263,21 +475,164 @@ class WaterRocketSimulator:
         self.clear_button.grid(row=0, column=1, padx=5)
         self.export_button = ttk.Button(button_frame, text="Export RASP", command=self.export_rasp)
         self.export_button.grid(row=0, column=2, padx=5)
+        self.export_all_button = ttk.Button(button_frame, text="Export All", command=self.export_all_rasp)
+        self.export_all_button.grid(row=0, column=3, padx=5)
+        self.monte_carlo_button = ttk.Button(button_frame, text="Monte Carlo", command=self.calculate_monte_carlo)
+        self.monte_carlo_button.grid(row=0, column=4, padx=5)
+        self.library_button = ttk.Button(button_frame, text="Motor Library", command=self.open_library)
+        self.library_button.grid(row=0, column=5, padx=5)
+        self.import_log_button = ttk.Button(button_frame, text="Import Test Log", command=self.import_test_log)
+        self.import_log_button.grid(row=0, column=6, padx=5)
+        self.calibrate_button = ttk.Button(button_frame, text="Calibrate", command=self.calibrate_model)
+        self.calibrate_button.grid(row=0, column=7, padx=5)
+        self.design_button = ttk.Button(button_frame, text="Inverse Design", command=self.open_design)
+        self.design_button.grid(row=0, column=8, padx=5)
+        self.save_session_button = ttk.Button(button_frame, text="Save Session", command=self.save_session)
+        self.save_session_button.grid(row=0, column=9, padx=5)
+        self.open_session_button = ttk.Button(button_frame, text="Open Session", command=self.open_session)
+        self.open_session_button.grid(row=0, column=10, padx=5)
+        self.explorer_button = ttk.Button(button_frame, text="Design Space", command=self.open_explorer)
+        self.explorer_button.grid(row=0, column=11, padx=5)
+        
+        # Avanzamento e annullamento dei calcoli in background
+        self.progress_bar = ttk.Progressbar(button_frame, mode='determinate', maximum=1.0, length=150)
+        self.progress_bar.grid(row=0, column=12, padx=(20,5))
+        self.cancel_button = ttk.Button(button_frame, text="Cancel", command=self.cancel_jobs, state='disabled')
+        self.cancel_button.grid(row=0, column=13, padx=5)
         
     def create_plot(self):
-        # Setup grafico
-        self.fig, self.ax = plt.subplots(figsize=(10, 6))
-        canvas_frame = ttk.Frame(self.root)
+        # Area del grafico: la figura viene creata da ensure_plot, l'elenco delle curve subito
+        self.fig = None
+        canvas_frame = self.canvas_frame = ttk.Frame(self.root)
         canvas_frame.grid(row=3, column=0, sticky="NSEW", padx=10, pady=5)
         self.root.rowconfigure(3, weight=1)
         
-        self.canvas = FigureCanvasTkAgg(self.fig, master=canvas_frame)
-        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        # Elenco compatto delle curve al posto della legenda (il Listbox disegna solo le righe visibili)
+        list_frame = ttk.Frame(canvas_frame)
+        list_frame.pack(side=tk.RIGHT, fill=tk.Y)
+        self.curve_list = tk.Listbox(list_frame, width=45, activestyle='none', exportselection=False)
+        curve_scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.curve_list.yview)
+        self.curve_list.config(yscrollcommand=curve_scrollbar.set)
+        curve_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.curve_list.pack(side=tk.LEFT, fill=tk.Y)
+        self.curve_list.bind('<<ListboxSelect>>', self.select_curve)
+        
+    def window_shown(self):
+        """Prima pausa dell'interfaccia dopo l'avvio: i controlli sono visibili e utilizzabili"""
+        now = time.perf_counter_ns()
+        self.startup.add('window', self._controls_ready, now)
+        self.time_to_interactive = (now - _STARTUP_NS) / 1e9
+        self.root.after(0, self.finish_startup)
+        
+    def finish_startup(self):
+        """Crea il grafico e conclude la misura dell'avvio"""
+        self.ensure_plot()
+        self.finish_operation(self.startup)
+        if self.report_startup:
+            print(f"time to interactive: {self.time_to_interactive * 1000:.0f} ms")
+            print(self.startup.summary())
+            self.root.destroy()
+        
+    def ensure_plot(self):
+        """Importa matplotlib e crea la figura alla prima richiesta"""
+        if self.fig is not None:
+            return
+        with self.startup.span('plot'):
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+            from matplotlib.figure import Figure
+            from warms_plot import CurvePlot
+            
+            self.fig = Figure(figsize=(10, 6))
+            self.ax = self.fig.add_subplot()
+            self.canvas = FigureCanvasTkAgg(self.fig, master=self.canvas_frame)
+            self.canvas.get_tk_widget().pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+            self.ax.grid(True)
+            
+            # Tutte le curve calcolate in un'unica collezione di linee
+            self.curve_plot = CurvePlot(self.ax)
+            
+            # Curva di anteprima: animata, viene ridisegnata con il blitting
+            self.preview_line, = self.ax.plot([], [], color='gray', linestyle=':', linewidth=1.5,
+                                              animated=True, label='_preview')
+            self.preview_line.set_visible(self.live_preview_var.get())
+            self.canvas.mpl_connect('draw_event', self.on_draw)
+            self.update_plot_labels()
+            self.canvas.draw()
+        
+    def create_status_bar(self):
+        # Tempi dell'ultima operazione, per fasi, e export della traccia completa
+        status_frame = ttk.Frame(self.root, padding=(10, 0, 10, 5))
+        status_frame.grid(row=4, column=0, sticky="EW")
+        self.status_label = ttk.Label(status_frame, text="", anchor=tk.W)
+        self.status_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.export_trace_button = ttk.Button(status_frame, text="Export Trace", command=self.export_trace)
+        self.export_trace_button.pack(side=tk.RIGHT)
+        
+    def on_draw(self, event=None):
+        """Salva lo sfondo per il blitting dopo ogni ridisegno completo"""
+        self._preview_background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.blit_preview()
+        
+    def blit_preview(self):
+        """Ridisegna solo la curva di anteprima sopra lo sfondo salvato"""
+        if self._preview_background is None:
+            return
+        self.canvas.restore_region(self._preview_background)
+        if self.preview_line.get_visible():
+            self.ax.draw_artist(self.preview_line)
+        self.canvas.blit(self.ax.bbox)
+        
+    def params_changed(self, event=None):
+        """Aggiorna anteprima e mappa dello spazio di progetto dopo la modifica di un parametro"""
+        self.schedule_preview()
+        self.schedule_explorer()
+        
+    def schedule_preview(self, event=None):
+        """Programma il ricalcolo dell'anteprima, accorpando le richieste ravvicinate"""
+        if not self.live_preview_var.get():
+            return
+        if self._preview_job is not None:
+            self.root.after_cancel(self._preview_job)
+        self._preview_job = self.root.after(PREVIEW_DELAY_MS, self.update_preview)
+        
+    def toggle_preview(self):
+        """Attiva o nasconde l'anteprima dal vivo"""
+        self.ensure_plot()
+        self.preview_line.set_visible(self.live_preview_var.get())
+        if self.live_preview_var.get():
+            self.schedule_preview()
+        else:
+            self.blit_preview()
         
-        self.ax.set_xlabel('Time (ms)')
-        self.ax.set_ylabel('Thrust (N)')
-        self.ax.set_title('Water Rocket Thrust Curve')
-        self.ax.grid(True)
+    def update_preview(self):
+        """Ricalcola la curva di anteprima con i valori correnti degli slider"""
+        self.ensure_plot()
+        self._preview_job = None
+        values = self.get_metric_values()
+        t, thrust, _ = self.calculate_thrust_curve(
+            bottle_volume=values['bottle_volume'],
+            water_ratio=self.water_ratio_var.get(),
+            pressure=values['pressure'],
+            nozzle_diameter=values['nozzle_diameter'],
+            include_air_phase=self.include_air_phase_var.get(),
+            method=self.integration_var.get(),
+            coefficients=self.get_coefficients(),
+            sampling='fast'
+        )
+        if self.current_units == 'imperial':
+            thrust *= self.convert_value(1.0, 'thrust', False)  # N -> lbf, sull'array appena calcolato
+        self.preview_line.set_data(t, thrust)
+        
+        # Ridisegno completo solo se l'anteprima esce dai limiti del grafico
+        x_max, y_max = t[-1], np.max(thrust)
+        x_low, x_high = self.ax.get_xlim()
+        y_low, y_high = self.ax.get_ylim()
+        if x_max > x_high or y_max > y_high:
+            self.ax.set_xlim(x_low, max(x_high, x_max * 1.2), auto=None)
+            self.ax.set_ylim(y_low, max(y_high, y_max * 1.2), auto=None)
+            self.canvas.draw_idle()
+        else:
+            self.blit_preview()
         
     def change_language(self, event=None):
         """Cambia la lingua dell'interfaccia"""
@@ -318,45 +673,75 @@ class WaterRocketSimulator:
             
     def update_language(self):
         """Aggiorna tutti i testi dell'interfaccia"""
-        self.root.title(self.get_text('title'))
+        with self.tracer.operation('update_language') as operation:
+            with span('widgets'):
+                self.root.title(self.get_text('title'))
+        
+                # Aggiorna etichette frame
+                self.motor_frame.config(text=self.get_text('motor_params'))
+                self.params_frame.config(text=self.get_text('operational_params'))
+                self.options_frame.config(text=self.get_text('options'))
+        
+                # Aggiorna etichette parametri motore
+                self.length_label.config(text=f"{self.get_text('length')} ({self.get_unit_label('length')}):")
+                self.diameter_label.config(text=f"{self.get_text('diameter')} ({self.get_unit_label('length')}):")
+                self.bottle_mass_label.config(text=f"{self.get_text('bottle_mass')} ({self.get_unit_label('mass')}):")
+        
+                # Aggiorna etichette parametri operativi
+                self.pressure_label.config(text=f"{self.get_text('pressure')} ({self.get_unit_label('pressure')}):")
+                self.water_ratio_label.config(text=self.get_text('water_ratio'))
+                self.nozzle_diameter_label.config(text=f"{self.get_text('nozzle_diameter')} ({self.get_unit_label('length')}):")
+                self.bottle_volume_label.config(text=f"{self.get_text('bottle_volume')} ({self.get_unit_label('volume')}):")
+        
+                # Aggiorna opzioni
+                self.include_air_phase_check.config(text=self.get_text('include_air_phase'))
+                self.live_preview_check.config(text=self.get_text('live_preview'))
+                self.language_label.config(text=self.get_text('language'))
+                self.units_label.config(text=self.get_text('unit_system'))
+                self.integration_label.config(text=self.get_text('integration'))
+                self.accuracy_label.config(text=self.get_text('accuracy'))
+                self.mc_samples_label.config(text=self.get_text('mc_samples'))
+                self.mc_tolerances_label.config(text=self.get_text('mc_tolerances'))
+                self.rasp_tolerance_label.config(text=self.get_text('rasp_tolerance'))
+                self.profile_label.config(text=self.get_text('profile'))
+                self.flight_check.config(text=self.get_text('flight'))
+        
+                # Aggiorna pulsanti
+                self.calculate_button.config(text=self.get_text('calculate'))
+                self.clear_button.config(text=self.get_text('clear_all'))
+                self.export_button.config(text=self.get_text('export_rasp'))
+                self.export_all_button.config(text=self.get_text('export_all'))
+                self.monte_carlo_button.config(text=self.get_text('monte_carlo'))
+                self.library_button.config(text=self.get_text('motor_library'))
+                self.import_log_button.config(text=self.get_text('import_log'))
+                self.calibrate_button.config(text=self.get_text('calibrate'))
+                self.design_button.config(text=self.get_text('design'))
+                self.save_session_button.config(text=self.get_text('save_session'))
+                self.open_session_button.config(text=self.get_text('open_session'))
+                self.explorer_button.config(text=self.get_text('explorer'))
+                self.cancel_button.config(text=self.get_text('cancel'))
+                self.export_trace_button.config(text=self.get_text('export_trace'))
+            
+            # Aggiorna grafico (se già creato)
+            if self.fig is not None:
+                with span('axes'):
+                    self.update_plot_labels()
+                with span('draw'):
+                    self.canvas.draw()
+            
+            # Aggiorna valori visualizzati
+            with span('values'):
+                self.update_all_labels()
+        self.finish_operation(operation)
         
-        # Aggiorna etichette frame
-        self.motor_frame.config(text=self.get_text('motor_params'))
-        self.params_frame.config(text=self.get_text('operational_params'))
-        self.options_frame.config(text=self.get_text('options'))
-        
-        # Aggiorna etichette parametri motore
-        self.length_label.config(text=f"{self.get_text('length')} ({self.get_unit_label('length')}):")
-        self.diameter_label.config(text=f"{self.get_text('diameter')} ({self.get_unit_label('length')}):")
-        self.bottle_mass_label.config(text=f"{self.get_text('bottle_mass')} ({self.get_unit_label('mass')}):")
-        
-        # Aggiorna etichette parametri operativi
-        self.pressure_label.config(text=f"{self.get_text('pressure')} ({self.get_unit_label('pressure')}):")
-        self.water_ratio_label.config(text=self.get_text('water_ratio'))
-        self.nozzle_diameter_label.config(text=f"{self.get_text('nozzle_diameter')} ({self.get_unit_label('length')}):")
-        self.bottle_volume_label.config(text=f"{self.get_text('bottle_volume')} ({self.get_unit_label('volume')}):")
-        
-        # Aggiorna opzioni
-        self.include_air_phase_check.config(text=self.get_text('include_air_phase'))
-        self.language_label.config(text=self.get_text('language'))
-        self.units_label.config(text=self.get_text('unit_system'))
-        
-        # Aggiorna pulsanti
-        self.calculate_button.config(text=self.get_text('calculate'))
-        self.clear_button.config(text=self.get_text('clear_all'))
-        self.export_button.config(text=self.get_text('export_rasp'))
-        
-        # Aggiorna grafico
+    def update_plot_labels(self):
+        """Titolo ed etichette degli assi del grafico nella lingua e nelle unità correnti"""
         time_unit = self.get_text('time_ms') if self.current_units == 'metric' else self.get_text('time_s')
         thrust_unit = self.get_text('thrust_n') if self.current_units == 'metric' else self.get_text('thrust_lbf')
         
         self.ax.set_xlabel(time_unit)
         self.ax.set_ylabel(thrust_unit)
         self.ax.set_title(self.get_text('thrust_chart'))
-        self.canvas.draw()
-        
-        # Aggiorna valori visualizzati
-        self.update_all_labels()
         
     def update_all_labels(self):
         """Aggiorna tutti i label dei valori"""
@@ -367,15 +752,19 @@ class WaterRocketSimulator:
         
     def update_pressure_label(self, value):
         self.pressure_value_label.config(text=f"{float(value):.1f}")
+        self.params_changed()
         
     def update_water_ratio_label(self, value):
         self.water_ratio_value_label.config(text=f"{float(value):.1f}")
+        self.params_changed()
         
     def update_nozzle_diameter_label(self, value):
         self.nozzle_diameter_value_label.config(text=f"{float(value):.2f}")
+        self.params_changed()
     
     def update_bottle_volume_label(self, value):
         self.bottle_volume_value_label.config(text=f"{float(value):.2f}")
+        self.params_changed()
         
     def get_metric_values(self):
         """Ottiene tutti i valori convertiti in unità metriche per i calcoli"""
@@ -398,211 +787,701 @@ class WaterRocketSimulator:
                 'bottle_mass': self.convert_value(self.bottle_mass_var.get(), 'mass', True)
             }
         
-    def calculate_thrust_curve(self, bottle_volume, water_ratio, pressure, nozzle_diameter, include_air_phase=False):
-        """Calcola la curva di spinta includendo opzionalmente la fase ad aria"""
-        # Conversione unità (assumendo input in unità metriche)
-        water_volume = bottle_volume * water_ratio/100
-        initial_pressure = pressure * 1e5 + 1e5  # bar -> Pa assoluti
-        nozzle_area = np.pi * (nozzle_diameter/2000)**2  # mm -> m
-        
-        # Costanti
-        gamma = 1.4  # Rapporto calore specifico aria
-        rho_water = 1000  # kg/m³
-        Cd = 0.95  # Coefficiente di scarico
-        
-        # FASE ACQUA: Calcolo tempo di esaurimento acqua
-        water_time = 0.5 * water_volume / (Cd * nozzle_area * np.sqrt(2 * rho_water * (initial_pressure - 1e5)))
-        
-        # Genera punti temporali per fase acqua
-        t_water = np.linspace(0, water_time, 500)
-        thrust_water = np.zeros_like(t_water)
-        
-        for i, time in enumerate(t_water):
-            # Calcola volume acqua rimanente
-            water_remaining = max(0, water_volume * (1 - time/water_time))
-            air_volume = bottle_volume - water_remaining
-            initial_air_volume = bottle_volume - water_volume
-            
-            # Pressione corrente (espansione adiabatica dell'aria)
-            if air_volume > 0 and initial_air_volume > 0:
-                current_pressure = initial_pressure * (initial_air_volume/air_volume)**gamma
-            else:
-                current_pressure = initial_pressure
-                
-            if water_remaining > 0 and current_pressure > 1e5:
-                # Velocità di uscita acqua
-                exit_velocity = Cd * np.sqrt(2 * (current_pressure - 1e5) / rho_water)
-                # Portata massica
-                mass_flow = Cd * nozzle_area * np.sqrt(2 * rho_water * (current_pressure - 1e5))
-                # Spinta
-                thrust_water[i] = mass_flow * exit_velocity
-        
-        if not include_air_phase:
-            return t_water * 1000, thrust_water, t_water[-1] * 1000  # tempo in ms
-        
-        # FASE ARIA: Continua con solo aria
-        # Pressione all'inizio della fase aria
-        air_start_pressure = initial_pressure * (initial_air_volume/bottle_volume)**gamma
-        
-        if air_start_pressure <= 1e5:  # Nessuna pressione residua
-            return t_water * 1000, thrust_water, t_water[-1] * 1000
-            
-        # Stima tempo fase aria (più conservativo)
-        # Tempo per espansione da pressione corrente a pressione atmosferica
-        air_time_estimate = 0.1  # secondi stimati per fase aria
+    def get_motor_config(self):
+        """Raccoglie i parametri correnti in una configurazione metrica"""
+        return MotorConfig(water_ratio=self.water_ratio_var.get(),
+                           include_air_phase=self.include_air_phase_var.get(),
+                           **self.get_metric_values())
         
-        t_air = np.linspace(0, air_time_estimate, 300)
-        thrust_air = np.zeros_like(t_air)
+    def get_coefficients(self):
+        """Coefficienti del modello del profilo selezionato (None = valori predefiniti)"""
+        return self.profiles.get(self.profile_var.get())
         
-        # Densità aria a pressione iniziale fase aria (approssimazione)
-        rho_air_initial = 1.225 * (air_start_pressure / 1e5)  # kg/m³
+    def get_sampling(self, method):
+        """Profilo di campionamento della precisione selezionata (None con l'integrazione adattiva)"""
+        return self.accuracy_var.get() if method == 'fixed' else None
         
-        for i, time in enumerate(t_air):
-            # Espansione adiabatica dell'aria nella bottiglia
-            # Pressione diminuisce man mano che l'aria esce
-            volume_ratio = 1 + time/air_time_estimate * 2  # Volume "virtuale" aumenta
-            current_pressure = air_start_pressure * (1/volume_ratio)**gamma
-            
-            if current_pressure > 1e5:
-                # Velocità di uscita aria (formula per flusso comprimibile)
-                pressure_ratio = current_pressure / 1e5
-                if pressure_ratio > 1.89:  # Flusso sonico critico
-                    exit_velocity = np.sqrt(gamma * 287 * 288)  # Velocità sonica ~340 m/s
-                else:
-                    exit_velocity = np.sqrt(2 * gamma / (gamma-1) * 287 * 288 * 
-                                          (1 - (1/pressure_ratio)**((gamma-1)/gamma)))
-                
-                # Densità aria all'uscita
-                rho_air_exit = 1.225 * (current_pressure / 1e5)
-                
-                # Portata massica aria
-                mass_flow = Cd * nozzle_area * rho_air_exit * exit_velocity
-                
-                # Spinta (con efficienza ridotta per fase aria)
-                thrust_air[i] = mass_flow * exit_velocity * 0.7  # Fattore di efficienza
-            else:
-                break
-                
-        # Combina le due fasi
-        t_total = np.concatenate([t_water, t_air + water_time])
-        thrust_total = np.concatenate([thrust_water, thrust_air])
-        
-        return t_total * 1000, thrust_total, water_time * 1000  # tempo in ms
+    def calculate_thrust_curve(self, bottle_volume, water_ratio, pressure, nozzle_diameter, include_air_phase=False,
+                               method='fixed', coefficients=None, sampling=None):
+        """Calcola la curva di spinta includendo opzionalmente la fase ad aria"""
+        return calculate_thrust_curve(bottle_volume, water_ratio, pressure, nozzle_diameter, include_air_phase,
+                                      method, coefficients=coefficients,
+                                      sampling=sampling if method == 'fixed' else None)
     
-    def calculate_curve(self):
-        """Calcola e visualizza la curva di spinta"""
-        # Ottieni valori in unità metriche per i calcoli
-        values = self.get_metric_values()
+    def run_job(self, function, *args, on_done=None, on_error=None, **kwargs):
+        """Esegue function(job, ...) in background e ne consegna il risultato all'interfaccia"""
+        if on_error is None:
+            on_error = lambda error: messagebox.showerror("Error", str(error))
+        job = self.worker.submit(function, *args, on_done=on_done, on_error=on_error, **kwargs)
+        self.cancel_button.config(state='normal')
+        if self._poll_job is None:
+            self._poll_job = self.root.after(WORKER_POLL_MS, self.poll_worker)
+        return job
+        
+    def poll_worker(self):
+        """Consegna i risultati dei calcoli e aggiorna la barra di avanzamento"""
+        self._poll_job = None
+        busy = self.worker.poll()
+        self.progress_bar.config(value=self.worker.progress if busy else 0.0)
+        if busy:
+            self._poll_job = self.root.after(WORKER_POLL_MS, self.poll_worker)
+        else:
+            self.cancel_button.config(state='disabled')
+            
+    def finish_operation(self, operation):
+        """Conclude un'operazione misurata e ne mostra i tempi per fase nella barra di stato"""
+        operation.finish()
+        self.status_label.config(text=operation.summary())
         
-        t, thrust, water_end_time = self.calculate_thrust_curve(
-            bottle_volume=values['bottle_volume'],
-            water_ratio=self.water_ratio_var.get(),
-            pressure=values['pressure'],
-            nozzle_diameter=values['nozzle_diameter'],
-            include_air_phase=self.include_air_phase_var.get()
+    def export_trace(self):
+        """Salva i tempi delle operazioni in formato JSON Trace Event (chrome://tracing, Perfetto)"""
+        file_name = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("Trace Event JSON", "*.json"), ("All Files", "*.*")]
         )
+        if not file_name:
+            return
+        self.run_job(lambda job: self.tracer.save(file_name),
+                     on_done=lambda result: messagebox.showinfo("Success", self.get_text('export_success')),
+                     on_error=lambda e: messagebox.showerror("Error", f"Export failed: {str(e)}"))
         
-        # Converti unità per visualizzazione se necessario
-        if self.current_units == 'imperial':
-            thrust = self.convert_value(thrust, 'thrust', False)  # N -> lbf
-            
-        # Calcola l'impulso totale
-        impulse = np.trapz(thrust, t/1000)  # Integrazione numerica
+    def cancel_jobs(self):
+        """Annulla i calcoli in background in corso"""
+        self.worker.cancel_all()
         
-        # Trova gli impulsi delle due fasi se inclusa fase aria
-        if self.include_air_phase_var.get():
-            water_mask = t <= water_end_time
-            water_impulse = np.trapz(thrust[water_mask], t[water_mask]/1000)
-            air_impulse = impulse - water_impulse
+    def calculate_curve(self):
+        """Calcola e visualizza la curva di spinta"""
+        # Configurazione in unità metriche; la legenda viene ricavata dall'archivio
+        config = self.get_motor_config()
+        method = self.integration_var.get()
+        sampling = self.get_sampling(method)
+        coefficients = self.get_coefficients()
+        profile = self.profile_var.get() if coefficients else ''
+        drag_coefficient = self.get_drag_coefficient()
+        operation = self.tracer.operation('calculate_curve')
+        
+        def compute(job):
+            with operation.activate():
+                return compute_curve()
+                
+        def compute_curve():
+            curve = self.curve_cache.curve(
+                bottle_volume=config.bottle_volume,
+                water_ratio=config.water_ratio,
+                pressure=config.pressure,
+                nozzle_diameter=config.nozzle_diameter,
+                include_air_phase=config.include_air_phase,
+                method=method,
+                coefficients=coefficients,
+                sampling=sampling
+            )
+            flight = None
+            if drag_coefficient is not None:
+                with span('flight'):
+                    flight = config_flight(config, curve.t, curve.thrust, curve.water_end_time, drag_coefficient)
+            return curve, flight
+            
+        def show(result):
+            with operation.activate():
+                self.add_curve(result[0], config, profile, result[1])
+            self.finish_operation(operation)
         
-        self.impulses.append(impulse)
+        self.run_job(compute, on_done=show)
         
-        # Salva l'ultima curva calcolata (sempre in unità metriche per export)
-        if self.current_units == 'imperial':
-            self.last_thrust = self.convert_value(thrust, 'thrust', True)  # Riconverti per export
-        else:
-            self.last_thrust = thrust
-        self.last_time = t
-        self.last_water_time = water_end_time
+    def get_drag_coefficient(self):
+        """Coefficiente di resistenza per la simulazione del volo (None se disattivata)"""
+        if not self.flight_var.get():
+            return None
+        try:
+            return max(self.drag_coefficient_var.get(), 0.0)
+        except (tk.TclError, ValueError):
+            return DRAG_COEFFICIENT
+        
+    def add_curve(self, curve, config, profile='', flight=None):
+        """Archivia e aggiunge al grafico una curva calcolata (CurveResult; flight: risultato di config_flight)"""
+        self.ensure_plot()
+        with span('store'):
+            store_index = self.curve_store.append(config, curve, profile, flight)
+        
+        # La spinta resta in N: il fattore di conversione si applica solo ai valori mostrati
+        scale = self.convert_value(1.0, 'thrust', False) if self.current_units == 'imperial' else 1.0
+        with span('legend'):
+            label = self.curve_label(self.curve_store.records[store_index], profile)
+        
+        # Se inclusa fase aria, evidenzia la transizione con linea verticale e annotazione
+        transition, annotation = None, None
+        if config.include_air_phase:
+            transition = curve.water_end_time
+            max_thrust = curve.peak_thrust * scale
+            annotation = (f'{self.get_text("water_phase")}→{self.get_text("air_phase")}',
+                          (transition, max_thrust*0.8), (transition + 50, max_thrust*0.9))
+        
+        # Aggiungi la nuova curva al grafico e all'elenco
+        line_color = self.curve_plot.next_color()
+        with span('plot'):
+            index = self.curve_plot.add(curve.t, curve.thrust, label, color=line_color,
+                                        water_end_time=transition, annotation=annotation, scale=scale)
+        with span('legend'):
+            self.insert_curve_rows([label], [line_color], [store_index])
+            self.curve_list.see(index)
+        
+        with span('draw'):
+            self.canvas.draw()
+        
+    def curve_label(self, record, profile=''):
+        """Etichetta di una curva archiviata (riga CURVE_DTYPE e nome del profilo) nelle unità correnti"""
+        imperial = self.current_units == 'imperial'
+        values = {name: float(record[name]) for name in ('bottle_volume', 'pressure', 'nozzle_diameter')}
+        if imperial:
+            for name, unit_type in (('bottle_volume', 'volume'), ('pressure', 'pressure'),
+                                    ('nozzle_diameter', 'length')):
+                values[name] = self.convert_value(values[name], unit_type, False)
+        scale = self.convert_value(1.0, 'thrust', False) if imperial else 1.0
+        impulse = record['total_impulse'] * scale
         
         # Crea etichetta per legenda
         unit_labels = {
             'volume': self.get_unit_label('volume'),
             'pressure': self.get_unit_label('pressure'), 
             'length': self.get_unit_label('length'),
-            'impulse': 'N⋅s' if self.current_units == 'metric' else 'lbf⋅s'
+            'impulse': 'N⋅s' if not imperial else 'lbf⋅s'
         }
         
-        if self.include_air_phase_var.get():
-            label = (f'V={self.bottle_volume_var.get():.1f}{unit_labels["volume"]}, '
-                    f'P={self.pressure_var.get():.1f}{unit_labels["pressure"]}, '
-                    f'W={self.water_ratio_var.get():.0f}%, '
-                    f'D={self.nozzle_diameter_var.get():.1f}{unit_labels["length"]}, '
-                    f'I={impulse:.2f}{unit_labels["impulse"]} '
-                    f'(W:{water_impulse:.2f}+A:{air_impulse:.2f})')
-        else:
-            label = (f'V={self.bottle_volume_var.get():.1f}{unit_labels["volume"]}, '
-                    f'P={self.pressure_var.get():.1f}{unit_labels["pressure"]}, '
-                    f'W={self.water_ratio_var.get():.0f}%, '
-                    f'D={self.nozzle_diameter_var.get():.1f}{unit_labels["length"]}, '
-                    f'I={impulse:.2f}{unit_labels["impulse"]}')
-        
-        # Aggiungi la nuova curva
-        colors = ['b', 'g', 'r', 'c', 'm', 'y', 'orange', 'purple', 'brown', 'pink']
-        line_color = colors[len(self.curves) % len(colors)]
-        
-        # Disegna curva principale
-        line, = self.ax.plot(t, thrust, color=line_color, linewidth=2, label=label)
-        self.curves.append(line)
-        
-        # Se inclusa fase aria, evidenzia la transizione
-        if self.include_air_phase_var.get():
-            # Linea verticale al termine della fase acqua
-            self.ax.axvline(x=water_end_time, color=line_color, linestyle='--', alpha=0.5)
-            # Annotazione
-            max_thrust = np.max(thrust)
-            self.ax.annotate(f'{self.get_text("water_phase")}→{self.get_text("air_phase")}', 
-                           xy=(water_end_time, max_thrust*0.8), 
-                           xytext=(water_end_time + 50, max_thrust*0.9),
-                           arrowprops=dict(arrowstyle='->', color=line_color, alpha=0.7),
-                           fontsize=8, color=line_color)
-        
-        self.ax.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
+        label = (f'V={values["bottle_volume"]:.1f}{unit_labels["volume"]}, '
+                 f'P={values["pressure"]:.1f}{unit_labels["pressure"]}, '
+                 f'W={record["water_ratio"]:.0f}%, '
+                 f'D={values["nozzle_diameter"]:.1f}{unit_labels["length"]}, '
+                 f'I={impulse:.2f}{unit_labels["impulse"]}')
+        if record['include_air_phase']:
+            label += f' (W:{record["water_impulse"] * scale:.2f}+A:{record["air_impulse"] * scale:.2f})'
+        if not np.isnan(record['apogee']):
+            # Apogeo e velocità massima (m, m/s o ft, ft/s)
+            length_scale, length_unit = (1.0, 'm') if not imperial else (3.28084, 'ft')
+            label += (f', ↑{record["apogee"] * length_scale:.1f}{length_unit} '
+                      f'v={record["max_velocity"] * length_scale:.1f}{length_unit}/s '
+                      f't={record["time_to_apogee"]:.2f}s')
+        if profile:
+            label += f' [{profile}]'
+        return label
+        
+    def insert_curve_rows(self, labels, colors, store_indices=None):
+        """Aggiunge righe all'elenco delle curve, con il colore della curva"""
+        first = self.curve_list.size()
+        self.curve_list.insert(tk.END, *labels)
+        for offset, color in enumerate(colors):
+            self.curve_list.itemconfig(first + offset, foreground=color)
+        self.curve_rows.extend(store_indices if store_indices is not None else [None] * len(labels))
+        
+    def selected_store_index(self):
+        """Curva archiviata selezionata nell'elenco, altrimenti l'ultima calcolata (None se nessuna)"""
+        selection = self.curve_list.curselection()
+        if selection and self.curve_rows[selection[0]] is not None:
+            return self.curve_rows[selection[0]]
+        return len(self.curve_store) - 1 if len(self.curve_store) else None
+        
+    def calculate_monte_carlo(self):
+        """Calcola le bande di incertezza Monte Carlo per i parametri correnti"""
+        try:
+            n_samples = max(int(self.mc_samples_var.get()), 1)
+            tolerances = {name: Tolerance('normal', var.get() / 100)
+                          for name, var in self.mc_tolerance_vars.items()}
+        except (tk.TclError, ValueError) as e:
+            messagebox.showerror("Error", str(e))
+            return
+        config = self.get_motor_config()
+        coefficients = self.get_coefficients()
+        
+        self.run_job(lambda job: monte_carlo(config, n_samples, tolerances, progress=job.report,
+                                             coefficients=coefficients),
+                     on_done=lambda result: self.add_monte_carlo(result, n_samples))
+        
+    def add_monte_carlo(self, result, n_samples):
+        """Aggiunge al grafico la mediana Monte Carlo con la banda p5-p95"""
+        self.ensure_plot()
+        scale = self.convert_value(1.0, 'thrust', False) if self.current_units == 'imperial' else 1.0
+        impulse_unit = 'N⋅s' if self.current_units == 'metric' else 'lbf⋅s'
+        low, median, high = (result.impulse_percentiles[p] * scale for p in (5, 50, 95))
+        classes = ', '.join(f'{name} {fraction:.0%}' for name, fraction in result.class_fractions)
+        label = (f'MC N={n_samples}: I={median:.2f}{impulse_unit} '
+                 f'[{low:.2f}-{high:.2f}] {classes}')
+        
+        line_color = self.curve_plot.next_color()
+        index = self.curve_plot.add(result.t, result.bands[50], label, color=line_color,
+                                    band=(result.bands[5], result.bands[95]), scale=scale)
+        self.insert_curve_rows([label], [line_color])
+        self.curve_list.see(index)
+        
+        self.canvas.draw()
+        
+    def open_library(self):
+        """Indicizza una directory di file RASP e apre la finestra di ricerca"""
+        directory = filedialog.askdirectory()
+        if not directory:
+            return
+            
+        def scan(job):
+            library = MotorLibrary(os.path.join(directory, INDEX_FILE_NAME))
+            library.scan(directory, progress=job.report)
+            try:
+                library.save()
+            except OSError:
+                pass  # Directory in sola lettura: l'indice resta solo in memoria
+            return library
+            
+        self.run_job(scan, on_done=self.show_library)
+        
+    def show_library(self, library):
+        """Finestra di ricerca nella libreria motori"""
+        self.motor_library = library
+        if self.library_window is not None:
+            self.library_window.destroy()
+        window = self.library_window = tk.Toplevel(self.root)
+        window.title(self.get_text('motor_library'))
+        
+        filter_frame = ttk.Frame(window, padding="5")
+        filter_frame.pack(side=tk.TOP, fill=tk.X)
+        ttk.Label(filter_frame, text=self.get_text('impulse_class')).pack(side=tk.LEFT)
+        self.library_class_var = tk.StringVar(value='')
+        ttk.Combobox(filter_frame, textvariable=self.library_class_var, width=5, state='readonly',
+                     values=[''] + list(IMPULSE_CLASS_BOUNDARIES.values()) + ['I+']).pack(side=tk.LEFT, padx=5)
+        ttk.Label(filter_frame, text=self.get_text('name_filter')).pack(side=tk.LEFT, padx=(10,0))
+        self.library_name_var = tk.StringVar(value='')
+        ttk.Entry(filter_frame, textvariable=self.library_name_var, width=15).pack(side=tk.LEFT, padx=5)
+        ttk.Button(filter_frame, text=self.get_text('search'), command=self.search_library).pack(side=tk.LEFT, padx=5)
+        ttk.Button(filter_frame, text=self.get_text('overlay'),
+                   command=self.overlay_library_motor).pack(side=tk.LEFT, padx=5)
+        
+        self.library_list = tk.Listbox(window, width=70, height=20, activestyle='none')
+        library_scrollbar = ttk.Scrollbar(window, orient=tk.VERTICAL, command=self.library_list.yview)
+        self.library_list.config(yscrollcommand=library_scrollbar.set)
+        library_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.library_list.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.library_list.bind('<Double-Button-1>', lambda event: self.overlay_library_motor())
+        self.search_library()
+        
+    def search_library(self):
+        """Aggiorna l'elenco dei motori della libreria secondo i filtri"""
+        self.library_results = self.motor_library.query(impulse_class=self.library_class_var.get() or None,
+                                                        name=self.library_name_var.get().strip() or None)
+        self.library_list.delete(0, tk.END)
+        for entry in self.library_results[:MAX_LIBRARY_ROWS]:
+            self.library_list.insert(tk.END, f'{entry["name"]} ({entry["manufacturer"]}) {entry["impulse_class"]} '
+                                             f'I={entry["total_impulse"]:.2f}N⋅s F={entry["average_thrust"]:.1f}N '
+                                             f't={entry["burn_time"]:.2f}s Ø{entry["diameter"]:.0f}mm')
+            
+    def overlay_library_motor(self, index=None):
+        """Sovrappone al grafico il motore della libreria selezionato"""
+        self.ensure_plot()
+        if index is None:
+            selection = self.library_list.curselection()
+            if not selection:
+                return
+            index = selection[0]
+        entry = self.library_results[index]
+        try:
+            motor = MotorLibrary.load_motor(entry)
+        except (OSError, IndexError) as e:
+            messagebox.showerror("Error", str(e))
+            return
+            
+        scale = self.convert_value(1.0, 'thrust', False) if self.current_units == 'imperial' else 1.0
+        impulse_unit = 'N⋅s' if self.current_units == 'metric' else 'lbf⋅s'
+        label = f'{motor.name} ({motor.manufacturer}): I={entry["total_impulse"] * scale:.2f}{impulse_unit}'
+        
+        line_color = self.curve_plot.next_color()
+        index = self.curve_plot.add(motor.t, motor.thrust, label, color=line_color, scale=scale)
+        self.insert_curve_rows([label], [line_color])
+        self.curve_list.see(index)
+        
         self.canvas.draw()
         
+    def import_test_log(self):
+        """Importa il log di una prova statica e lo sovrappone al grafico"""
+        file_name = filedialog.askopenfilename(
+            filetypes=[("Test logs", "*.csv *.txt *.bin *.dat *.raw"), ("All Files", "*.*")]
+        )
+        if not file_name:
+            return
+            
+        # I log di testo hanno le colonne tempo (s) e spinta (N); quelli binari solo la spinta
+        options = {}
+        if file_name.lower().endswith(BINARY_LOG_EXTENSIONS):
+            sample_rate = simpledialog.askfloat(self.get_text('import_log'), self.get_text('sample_rate'),
+                                                minvalue=1.0, parent=self.root)
+            if not sample_rate:
+                return
+            options = dict(binary=True, sample_rate=sample_rate, thrust_column=0)
+            
+        # La configurazione corrente è quella della prova, usata dalla calibrazione
+        config = self.get_motor_config()
+        self.run_job(lambda job: import_log(file_name, progress=job.report, **options),
+                     on_done=lambda log: self.add_test_log(log, os.path.basename(file_name), config))
+        
+    def add_test_log(self, log, name, config=None):
+        """Aggiunge al grafico la curva misurata di una prova statica"""
+        self.ensure_plot()
+        if config is not None:
+            self.test_logs.append((config, log))
+        scale = self.convert_value(1.0, 'thrust', False) if self.current_units == 'imperial' else 1.0
+        impulse_unit = 'N⋅s' if self.current_units == 'metric' else 'lbf⋅s'
+        label = f'{name}: I={log.total_impulse * scale:.2f}{impulse_unit} ({self.get_text("measured")})'
+        
+        line_color = self.curve_plot.next_color()
+        index = self.curve_plot.add(log.t, log.thrust, label, color=line_color, scale=scale)
+        self.insert_curve_rows([label], [line_color])
+        self.curve_list.see(index)
+        
+        self.canvas.draw()
+        
+    def calibrate_model(self):
+        """Adatta i coefficienti del modello alle prove importate e li salva come profilo"""
+        if not self.test_logs:
+            messagebox.showwarning("Warning", self.get_text('no_logs'))
+            return
+        runs = [CalibrationRun(config, log.t, log.thrust) for config, log in self.test_logs]
+        
+        self.run_job(lambda job: calibrate(runs), on_done=lambda result: self.save_calibration(result, len(runs)))
+        
+    def save_calibration(self, result, n_runs):
+        """Chiede il nome del profilo calibrato, lo salva e lo seleziona"""
+        name = simpledialog.askstring(self.get_text('calibrate'),
+                                      self.get_text('profile_name').format(rms=result.rms), parent=self.root)
+        if not name or not name.strip():
+            return
+        name = name.strip()
+        try:
+            save_profile(name, result.coefficients, rms=result.rms, runs=n_runs)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.profiles[name] = dict(result.coefficients)
+        self.profile_combo.config(values=[''] + sorted(self.profiles))
+        self.profile_var.set(name)
+        self.params_changed()
+        
+    def open_design(self):
+        """Finestra del progetto inverso: obiettivi, intervalli dei parametri e risultati"""
+        if self.design_window is not None:
+            self.design_window.destroy()
+        window = self.design_window = tk.Toplevel(self.root)
+        window.title(self.get_text('design'))
+        impulse_unit = 'N⋅s' if self.current_units == 'metric' else 'lbf⋅s'
+        
+        # Obiettivi: le caselle vuote vengono ignorate
+        target_frame = ttk.LabelFrame(window, text=self.get_text('targets'), padding="5")
+        target_frame.pack(side=tk.TOP, fill=tk.X, padx=5, pady=5)
+        self.design_target_vars = {name: tk.StringVar(value='') for name in
+                                   ('total_impulse', 'impulse_class', 'average_thrust', 'burn_time')}
+        labels = {
+            'total_impulse': f"{self.get_text('total_impulse')} ({impulse_unit}):",
+            'impulse_class': self.get_text('impulse_class'),
+            'average_thrust': f"{self.get_text('average_thrust')} ({self.get_unit_label('thrust')}):",
+            'burn_time': f"{self.get_text('burn_time')}:",
+        }
+        for column, (name, var) in enumerate(self.design_target_vars.items()):
+            ttk.Label(target_frame, text=labels[name]).grid(row=0, column=2*column, sticky="W", padx=(10,2))
+            if name == 'impulse_class':
+                ttk.Combobox(target_frame, textvariable=var, width=5, state='readonly',
+                             values=[''] + list(IMPULSE_CLASS_BOUNDARIES.values()) + ['I+']).grid(row=0, column=2*column + 1)
+            else:
+                ttk.Entry(target_frame, textvariable=var, width=8).grid(row=0, column=2*column + 1)
+                
+        # Intervalli ammessi, inizialmente quelli degli slider (min = max fissa il parametro)
+        bounds_frame = ttk.LabelFrame(window, text=self.get_text('bounds'), padding="5")
+        bounds_frame.pack(side=tk.TOP, fill=tk.X, padx=5, pady=5)
+        sliders = {'pressure': self.pressure_slider, 'water_ratio': self.water_ratio_slider,
+                   'nozzle_diameter': self.nozzle_diameter_slider, 'bottle_volume': self.bottle_volume_slider}
+        self.design_bound_vars = {}
+        for column, name in enumerate(DESIGN_PARAMS):
+            unit_type = self.design_unit_type(name)
+            label = self.get_text(name) if unit_type is None else f"{self.get_text(name)} ({self.get_unit_label(unit_type)})"
+            ttk.Label(bounds_frame, text=label).grid(row=0, column=column, padx=5)
+            pair = ttk.Frame(bounds_frame)
+            pair.grid(row=1, column=column, padx=5)
+            low = tk.DoubleVar(value=float(sliders[name].cget('from')))
+            high = tk.DoubleVar(value=float(sliders[name].cget('to')))
+            ttk.Entry(pair, textvariable=low, width=6).pack(side=tk.LEFT)
+            ttk.Entry(pair, textvariable=high, width=6).pack(side=tk.LEFT, padx=(2,0))
+            self.design_bound_vars[name] = (low, high)
+            
+        button_frame = ttk.Frame(window, padding="5")
+        button_frame.pack(side=tk.TOP, fill=tk.X)
+        ttk.Button(button_frame, text=self.get_text('search'), command=self.solve_design).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text=self.get_text('apply'), command=self.apply_design).pack(side=tk.LEFT, padx=5)
+        
+        self.design_list = tk.Listbox(window, width=90, height=10, activestyle='none')
+        self.design_list.pack(side=tk.TOP, fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.design_list.bind('<Double-Button-1>', lambda event: self.apply_design())
+        
+    def design_unit_type(self, name):
+        """Tipo di unità di un parametro operativo (None per il rapporto acqua)"""
+        return {'pressure': 'pressure', 'nozzle_diameter': 'length', 'bottle_volume': 'volume'}.get(name)
+        
+    def solve_design(self):
+        """Cerca in background le configurazioni più vicine agli obiettivi"""
+        to_metric = self.current_units == 'imperial'
+        try:
+            targets = {}
+            for name, var in self.design_target_vars.items():
+                text = var.get().strip()
+                if not text:
+                    continue
+                if name == 'impulse_class':
+                    targets[name] = text
+                    continue
+                value = float(text.replace(',', '.'))
+                # Impulso e spinta nelle unità visualizzate: si convertono come la spinta
+                targets[name] = self.convert_value(value, 'thrust', True) if to_metric and name != 'burn_time' else value
+            bounds = {}
+            for name, (low, high) in self.design_bound_vars.items():
+                unit_type = self.design_unit_type(name)
+                values = [var.get() for var in (low, high)]
+                if to_metric and unit_type is not None:
+                    values = [self.convert_value(value, unit_type, True) for value in values]
+                bounds[name] = tuple(values)
+        except (tk.TclError, ValueError) as e:
+            messagebox.showerror("Error", str(e))
+            return
+        include_air_phase = self.include_air_phase_var.get()
+        coefficients = self.get_coefficients()
+        config = self.get_motor_config()
+        
+        self.run_job(lambda job: design(targets, bounds, include_air_phase, coefficients=coefficients,
+                                        base_config=config),
+                     on_done=self.show_design_results)
+        
+    def show_design_results(self, results):
+        """Elenca i risultati del progetto inverso nelle unità correnti"""
+        self.design_results = results
+        if self.design_window is None or not self.design_window.winfo_exists():
+            return
+        imperial = self.current_units == 'imperial'
+        scale = self.convert_value(1.0, 'thrust', False) if imperial else 1.0
+        impulse_unit = 'N⋅s' if not imperial else 'lbf⋅s'
+        self.design_list.delete(0, tk.END)
+        for result in results:
+            config = result.config
+            values = {name: getattr(config, name) for name in DESIGN_PARAMS}
+            if imperial:
+                for name in values:
+                    unit_type = self.design_unit_type(name)
+                    if unit_type is not None:
+                        values[name] = self.convert_value(values[name], unit_type, False)
+            self.design_list.insert(tk.END,
+                f'P={values["pressure"]:.2f}{self.get_unit_label("pressure")}, '
+                f'W={values["water_ratio"]:.1f}%, '
+                f'D={values["nozzle_diameter"]:.2f}{self.get_unit_label("length")}, '
+                f'V={values["bottle_volume"]:.2f}{self.get_unit_label("volume")} → '
+                f'I={result.total_impulse * scale:.2f}{impulse_unit} {result.impulse_class}, '
+                f'F={result.average_thrust * scale:.1f}{self.get_unit_label("thrust")}, '
+                f't={result.burn_time:.3f}s')
+            
+    def apply_design(self, index=None):
+        """Porta gli slider sul risultato selezionato e ne calcola la curva"""
+        if index is None:
+            selection = self.design_list.curselection()
+            if not selection:
+                return
+            index = selection[0]
+        config = self.design_results[index].config
+        variables = {'pressure': self.pressure_var, 'water_ratio': self.water_ratio_var,
+                     'nozzle_diameter': self.nozzle_diameter_var, 'bottle_volume': self.bottle_volume_var}
+        for name, var in variables.items():
+            value = getattr(config, name)
+            unit_type = self.design_unit_type(name)
+            if self.current_units == 'imperial' and unit_type is not None:
+                value = self.convert_value(value, unit_type, False)
+            var.set(value)
+        self.update_all_labels()
+        self.calculate_curve()
+        
+    def open_explorer(self):
+        """Finestra della mappa dello spazio di progetto: una grandezza su due parametri operativi"""
+        if self.explorer_window is not None:
+            self.close_explorer()
+        window = self.explorer_window = tk.Toplevel(self.root)
+        window.title(self.get_text('explorer'))
+        window.protocol('WM_DELETE_WINDOW', self.close_explorer)
+        
+        # Coordinate e grandezza mostrata, con i nomi tradotti nell'ordine di EXPLORER_PARAMS e EXPLORER_METRICS
+        control_frame = ttk.Frame(window, padding="5")
+        control_frame.pack(side=tk.TOP, fill=tk.X)
+        self.explorer_param_names = [self.get_text(name) for name in EXPLORER_PARAMS]
+        self.explorer_metric_names = [self.get_text(name) for name in EXPLORER_METRICS]
+        self.explorer_x_var = tk.StringVar(value=self.explorer_param_names[0])
+        self.explorer_y_var = tk.StringVar(value=self.explorer_param_names[1])
+        self.explorer_metric_var = tk.StringVar(value=self.explorer_metric_names[0])
+        for key, var, names in (('x_axis', self.explorer_x_var, self.explorer_param_names),
+                                ('y_axis', self.explorer_y_var, self.explorer_param_names),
+                                ('explorer_metric', self.explorer_metric_var, self.explorer_metric_names)):
+            ttk.Label(control_frame, text=self.get_text(key)).pack(side=tk.LEFT, padx=(10,2))
+            combo = ttk.Combobox(control_frame, textvariable=var, values=names, width=24, state='readonly')
+            combo.pack(side=tk.LEFT)
+            combo.bind('<<ComboboxSelected>>', self.update_explorer)
+            
+        # Figura propria, separata da quella delle curve; il punto corrente è segnato da una croce
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from matplotlib.figure import Figure
+        self.explorer_fig = Figure(figsize=(7, 5.5))
+        self.explorer_ax = self.explorer_fig.add_subplot()
+        self.explorer_image = self.explorer_ax.imshow(np.full((2, 2), np.nan), origin='lower', aspect='auto',
+                                                      interpolation='nearest')
+        self.explorer_colorbar = self.explorer_fig.colorbar(self.explorer_image, ax=self.explorer_ax)
+        self.explorer_marker, = self.explorer_ax.plot([], [], marker='+', color='red', markersize=14,
+                                                      markeredgewidth=2, linestyle='none')
+        self.explorer_canvas = FigureCanvasTkAgg(self.explorer_fig, master=window)
+        self.explorer_canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        self.explorer_grid = None
+        self.update_explorer()
+        
+    def close_explorer(self):
+        """Chiude la mappa interrompendo il raffinamento (le griglie restano nella cache)"""
+        if self._explorer_job is not None:
+            self._explorer_job.cancel()
+            self._explorer_job = None
+        if self._explorer_update is not None:
+            self.root.after_cancel(self._explorer_update)
+            self._explorer_update = None
+        self.explorer_window.destroy()
+        self.explorer_window = None
+        self.explorer_grid = None
+        
+    def explorer_selection(self):
+        """Coordinate e grandezza scelte nella finestra della mappa (nomi interni)"""
+        return (EXPLORER_PARAMS[self.explorer_param_names.index(self.explorer_x_var.get())],
+                EXPLORER_PARAMS[self.explorer_param_names.index(self.explorer_y_var.get())],
+                EXPLORER_METRICS[self.explorer_metric_names.index(self.explorer_metric_var.get())])
+        
+    def schedule_explorer(self, event=None):
+        """Programma l'aggiornamento della mappa, accorpando le richieste ravvicinate"""
+        if self.explorer_window is None:
+            return
+        if self._explorer_update is not None:
+            self.root.after_cancel(self._explorer_update)
+        self._explorer_update = self.root.after(PREVIEW_DELAY_MS, self.update_explorer)
+        
+    def update_explorer(self, event=None):
+        """Mostra la griglia dei parametri correnti, ripresa dalla cache se già calcolata"""
+        self._explorer_update = None
+        if self.explorer_window is None:
+            return
+        x_param, y_param, metric = self.explorer_selection()
+        if x_param == y_param:
+            return
+        try:
+            config = self.get_motor_config()
+        except (tk.TclError, ValueError):
+            return
+        self.explorer_point = (getattr(config, x_param), getattr(config, y_param))
+        
+        # Le coordinate non fanno parte della chiave: spostarne lo slider muove solo la croce
+        grid = self.heatmap_cache.grid(x_param, y_param, config, self.get_coefficients())
+        if grid is not self.explorer_grid:
+            if self._explorer_job is not None:
+                self._explorer_job.cancel()
+                self._explorer_job = None
+            self.explorer_grid = grid
+            self.refine_explorer()
+        self.draw_explorer()
+        
+    def refine_explorer(self):
+        """Calcola in background il blocco successivo di punti della griglia mostrata"""
+        grid = self.explorer_grid
+        if grid is None or grid.complete or self._explorer_job is not None:
+            return
+            
+        def refine(job):
+            level_done = grid.refine()
+            job.report(grid.progress)
+            return level_done
+            
+        job = self.run_job(refine, on_done=lambda level_done: self.explorer_refined(job, level_done),
+                           on_error=lambda error: self.explorer_refined(job, None, error),
+                           on_cancel=lambda: self.explorer_refined(job, None))
+        self._explorer_job = job
+        
+    def explorer_refined(self, job, level_done, error=None):
+        """Mostra il livello appena completato e prosegue il raffinamento (level_done None: interrotto)"""
+        if job is not self._explorer_job:
+            return
+        self._explorer_job = None
+        if error is not None:
+            messagebox.showerror("Error", str(error))
+        if level_done is None:
+            return
+        if level_done:
+            self.draw_explorer()
+        self.refine_explorer()
+        
+    def draw_explorer(self):
+        """Disegna l'ultimo livello completato della griglia e il punto corrente nelle unità correnti"""
+        grid = self.explorer_grid
+        metric = self.explorer_selection()[2]
+        imperial = self.current_units == 'imperial'
+        
+        def axis(name):
+            unit_type = self.design_unit_type(name)
+            if unit_type is None:
+                return 1.0, self.get_text(name)
+            scale = self.convert_value(1.0, unit_type, False) if imperial else 1.0
+            return scale, f"{self.get_text(name)} ({self.get_unit_label(unit_type)})"
+            
+        (x_scale, x_label), (y_scale, y_label) = axis(grid.x_param), axis(grid.y_param)
+        label = self.get_text(metric)
+        scale = 1.0
+        if metric != 'burn_time':
+            scale = self.convert_value(1.0, 'thrust', False) if imperial else 1.0
+            unit = self.get_unit_label('thrust') + ('⋅s' if metric == 'total_impulse' else '')
+            label = f"{label} ({unit})"
+            
+        values, extent = grid.image(metric)
+        if values is not None:
+            x_low, x_high, y_low, y_high = extent
+            values = values * scale
+            self.explorer_image.set_data(values)
+            self.explorer_image.set_extent((x_low * x_scale, x_high * x_scale, y_low * y_scale, y_high * y_scale))
+            self.explorer_image.set_clim(np.nanmin(values), np.nanmax(values))
+            self.explorer_ax.set_xlim(x_low * x_scale, x_high * x_scale)
+            self.explorer_ax.set_ylim(y_low * y_scale, y_high * y_scale)
+        x, y = self.explorer_point
+        self.explorer_marker.set_data([x * x_scale], [y * y_scale])
+        self.explorer_ax.set_xlabel(x_label)
+        self.explorer_ax.set_ylabel(y_label)
+        self.explorer_ax.set_title(self.get_text(metric))
+        self.explorer_colorbar.set_label(label)
+        self.explorer_canvas.draw_idle()
+        
+    def select_curve(self, event=None):
+        """Evidenzia nel grafico la curva selezionata nell'elenco"""
+        self.ensure_plot()
+        selection = self.curve_list.curselection()
+        self.curve_plot.highlight(selection[0] if selection else None)
+        self.canvas.draw_idle()
+        
     def clear_curves(self):
         """Cancella tutte le curve dal grafico"""
-        for line in self.curves:
-            line.remove()
-        self.curves = []
-        self.impulses = []
-        
-        # Rimuovi anche le annotazioni
-        for annotation in self.ax.texts:
-            annotation.remove()
-        for line in self.ax.lines:
-            if line.get_linestyle() == '--':  # Rimuovi linee tratteggiate
-                line.remove()
-                
-        self.ax.legend()
-        self.canvas.draw()
+        self.ensure_plot()
+        with self.tracer.operation('clear_curves') as operation:
+            with span('plot'):
+                self.curve_plot.clear()  # Curve, bande, transizioni e annotazione
+            with span('legend'):
+                self.curve_list.delete(0, tk.END)
+            with span('store'):
+                self.curve_store = CurveStore()
+                self.curve_rows = []
+                self.test_logs = []
+            with span('draw'):
+                self.canvas.draw()
+        self.finish_operation(operation)
         
     def get_impulse_class(self, impulse):
         """Determina la classe di impulso NAR dato l'impulso totale in N⋅s"""
-        class_boundaries = {
-            0.625: '1/4A', 1.25: '1/2A', 2.5: 'A', 5.0: 'B',
-            10.0: 'C', 20.0: 'D', 40.0: 'E', 80.0: 'F',
-            160.0: 'G', 320.0: 'H', 640.0: 'I'
-        }
-        
-        for boundary, class_name in class_boundaries.items():
-            if impulse <= boundary:
-                return class_name
-        return 'I+'  # Per impulsi molto grandi        
+        return get_impulse_class(impulse)
         
     def export_rasp(self):
-        """Esporta l'ultima curva calcolata in formato RASP"""
-        if self.last_time is None or self.last_thrust is None:
+        """Esporta in formato RASP la curva selezionata nell'elenco (o l'ultima calcolata)"""
+        store_index = self.selected_store_index()
+        if store_index is None:
             messagebox.showwarning("Warning", self.get_text('no_data'))
             return
             
@@ -614,59 +1493,96 @@ class WaterRocketSimulator:
         if not file_name:
             return
             
-        try:
-            # Ottieni valori in unità metriche per l'export
-            values = self.get_metric_values()
-            
-            # Calcola parametri per il file RASP
-            diameter_mm = values['diameter']
-            length_mm = values['length']
-            
-            # Masse in kg
-            propellant_mass_kg = values['bottle_volume'] * (self.water_ratio_var.get() / 100)
-            total_mass_kg = propellant_mass_kg + values['bottle_mass'] / 1000
-            
-            # Calcola impulso totale e spinta media (sempre da dati in N)
-            impulse = np.trapz(self.last_thrust, self.last_time/1000)
-            burn_time = (self.last_time[-1] - self.last_time[0]) / 1000
-            average_thrust = impulse / burn_time
-            
-            # Determina la classe di impulso
-            motor_class = self.get_impulse_class(impulse)
-            
-            # Genera nome motore secondo standard
-            motor_name = f"{motor_class}{int(average_thrust)}"
-            
-            with open(file_name, 'w') as f:
-                # Header con informazioni
-                f.write(f"; Water Rocket Motor File\n")
-                f.write(f"; Generated by WaRMS on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write(f"; Configuration:\n")
-                f.write(f";   Volume: {values['bottle_volume']:.1f}L\n")
-                f.write(f";   Pressure: {values['pressure']:.1f} bar\n")
-                f.write(f";   Water ratio: {self.water_ratio_var.get():.1f}%\n")
-                f.write(f";   Nozzle diameter: {values['nozzle_diameter']:.1f} mm\n")
-                f.write(f";   Air phase included: {self.include_air_phase_var.get()}\n")
-                f.write(f";   Total Impulse: {impulse:.2f} Ns\n")
-                f.write(f";   Average Thrust: {average_thrust:.2f} N\n")
-                f.write(f";   Burn Time: {burn_time:.3f} s\n\n")
-                
-                # RASP header line
-                f.write(f"{motor_name} {diameter_mm:.1f} {length_mm:.1f} P {propellant_mass_kg:.4f} {total_mass_kg:.4f} WaRMS\n")
-                
-                # Dati curva di spinta (sempre in unità metriche: secondi e Newton)
-                for time, thrust in zip(self.last_time/1000, self.last_thrust):
-                    f.write(f"{time:.4f} {thrust:.4f}\n")
+        # Configurazione del calcolo, in unità metriche; la curva è sempre salvata in ms e N
+        operation = self.tracer.operation('export_rasp')
+        with operation.activate(), span('store'):
+            config, curve = self.curve_store.config(store_index), self.curve_store.curve(store_index)
+        tolerance = self.get_rasp_tolerance()
+        
+        def export(job):
+            with operation.activate():
+                write_rasp(file_name, config, curve.t, curve.thrust, tolerance=tolerance, result=curve)
                 
-                # Fine dati
-                f.write(";")
-            
+        def done(result):
+            self.finish_operation(operation)
             messagebox.showinfo("Success", self.get_text('export_success'))
+        
+        self.run_job(export, on_done=done,
+                     on_error=lambda e: messagebox.showerror("Error", f"Export failed: {str(e)}"))
+        
+    def export_all_rasp(self):
+        """Esporta tutte le curve calcolate in un unico file RASP multi-motore"""
+        if not len(self.curve_store):
+            messagebox.showwarning("Warning", self.get_text('no_data'))
+            return
             
-        except Exception as e:
-            messagebox.showerror("Error", f"Export failed: {str(e)}")
+        file_name = filedialog.asksaveasfilename(
+            defaultextension=".eng",
+            filetypes=[("RASP Engine Files", "*.eng"), ("All Files", "*.*")]
+        )
+        
+        if not file_name:
+            return
+            
+        # Ogni motore con la configurazione con cui è stato calcolato, letto dall'archivio man mano
+        motors = self.curve_store.motors()
+        tolerance = self.get_rasp_tolerance()
+        
+        self.run_job(lambda job: write_rasp_library(file_name, motors, tolerance),
+                     on_done=lambda count: messagebox.showinfo("Success", self.get_text('export_success')),
+                     on_error=lambda e: messagebox.showerror("Error", f"Export failed: {str(e)}"))
+        
+    def save_session(self):
+        """Salva le curve calcolate in un file di sessione .npz"""
+        if not len(self.curve_store):
+            messagebox.showwarning("Warning", self.get_text('no_data'))
+            return
+        file_name = filedialog.asksaveasfilename(
+            defaultextension=".npz",
+            filetypes=[("WaRMS Session", "*.npz"), ("All Files", "*.*")]
+        )
+        if not file_name:
+            return
+        store = self.curve_store
+        self.run_job(lambda job: store.save(file_name),
+                     on_done=lambda result: messagebox.showinfo("Success", self.get_text('export_success')),
+                     on_error=lambda e: messagebox.showerror("Error", f"Export failed: {str(e)}"))
+        
+    def open_session(self):
+        """Apre una sessione salvata al posto delle curve correnti"""
+        file_name = filedialog.askopenfilename(
+            filetypes=[("WaRMS Session", "*.npz"), ("All Files", "*.*")]
+        )
+        if not file_name:
+            return
+        self.run_job(lambda job: CurveStore.load(file_name), on_done=self.show_session)
+        
+    def show_session(self, store):
+        """Disegna in blocco tutte le curve di un archivio aperto"""
+        self.ensure_plot()
+        self.clear_curves()
+        self.curve_store = store
+        records = store.records
+        scale = self.convert_value(1.0, 'thrust', False) if self.current_units == 'imperial' else 1.0
+        labels = [self.curve_label(record, store.profile(i)) for i, record in enumerate(records)]
+        colors = [self.curve_plot.color(i) for i in range(len(records))]
+        transitions = [float(record['water_end_time']) if record['include_air_phase'] else None
+                       for record in records]
+        self.curve_plot.add_many((store.samples(i) for i in range(len(store))), labels, colors, transitions,
+                                 scale=scale)
+        self.insert_curve_rows(labels, colors, list(range(len(store))))
+        self.canvas.draw()
+        
+    def get_rasp_tolerance(self):
+        """Tolleranza di riduzione dei punti RASP come frazione della spinta massima"""
+        try:
+            return max(self.rasp_tolerance_var.get(), 0.0) / 100
+        except (tk.TclError, ValueError):
+            return 0.0
 
 if __name__ == '__main__':
     root = tk.Tk()
-    app = WaterRocketSimulator(root)
+    # --startup-time: stampa i tempi dell'avvio e chiude appena il grafico è pronto
+    app = WaterRocketSimulator(root, report_startup='--startup-time' in sys.argv[1:])
     root.mainloop()
+    app.worker.shutdown()
@@ -0,0 +1,307 @@
+"""Modalità batch di WaRMS da riga di comando, senza interfaccia grafica.
+
+Legge le configurazioni da CSV o JSON Lines (un file o stdin), le elabora
+con una pipeline di generatori a blocchi e scrive una riga di risultati per
+configurazione man mano che procede: la memoria usata non dipende dalla
+lunghezza dell'input. Opzionalmente salva un file .eng per ogni motore o
+un'unica libreria .eng con tutti i motori, con i punti ridotti entro una
+tolleranza.
+
+I campi riconosciuti sono quelli di MotorConfig (unità metriche) più un
+nome facoltativo; quelli mancanti prendono i valori predefiniti.
+
+    python warms_batch.py configs.csv > results.csv
+    cat configs.jsonl | python warms_batch.py --output-format jsonl --eng-dir motors
+    python warms_batch.py configs.csv --eng-library library.eng --reduce 0.005 > results.csv
+    python warms_batch.py configs.csv --profile banco > results.csv
+    python warms_batch.py configs.csv --sampling fast > results.csv
+"""
+import argparse
+import csv
+import dataclasses
+import itertools
+import json
+import math
+import os
+import re
+import sys
+
+from warms_calibration import load_profiles
+from warms_core import (N_AIR_SAMPLES, N_WATER_SAMPLES, SAMPLING_PROFILES, MotorConfig, curve_metrics, format_rasp,
+                        get_impulse_class, model_coefficients, sampling_resolution, thrust_curve_batch,
+                        trim_empty_air_phase, write_rasp)
+
+CONFIG_FIELDS = {field.name for field in dataclasses.fields(MotorConfig)}
+
+RESULT_FIELDS = (
+    'name', 'bottle_volume', 'water_ratio', 'pressure', 'nozzle_diameter', 'include_air_phase',
+    'total_impulse', 'water_impulse', 'air_impulse', 'burn_time', 'peak_thrust',
+    'average_thrust', 'impulse_class', 'eng_file',
+)
+
+DEFAULT_CHUNK_SIZE = 256
+
+_TRUE_VALUES = {'1', 'true', 'yes', 'y', 'si', 'sì', 'on'}
+_FALSE_VALUES = {'0', 'false', 'no', 'n', 'off', ''}
+
+
+class BatchInputError(ValueError):
+    """Riga di input non valida (line è il numero di riga nel file)"""
+
+    def __init__(self, line, message):
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+
+
+def read_records(file, fmt='auto'):
+    """Genera le coppie (numero di riga, dizionario) lette da CSV o JSON Lines.
+
+    Con fmt='auto' il formato è dedotto dalla prima riga non vuota: JSON
+    Lines se inizia con '{', altrimenti CSV con intestazione.
+    """
+    lines = iter(file)
+    first_number = 0
+    if fmt == 'auto':
+        for first_number, first in enumerate(lines, 1):
+            if first.strip():
+                break
+        else:
+            return
+        fmt = 'jsonl' if first.lstrip().startswith('{') else 'csv'
+        lines = itertools.chain([first], lines)
+        first_number -= 1
+
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for record in reader:
+            yield first_number + reader.line_num, record
+    elif fmt == 'jsonl':
+        for number, line in enumerate(lines, first_number + 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield number, BatchInputError(number, f"invalid JSON ({e})")
+                continue
+            if not isinstance(record, dict):
+                record = BatchInputError(number, "expected a JSON object")
+            yield number, record
+    else:
+        raise ValueError(f"Unknown input format: {fmt}")
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE_VALUES:
+        return True
+    if text in _FALSE_VALUES:
+        return False
+    raise ValueError(f"not a boolean: {value!r}")
+
+
+def config_from_record(record, include_air_phase=False):
+    """MotorConfig dai campi di un record (stringhe o numeri); ValueError se non è valida.
+
+    I campi che non sono di MotorConfig vengono ignorati, quelli mancanti o
+    vuoti prendono i valori predefiniti (include_air_phase per la fase aria).
+    """
+    values = {'include_air_phase': include_air_phase}
+    for name, value in record.items():
+        if name not in CONFIG_FIELDS or value is None or value == '':
+            continue
+        try:
+            values[name] = _parse_bool(value) if name == 'include_air_phase' else float(value)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"{name}: {e}")
+    config = MotorConfig(**values)
+    if not all(math.isfinite(value) for name, value in values.items() if name != 'include_air_phase') \
+            or min(config.bottle_volume, config.pressure, config.nozzle_diameter) <= 0 \
+            or not 0 < config.water_ratio < 100:
+        raise ValueError("parameters out of range")
+    return config
+
+
+def parse_configs(records, include_air_phase=False, on_error=None):
+    """Converte i record in terne (numero di riga, nome, MotorConfig).
+
+    include_air_phase è il valore usato quando il campo manca. Le righe non
+    valide vengono passate come BatchInputError a on_error e saltate; senza
+    on_error l'errore viene sollevato.
+    """
+    for number, record in records:
+        try:
+            if isinstance(record, Exception):
+                raise record
+            try:
+                config = config_from_record(record, include_air_phase)
+            except ValueError as e:
+                raise BatchInputError(number, str(e))
+        except BatchInputError as e:
+            if on_error is None:
+                raise
+            on_error(e)
+            continue
+        yield number, str(record.get('name') or ''), config
+
+
+def _eng_path(directory, index, name):
+    # Il numero progressivo rende unici i file anche con nomi uguali (o uguali dopo la pulizia)
+    stem = re.sub(r'[^\w.-]+', '_', name).strip('._') or 'motor'
+    return os.path.join(directory, f"{index:06d}_{stem}.eng")
+
+
+def _evaluate_chunk(chunk, method, coefficients=None, sampling=None):
+    """Curve e grandezze per un blocco di configurazioni, nell'ordine del blocco"""
+    results = [None] * len(chunk)
+    coefficients = model_coefficients(coefficients)
+    if method == 'fixed':
+        n_water, n_air = sampling_resolution(sampling)
+        # Una chiamata vettoriale per ciascuna delle due varianti di fase aria
+        for air in (False, True):
+            rows = [i for i, (_, _, config) in enumerate(chunk) if config.include_air_phase == air]
+            if not rows:
+                continue
+            columns = [[getattr(chunk[i][2], name) for i in rows]
+                       for name in ('bottle_volume', 'water_ratio', 'pressure', 'nozzle_diameter')]
+            t, thrust, water_end = thrust_curve_batch(*columns, include_air_phase=air, n_water=n_water, n_air=n_air,
+                                                      **coefficients)
+            metrics = curve_metrics(t, thrust, water_end)
+            for row, i in enumerate(rows):
+                results[i] = trim_empty_air_phase(t[row], thrust[row], n_water) + (
+                    {name: float(values[row]) for name, values in metrics.items()},)
+    else:
+        for i, (_, _, config) in enumerate(chunk):
+            t, thrust, water_end = config.thrust_curve(method, coefficients=coefficients)
+            metrics = curve_metrics(t, thrust, water_end)
+            results[i] = t, thrust, {name: float(values[0]) for name, values in metrics.items()}
+
+    for (_, _, config), (t, thrust, metrics) in zip(chunk, results):
+        yield config, t, thrust, metrics
+
+
+def evaluate_configs(configs, method='fixed', eng_dir=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                     eng_library=None, tolerance=None, coefficients=None, sampling=None):
+    """Genera un dizionario di risultati (campi RESULT_FIELDS) per ogni configurazione.
+
+    Le configurazioni vengono consumate a blocchi di chunk_size, così in
+    memoria ci sono al più chunk_size curve alla volta. eng_library è un
+    file aperto in cui accodare ogni motore in formato RASP; tolerance
+    riduce i punti delle curve esportate (vedi reduce_curve); coefficients
+    sono i coefficienti del modello (ad esempio un profilo calibrato);
+    sampling è il profilo di campionamento del metodo a passo fisso (vedi
+    warms_core.sampling_resolution).
+    """
+    configs = iter(configs)
+    index = 0
+    while True:
+        chunk = list(itertools.islice(configs, chunk_size))
+        if not chunk:
+            return
+        for (_, name, _), (config, t, thrust, metrics) in zip(chunk, _evaluate_chunk(chunk, method, coefficients, sampling)):
+            index += 1
+            impulse = metrics['total_impulse']
+            burn_time = (t[-1] - t[0]) / 1000
+            result = {
+                'name': name,
+                'bottle_volume': config.bottle_volume,
+                'water_ratio': config.water_ratio,
+                'pressure': config.pressure,
+                'nozzle_diameter': config.nozzle_diameter,
+                'include_air_phase': config.include_air_phase,
+                **metrics,
+                'average_thrust': impulse / burn_time if burn_time > 0 else 0.0,
+                'impulse_class': get_impulse_class(impulse),
+                'eng_file': '',
+            }
+            if eng_dir:
+                result['eng_file'] = _eng_path(eng_dir, index, name)
+                write_rasp(result['eng_file'], config, t, thrust, impulse=impulse, tolerance=tolerance)
+            if eng_library is not None:
+                eng_library.write(format_rasp(config, t, thrust, impulse, tolerance) + "\n")
+            yield result
+
+
+def write_results(results, file, fmt='csv'):
+    """Scrive i risultati man mano che vengono generati e ne restituisce il numero"""
+    count = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(file, fieldnames=RESULT_FIELDS, lineterminator='\n')
+        writer.writeheader()
+        for count, result in enumerate(results, 1):
+            writer.writerow(result)
+    elif fmt == 'jsonl':
+        for count, result in enumerate(results, 1):
+            file.write(json.dumps(result) + '\n')
+    else:
+        raise ValueError(f"Unknown output format: {fmt}")
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="WaRMS headless batch mode")
+    parser.add_argument('input', nargs='?', default='-', help="CSV or JSON Lines file (default: stdin)")
+    parser.add_argument('--format', choices=['auto', 'csv', 'jsonl'], default='auto', help="input format")
+    parser.add_argument('--output-format', choices=['csv', 'jsonl'], default='csv')
+    parser.add_argument('-o', '--output', help="output file (default: stdout)")
+    parser.add_argument('--air-phase', action='store_true', help="include the air phase when not specified")
+    parser.add_argument('--method', choices=['fixed', 'adaptive'], default='fixed', help="integration method")
+    parser.add_argument('--sampling', choices=list(SAMPLING_PROFILES),
+                        help=f"sampling profile of the fixed-step method "
+                             f"(default: {N_WATER_SAMPLES} water and {N_AIR_SAMPLES} air samples)")
+    parser.add_argument('--eng-dir', help="also write one .eng file per configuration in this directory")
+    parser.add_argument('--eng-library', help="also write all motors into this multi-motor .eng file")
+    parser.add_argument('--reduce', type=float, default=None, metavar='TOLERANCE',
+                        help="reduce .eng points within this fraction of peak thrust (e.g. 0.005)")
+    parser.add_argument('--profile', help="use the model coefficients of this calibrated profile")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+    
+    coefficients = None
+    if args.profile:
+        coefficients = load_profiles().get(args.profile)
+        if coefficients is None:
+            parser.error(f"unknown profile: {args.profile}")
+
+    if args.eng_dir:
+        os.makedirs(args.eng_dir, exist_ok=True)
+
+    # Solo il conteggio degli errori: la memoria non cresce con le righe non valide
+    error_count = 0
+
+    def report(error):
+        nonlocal error_count
+        error_count += 1
+        print(f"warms_batch: {error}", file=sys.stderr)
+
+    source = sys.stdin if args.input == '-' else open(args.input, newline='')
+    target = sys.stdout if not args.output else open(args.output, 'w', newline='')
+    library = open(args.eng_library, 'w') if args.eng_library else None
+    try:
+        configs = parse_configs(read_records(source, args.format), args.air_phase, on_error=report)
+        results = evaluate_configs(configs, args.method, args.eng_dir, args.chunk_size,
+                                   eng_library=library, tolerance=args.reduce, coefficients=coefficients,
+                                   sampling=args.sampling)
+        try:
+            write_results(results, target, args.output_format)
+            target.flush()
+        except BrokenPipeError:
+            if target is not sys.stdout:
+                raise
+            # Uscita chiusa in anticipo (ad esempio da head): si termina senza traceback,
+            # anche alla chiusura di stdout all'uscita dell'interprete
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+        if library is not None:
+            library.close()
+    return 1 if error_count else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,266 @@
+"""Benchmark di WaRMS: kernel fisico, integrazione, export RASP, disegno e avvio.
+
+Gira senza interfaccia: il disegno usa il backend Agg di matplotlib (nessuna
+finestra Tk), con una figura delle stesse dimensioni di quella del
+programma. Ogni caso viene ripetuto più volte; il numero di chiamate per
+misura è scelto in modo che ogni misura duri almeno MIN_TIME. I risultati
+(tempi per chiamata in secondi) si salvano in JSON e si possono confrontare
+con un baseline salvato in precedenza: un caso più lento della soglia
+indicata è una regressione e fa terminare il comando con codice 1.
+
+    python warms_bench.py -o baseline.json
+    python warms_bench.py --compare baseline.json --threshold 0.15
+    python warms_bench.py -k plot --quick
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import matplotlib
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from warms_core import (PARAM_RANGES, CurveResult, MotorConfig, calculate_thrust_curve, curve_metrics, format_rasp,
+                        phase_impulses, thrust_curve_batch, total_impulse, write_rasp)
+from warms_plot import CurvePlot
+
+BENCH_VERSION = 1
+
+DEFAULT_REPEAT = 7
+QUICK_REPEAT = 3
+MIN_TIME = 0.05  # s, durata minima di una misura
+DEFAULT_THRESHOLD = 0.10  # rallentamento relativo oltre il quale un caso è una regressione
+BATCH_SIZE = 1000
+PLOT_CURVES = (1, 10, 100, 1000)
+FIGURE_SIZE = (10, 6)  # come la figura dell'interfaccia
+
+# setup() prepara gli argomenti di run(); con fresh il setup si ripete prima di ogni chiamata
+Benchmark = namedtuple('Benchmark', ['name', 'run', 'setup', 'fresh'])
+
+
+def _random_configs(n, seed=0):
+    """Parametri casuali nell'intervallo degli slider (volume, acqua, pressione, ugello)"""
+    rng = np.random.default_rng(seed)
+    return [rng.uniform(*PARAM_RANGES[name], n)
+            for name in ('bottle_volume', 'water_ratio', 'pressure', 'nozzle_diameter')]
+
+
+def _plot_setup(n_curves, curve):
+    """Figura Agg con n_curves - 1 curve già disegnate, come dopo altrettanti calcoli"""
+    fig = Figure(figsize=FIGURE_SIZE)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.grid(True)
+    plot = CurvePlot(ax)
+    n = n_curves - 1
+    if n:
+        plot.add_many([(curve.t, curve.thrust * (1 + i / n)) for i in range(n)], [f'curve {i}' for i in range(n)])
+    canvas.draw()
+    return canvas, plot, curve
+
+
+def _plot_add(canvas, plot, curve):
+    """Percorso di Calcola nell'interfaccia: aggiunta della curva e ridisegno completo"""
+    plot.add(curve.t, curve.thrust, 'new curve', water_end_time=curve.water_end_time)
+    canvas.draw()
+
+
+def _import_app():
+    """Importazione del programma in un nuovo interprete (prima parte dell'avvio, senza finestra)"""
+    subprocess.run([sys.executable, '-c', 'import warms'], check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+
+
+def benchmarks(directory=None):
+    """Casi del benchmark, in ordine di esecuzione; l'export scrive nella directory indicata"""
+    config = MotorConfig(pressure=6.0, include_air_phase=True)
+    args = (config.bottle_volume, config.water_ratio, config.pressure, config.nozzle_diameter)
+    curve = CurveResult(*calculate_thrust_curve(*args, True))
+    batch = _random_configs(BATCH_SIZE)
+    curves = thrust_curve_batch(*batch, True)
+    cases = [
+        Benchmark('kernel.single_water', lambda: calculate_thrust_curve(*args, False), None, False),
+        Benchmark('kernel.single_air', lambda: calculate_thrust_curve(*args, True), None, False),
+        Benchmark('kernel.adaptive_air', lambda: calculate_thrust_curve(*args, True, method='adaptive'), None, False),
+        Benchmark(f'kernel.batch_{BATCH_SIZE}', lambda: thrust_curve_batch(*batch, True), None, False),
+        Benchmark('impulse.total', lambda: total_impulse(curve.t, curve.thrust), None, False),
+        Benchmark('impulse.phases', lambda: phase_impulses(curve.t, curve.thrust, curve.water_end_time), None, False),
+        Benchmark(f'impulse.metrics_{BATCH_SIZE}', lambda: curve_metrics(*curves), None, False),
+        Benchmark('impulse.curve_result', lambda: CurveResult(curve.t, curve.thrust, curve.water_end_time),
+                  None, False),
+        Benchmark('export.format_rasp', lambda: format_rasp(config, curve.t, curve.thrust), None, False),
+        Benchmark('export.format_rasp_reduced',
+                  lambda: format_rasp(config, curve.t, curve.thrust, tolerance=0.005, result=curve), None, False),
+    ]
+
+    # Export come dall'interfaccia: file su disco, con la CurveResult della curva
+    path = os.path.join(directory or tempfile.gettempdir(), 'warms-bench.eng')
+    cases.append(Benchmark('export.write_rasp', lambda: write_rasp(path, config, curve.t, curve.thrust,
+                                                                   tolerance=0.005, result=curve), None, False))
+
+    for n_curves in PLOT_CURVES:
+        cases.append(Benchmark(f'plot.add_{n_curves}', _plot_add, lambda n=n_curves: _plot_setup(n, curve), True))
+        cases.append(Benchmark(f'plot.redraw_{n_curves}', lambda canvas, plot, curve: canvas.draw(),
+                               lambda n=n_curves: _plot_setup(n + 1, curve), False))
+
+    # Serve tkinter, anche se la finestra non viene aperta
+    if importlib.util.find_spec('tkinter') is not None:
+        cases.append(Benchmark('startup.import', _import_app, None, False))
+    return cases
+
+
+def time_benchmark(benchmark, repeat=DEFAULT_REPEAT, min_time=MIN_TIME):
+    """Tempi per chiamata (s) di repeat misure di un caso"""
+    if benchmark.fresh:
+        times = []
+        for _ in range(repeat):
+            args = benchmark.setup()
+            start = time.perf_counter()
+            benchmark.run(*args)
+            times.append(time.perf_counter() - start)
+        return times, 1
+
+    args = benchmark.setup() if benchmark.setup is not None else ()
+    # Chiamate per misura: raddoppiano finché una misura dura almeno min_time (anche come riscaldamento)
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            benchmark.run(*args)
+        if time.perf_counter() - start >= min_time:
+            break
+        number *= 2
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            benchmark.run(*args)
+        times.append((time.perf_counter() - start) / number)
+    return times, number
+
+
+def run(pattern=None, repeat=DEFAULT_REPEAT, min_time=MIN_TIME, progress=None):
+    """Esegue i casi il cui nome contiene pattern e restituisce il documento JSON dei risultati"""
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='warms-bench-') as directory:
+        cases = [case for case in benchmarks(directory) if not pattern or pattern in case.name]
+        for index, case in enumerate(cases):
+            times, number = time_benchmark(case, repeat, min_time)
+            results[case.name] = {
+                'median': statistics.median(times),
+                'min': min(times),
+                'mean': statistics.mean(times),
+                'stdev': statistics.stdev(times) if len(times) > 1 else 0.0,
+                'repeat': len(times),
+                'number': number,
+            }
+            if progress is not None:
+                progress(case.name, results[case.name], (index + 1) / len(cases))
+    return {
+        'version': BENCH_VERSION,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'matplotlib': matplotlib.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'benchmarks': results,
+    }
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Confronta le mediane con quelle del baseline.
+
+    Restituisce righe (nome, baseline, attuale, rapporto, esito), con esito
+    'regression' se il caso è più lento di oltre threshold, 'improvement' se
+    è altrettanto più veloce, 'ok' altrimenti e 'new' se manca nel baseline.
+    """
+    reference = baseline.get('benchmarks', {})
+    rows = []
+    for name, result in results['benchmarks'].items():
+        current = result['median']
+        if name not in reference:
+            rows.append((name, None, current, None, 'new'))
+            continue
+        previous = reference[name]['median']
+        ratio = current / previous if previous > 0 else float('inf')
+        if ratio > 1 + threshold:
+            status = 'regression'
+        elif ratio < 1 / (1 + threshold):
+            status = 'improvement'
+        else:
+            status = 'ok'
+        rows.append((name, previous, current, ratio, status))
+    return rows
+
+
+def _format_time(seconds):
+    for unit, factor in (('s', 1), ('ms', 1e3), ('µs', 1e6)):
+        if seconds * factor >= 1:
+            return f"{seconds * factor:.3g} {unit}"
+    return f"{seconds * 1e9:.3g} ns"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="WaRMS benchmarks (headless)")
+    parser.add_argument('-o', '--output', help="write the results as JSON")
+    parser.add_argument('--compare', metavar='BASELINE', help="compare with a baseline JSON file")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown flagged as regression (default %(default)s)")
+    parser.add_argument('-k', dest='pattern', help="run only the benchmarks whose name contains PATTERN")
+    parser.add_argument('--repeat', type=int, help=f"measurements per benchmark (default {DEFAULT_REPEAT})")
+    parser.add_argument('--quick', action='store_true', help=f"{QUICK_REPEAT} short measurements per benchmark")
+    parser.add_argument('--list', action='store_true', help="list the benchmarks and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for case in benchmarks():
+            print(case.name)
+        return 0
+    baseline = None
+    if args.compare:
+        try:
+            with open(args.compare) as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            parser.error(f"cannot read baseline: {e}")
+    repeat = args.repeat or (QUICK_REPEAT if args.quick else DEFAULT_REPEAT)
+    min_time = MIN_TIME / 5 if args.quick else MIN_TIME
+
+    def progress(name, result, fraction):
+        print(f"{name:<28} {_format_time(result['median']):>10}  ±{_format_time(result['stdev']):>9}  "
+              f"({result['repeat']}×{result['number']})", file=sys.stderr)
+
+    results = run(args.pattern, max(repeat, 1), min_time, progress)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    elif baseline is None:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    if baseline is None:
+        return 0
+
+    rows = compare(results, baseline, args.threshold)
+    for name, previous, current, ratio, status in rows:
+        before = _format_time(previous) if previous is not None else '-'
+        change = f"{ratio:.2f}x" if ratio is not None else ''
+        print(f"{name:<28} {before:>10} -> {_format_time(current):>10} {change:>7}  {status}")
+    regressions = [row for row in rows if row[4] == 'regression']
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
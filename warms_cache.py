@@ -0,0 +1,148 @@
+"""Cache delle curve di spinta calcolate.
+
+Le curve sono indicizzate dai parametri metrici che le determinano,
+arrotondati alla risoluzione degli slider, più l'opzione della fase ad
+aria, il metodo di integrazione, gli eventuali coefficienti del modello
+diversi da quelli predefiniti e il profilo di campionamento, se indicato.
+La memoria occupata è limitata con eliminazione LRU; una directory
+opzionale conserva i risultati tra una sessione e l'altra (per
+l'interfaccia: variabile d'ambiente WARMS_CACHE_DIR).
+"""
+import hashlib
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+
+import numpy as np
+
+from warms_core import MODEL_COEFFICIENTS, CurveResult, calculate_thrust_curve, model_coefficients
+from warms_trace import span
+
+# Versione del formato e del modello: cambiarla invalida le cache su disco
+CACHE_VERSION = 2
+
+# Risoluzione di arrotondamento dei parametri (unità metriche)
+CACHE_RESOLUTION = {
+    'bottle_volume': 0.01,  # L
+    'water_ratio': 0.1,  # %
+    'pressure': 0.01,  # bar
+    'nozzle_diameter': 0.01,  # mm
+}
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def quantize(bottle_volume, water_ratio, pressure, nozzle_diameter):
+    """Arrotonda i parametri alla risoluzione della cache"""
+    values = (bottle_volume, water_ratio, pressure, nozzle_diameter)
+    return tuple(round(round(value / step) * step, 6)
+                 for value, step in zip(values, CACHE_RESOLUTION.values()))
+
+
+class CurveCache:
+    """Cache LRU delle curve di spinta con persistenza opzionale su disco"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()  # La cache è condivisa con i thread di calcolo
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def curve(self, bottle_volume, water_ratio, pressure, nozzle_diameter, include_air_phase=False,
+              method='fixed', coefficients=None, sampling=None):
+        """Restituisce la curva per i parametri dati, calcolandola solo se necessario.
+
+        La curva viene calcolata con i parametri arrotondati, così il
+        risultato non dipende da quale valore entro la risoluzione è stato
+        richiesto per primo. sampling è il profilo di campionamento di
+        calculate_thrust_curve. Restituisce una CurveResult, con gli array in
+        sola lettura e le grandezze derivate già calcolate.
+        """
+        params = quantize(bottle_volume, water_ratio, pressure, nozzle_diameter)
+        key = params + (bool(include_air_phase), method)
+        coefficients = model_coefficients(coefficients)
+        if coefficients != MODEL_COEFFICIENTS:
+            # Le chiavi dei coefficienti predefiniti restano quelle di sempre
+            key += (tuple(sorted(coefficients.items())),)
+        if sampling is not None:
+            key += (('sampling', sampling),)
+        with self._lock:
+            return self._lookup(key, params, coefficients, sampling)
+
+    def _lookup(self, key, params, coefficients=None, sampling=None):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+        entry = self._load(key)
+        if entry is None:
+            self.misses += 1
+            include_air_phase, method = key[len(params):len(params) + 2]
+            with span('physics'):
+                t, thrust, water_end = calculate_thrust_curve(*params, include_air_phase, method,
+                                                              coefficients=coefficients, sampling=sampling)
+            with span('integration'):
+                entry = CurveResult(t, thrust, water_end)
+            self._save(key, entry)
+        else:
+            self.hits += 1
+
+        self._store(key, entry)
+        return entry
+
+    def clear(self):
+        """Svuota la cache in memoria (i file su disco restano)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._bytes += entry.nbytes
+        # Elimina le curve usate meno di recente oltre il limite di memoria
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, old = self._entries.popitem(last=False)
+            self._bytes -= old.nbytes
+
+    def _path(self, key):
+        digest = hashlib.sha1(repr((CACHE_VERSION,) + key).encode()).hexdigest()
+        return os.path.join(self.directory, digest + '.npz')
+
+    def _load(self, key):
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                return CurveResult(data['t'], data['thrust'], data['water_end_time'])
+        except FileNotFoundError:
+            return None
+        except (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile):
+            # File troncato o corrotto: vale come assenza e viene eliminato
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+    def _save(self, key, entry):
+        if not self.directory:
+            return
+        path = self._path(key)
+        temp_path = path + '.tmp.npz'
+        try:
+            np.savez(temp_path, t=entry.t, thrust=entry.thrust, water_end_time=entry.water_end_time)
+            os.replace(temp_path, path)
+        except OSError:
+            pass  # La cache su disco è solo un'ottimizzazione
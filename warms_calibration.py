@@ -0,0 +1,238 @@
+"""Calibrazione dei coefficienti del modello sulle curve misurate.
+
+Il coefficiente di scarico, l'efficienza della fase aria e il prodotto R⋅T
+dell'aria (MODEL_COEFFICIENTS) sono stime a priori. Il modulo li adatta a
+una o più prove statiche minimizzando lo scarto quadratico tra la spinta
+misurata e quella calcolata, normalizzata sul picco di ogni prova, con un
+Levenberg–Marquardt sui logaritmi dei fattori di scala. Tutte le varianti
+dei coefficienti di un'iterazione (le differenze finite dello jacobiano e
+i tentativi con smorzamenti diversi) sono valutate insieme, per tutte le
+prove, in un'unica chiamata a thrust_curve_batch.
+
+Nel modello a passo fisso la spinta della fase aria dipende solo dal
+prodotto cd⋅air_efficiency⋅gas_rt: un debole termine a priori verso i
+valori predefiniti rende il problema ben posto quando si adattano insieme.
+
+I coefficienti adattati si salvano come profili con nome in un file JSON
+(variabile d'ambiente WARMS_PROFILES, default ~/.warms_profiles.json).
+"""
+import json
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from warms_core import MODEL_COEFFICIENTS, interp_rows, thrust_curve_batch
+
+CalibrationRun = namedtuple('CalibrationRun', [
+    'config',  # MotorConfig della prova
+    't',  # tempi misurati in ms, da 0 all'accensione
+    'thrust',  # spinta misurata in N
+])
+
+CalibrationResult = namedtuple('CalibrationResult', [
+    'coefficients',  # {nome: valore} adattati (gli altri restano predefiniti)
+    'rms',  # scarto quadratico medio complessivo, come frazione del picco
+    'run_rms',  # scarto di ogni prova, come frazione del suo picco
+    'iterations',
+])
+
+# Intervalli ammessi per i coefficienti
+CALIBRATION_LIMITS = {
+    'cd': (0.3, 1.0),
+    'air_efficiency': (0.05, 1.0),
+    'gas_rt': (60000.0, 110000.0),  # J/kg
+}
+
+DEFAULT_PARAMETERS = ('cd', 'air_efficiency')
+N_FIT_POINTS = 200  # punti di confronto per prova
+TAIL_FRACTION = 0.25  # la griglia prosegue oltre la fine misurata (spinta nulla)
+PRIOR_WEIGHT = 1e-4  # peso del termine a priori sui logaritmi dei fattori
+GRID_STEPS = 7  # ricerca iniziale su griglia, per parametro
+MAX_ITERATIONS = 30
+DAMPING_FACTORS = (0.1, 1.0, 10.0, 100.0)
+# Passo delle differenze finite sui log-fattori: ampio perché la spinta ha salti
+# (fine della fase acqua) che con passi piccoli falserebbero lo jacobiano
+FD_STEP = 1e-2
+
+PROFILES_VERSION = 1
+DEFAULT_PROFILES_FILE = os.path.join(os.path.expanduser('~'), '.warms_profiles.json')
+
+
+class _Problem:
+    """Prove raggruppate per fase aria e valutazione in blocco dei residui"""
+
+    def __init__(self, runs, parameters):
+        if not runs:
+            raise ValueError("At least one measured run is needed")
+        self.parameters = parameters
+        self.defaults = np.array([MODEL_COEFFICIENTS[name] for name in parameters], dtype=float)
+        limits = np.array([CALIBRATION_LIMITS[name] for name in parameters], dtype=float)
+        self.low, self.high = np.log(limits[:, 0] / self.defaults), np.log(limits[:, 1] / self.defaults)
+
+        # Gruppi per fase aria; indices riporta all'ordine di runs le prove dei residui
+        self.groups = []
+        indices = []
+        for air in (False, True):
+            group = [i for i, run in enumerate(runs) if run.config.include_air_phase == air]
+            if not group:
+                continue
+            indices.extend(group)
+            selected = [runs[i] for i in group]
+            grids, measured = [], []
+            for run in selected:
+                t, thrust = np.asarray(run.t, dtype=float), np.asarray(run.thrust, dtype=float)
+                peak = thrust.max()
+                if len(t) < 2 or peak <= 0:
+                    raise ValueError("Measured curves need at least two points and a positive peak")
+                grid = np.linspace(0, t[-1] * (1 + TAIL_FRACTION), N_FIT_POINTS)
+                grids.append(grid)
+                measured.append(np.interp(grid, t, thrust, right=0.0) / peak)
+            columns = [np.array([getattr(run.config, name) for run in selected], dtype=float)
+                       for name in ('bottle_volume', 'water_ratio', 'pressure', 'nozzle_diameter')]
+            peaks = np.array([np.max(run.thrust) for run in selected])
+            self.groups.append((air, columns, np.array(grids), np.array(measured), peaks))
+        self.indices = np.array(indices)
+        self.n_runs = len(runs)
+
+    def coefficients(self, x):
+        return dict(zip(self.parameters, (self.defaults * np.exp(x)).tolist()))
+
+    def residuals(self, candidates):
+        """Residui (candidati × prove × punti) per un blocco di vettori di log-fattori"""
+        candidates = np.atleast_2d(candidates)
+        k = len(candidates)
+        values = self.defaults * np.exp(candidates)
+        parts = []
+        for air, columns, grids, measured, peaks in self.groups:
+            n = len(peaks)
+            coefficients = {name: np.repeat(values[:, i], n) for i, name in enumerate(self.parameters)}
+            t, thrust, _ = thrust_curve_batch(*(np.tile(column, k) for column in columns),
+                                              include_air_phase=air, **coefficients)
+            simulated = interp_rows(np.tile(grids, (k, 1)), t, thrust) / np.tile(peaks, k)[:, np.newaxis]
+            parts.append((simulated - np.tile(measured, (k, 1))).reshape(k, n, -1))
+        return np.concatenate(parts, axis=1)
+
+    def costs(self, candidates):
+        """Somma dei quadrati (residui normalizzati più termine a priori) di ogni candidato"""
+        candidates = np.atleast_2d(candidates)
+        residuals = self.residuals(candidates)
+        return (np.square(residuals).sum(axis=(1, 2)) / residuals[0].size
+                + PRIOR_WEIGHT * np.square(candidates).sum(axis=1)), residuals
+
+
+def calibrate(runs, parameters=DEFAULT_PARAMETERS, max_iterations=MAX_ITERATIONS):
+    """Adatta i coefficienti del modello (nomi in parameters) alle prove misurate.
+
+    runs è una sequenza di CalibrationRun. Il calcolo parte dal migliore
+    punto di una griglia sui CALIBRATION_LIMITS e prosegue con
+    Levenberg–Marquardt entro gli stessi limiti; il confronto usa il
+    modello a passo fisso.
+    """
+    parameters = tuple(parameters)
+    unknown = set(parameters) - set(CALIBRATION_LIMITS)
+    if unknown or not parameters:
+        raise ValueError(f"Unknown calibration parameters: {', '.join(sorted(unknown)) or '-'}")
+    problem = _Problem(runs, parameters)
+    size = len(parameters)
+
+    # Ricerca iniziale su griglia (per più di tre parametri solo lungo gli assi)
+    axes = [np.linspace(low, high, GRID_STEPS) for low, high in zip(problem.low, problem.high)]
+    if size <= 3:
+        starts = np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, size)
+    else:
+        starts = np.concatenate([np.where(np.arange(size) == i, axis[:, np.newaxis], 0.0)
+                                 for i, axis in enumerate(axes)])
+    starts = np.vstack([np.zeros(size), starts])
+    costs, _ = problem.costs(starts)
+    x = starts[np.argmin(costs)]
+    cost = costs.min()
+
+    damping = 1e-2
+    iterations = 0
+    for iterations in range(1, max_iterations + 1):
+        # Punto corrente e differenze finite in avanti in un solo blocco
+        steps = x + FD_STEP * np.vstack([np.zeros(size), np.eye(size)])
+        residuals = problem.residuals(steps).reshape(size + 1, -1)
+        base = residuals[0]
+        jacobian = (residuals[1:] - base).T / FD_STEP
+        scale = residuals.shape[1]
+        gradient = jacobian.T @ base / scale + PRIOR_WEIGHT * x
+        hessian = jacobian.T @ jacobian / scale + PRIOR_WEIGHT * np.eye(size)
+
+        # Più smorzamenti valutati insieme; si tiene il migliore
+        trials = []
+        for factor in DAMPING_FACTORS:
+            matrix = hessian + damping * factor * np.diag(np.diag(hessian) + 1e-12)
+            trials.append(np.clip(x - np.linalg.solve(matrix, gradient), problem.low, problem.high))
+        trials = np.array(trials)
+        trial_costs, _ = problem.costs(trials)
+        best = int(np.argmin(trial_costs))
+        if trial_costs[best] < cost:
+            improvement = cost - trial_costs[best]
+            step = np.abs(trials[best] - x).max()
+            x, cost = trials[best], trial_costs[best]
+            damping = max(damping * DAMPING_FACTORS[best] * 0.3, 1e-9)
+            if improvement < 1e-10 * max(cost, 1e-12) or step < 1e-7:
+                break
+        else:
+            damping *= 10 * DAMPING_FACTORS[-1]
+            if damping > 1e8:
+                break
+
+    residuals = problem.residuals(x)[0]
+    # I residui seguono l'ordine dei gruppi: gli scarti tornano nell'ordine delle prove
+    run_rms = np.empty(problem.n_runs)
+    run_rms[problem.indices] = np.sqrt(np.mean(np.square(residuals), axis=1))
+    return CalibrationResult(
+        coefficients=problem.coefficients(x),
+        rms=float(np.sqrt(np.mean(np.square(residuals)))),
+        run_rms=run_rms,
+        iterations=iterations,
+    )
+
+
+def profiles_file(path=None):
+    return path or os.environ.get('WARMS_PROFILES') or DEFAULT_PROFILES_FILE
+
+
+def load_profiles(path=None):
+    """Profili salvati: {nome: {coefficiente: valore}} (vuoto se il file manca)"""
+    try:
+        with open(profiles_file(path), encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get('version') != PROFILES_VERSION:
+        return {}
+    return {name: {key: float(value) for key, value in profile['coefficients'].items()
+                   if key in MODEL_COEFFICIENTS}
+            for name, profile in data.get('profiles', {}).items()}
+
+
+def save_profile(name, coefficients, path=None, rms=None, runs=None):
+    """Aggiunge o sostituisce un profilo nel file dei profili.
+
+    Un file esistente ma illeggibile o di un'altra versione non viene
+    sovrascritto (perderebbe gli altri profili): solleva ValueError.
+    """
+    path = profiles_file(path)
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        data = {'version': PROFILES_VERSION, 'profiles': {}}
+    except ValueError as e:
+        raise ValueError(f"{path} is not a valid profiles file, not overwriting it: {e}")
+    if not isinstance(data, dict) or data.get('version') != PROFILES_VERSION:
+        raise ValueError(f"{path} is not a version {PROFILES_VERSION} profiles file, not overwriting it")
+    profile = {'coefficients': {key: float(value) for key, value in coefficients.items()}}
+    if rms is not None:
+        profile['rms'] = float(rms)
+    if runs is not None:
+        profile['runs'] = int(runs)
+    data.setdefault('profiles', {})[name] = profile
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(temp_path, path)
@@ -0,0 +1,249 @@
+"""Convergenza del campionamento a passo fisso: risoluzione minima per regime.
+
+Il modello a passo fisso (thrust_curve_batch) campiona la fase acqua e la
+fase aria con un numero fisso di punti, e gli impulsi sono integrati con i
+trapezi su quei punti. Per un insieme di configurazioni che copre gli
+intervalli degli slider (i vertici e punti casuali all'interno) questo
+strumento calcola impulso totale, spinta massima e tempo di combustione a
+risoluzioni crescenti, li confronta con una curva di riferimento molto
+fitta e riporta per ogni profilo di ERROR_BUDGETS la risoluzione meno
+costosa che rispetta il budget di errore relativo. I regimi sono due:
+solo fase acqua (conta solo il numero di campioni dell'acqua) e con fase
+aria (si cerca anche quello dell'aria).
+
+Le risoluzioni scelte vanno riportate in warms_core.SAMPLING_PROFILES, che
+l'interfaccia usa per la precisione selezionata; --check verifica che i
+profili attuali rispettino ancora i budget (codice di uscita 1 altrimenti),
+ad esempio dopo una modifica del modello.
+
+    python warms_convergence.py
+    python warms_convergence.py --configs 512 --percentile 95
+    python warms_convergence.py --check
+"""
+import argparse
+import itertools
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from warms_core import (PARAM_RANGES, SAMPLING_PROFILES, calculate_thrust_curve, curve_metrics, model_coefficients,
+                        thrust_curve_batch)
+
+CONVERGENCE_METRICS = ('total_impulse', 'peak_thrust', 'burn_time')
+REGIMES = {'water': False, 'air': True}  # regime -> include_air_phase
+
+# Campioni per fase provati, in progressione geometrica (fattore √2)
+RESOLUTIONS = (25, 35, 50, 70, 100, 140, 200, 280, 400, 560, 800, 1120, 1600, 2240, 3200)
+REFERENCE_SAMPLES = 25600  # campioni per fase della curva di riferimento
+N_CONFIGS = 256  # configurazioni casuali, oltre ai vertici degli intervalli
+CHUNK_SIZE = 32  # configurazioni per blocco del calcolo di riferimento (memoria)
+TIMING_REPEAT = 20
+
+# Errore relativo massimo ammesso per ogni grandezza
+ERROR_BUDGETS = {
+    'fast': {'total_impulse': 0.01, 'peak_thrust': 0.01, 'burn_time': 0.05},
+    'accurate': {'total_impulse': 0.001, 'peak_thrust': 0.001, 'burn_time': 0.01},
+}
+
+# Ordine dei parametri di thrust_curve_batch
+_PARAMS = ('bottle_volume', 'water_ratio', 'pressure', 'nozzle_diameter')
+
+ConvergenceRow = namedtuple('ConvergenceRow', [
+    'n_water',
+    'n_air',  # 0 nel regime senza fase aria
+    'errors',  # grandezza -> errore relativo (percentile sulle configurazioni)
+    'worst',  # grandezza -> indice della configurazione con l'errore massimo
+    'time_per_curve',  # s, calculate_thrust_curve su una configurazione tipica
+])
+
+
+def sample_configs(n=N_CONFIGS, seed=0):
+    """Vertici degli intervalli degli slider più n configurazioni casuali, come array per parametro"""
+    corners = np.array(list(itertools.product(*(PARAM_RANGES[name] for name in _PARAMS))))
+    rng = np.random.default_rng(seed)
+    inner = np.column_stack([rng.uniform(*PARAM_RANGES[name], n) for name in _PARAMS])
+    return tuple(np.concatenate([corners, inner]).T)
+
+
+def batch_metrics(configs, include_air_phase, n_water, n_air, coefficients=None, chunk_size=None):
+    """Grandezze di CONVERGENCE_METRICS per tutte le configurazioni, a blocchi se richiesto"""
+    coefficients = model_coefficients(coefficients)
+    size = len(configs[0])
+    chunk_size = chunk_size or size
+    results = {name: np.empty(size) for name in CONVERGENCE_METRICS}
+    for start in range(0, size, chunk_size):
+        chunk = [values[start:start + chunk_size] for values in configs]
+        metrics = curve_metrics(*thrust_curve_batch(*chunk, include_air_phase, n_water=n_water, n_air=n_air,
+                                                    **coefficients))
+        for name in CONVERGENCE_METRICS:
+            results[name][start:start + chunk_size] = metrics[name]
+    return results
+
+
+def reference_metrics(configs, include_air_phase, samples=REFERENCE_SAMPLES, coefficients=None):
+    """Grandezze di riferimento, con samples campioni per fase"""
+    return batch_metrics(configs, include_air_phase, samples, samples, coefficients, CHUNK_SIZE)
+
+
+def relative_errors(metrics, reference):
+    """Errore relativo di ogni grandezza per ogni configurazione"""
+    return {name: np.abs(metrics[name] - reference[name]) / np.maximum(np.abs(reference[name]), 1e-12)
+            for name in CONVERGENCE_METRICS}
+
+
+def time_per_curve(include_air_phase, n_water, n_air, repeat=TIMING_REPEAT):
+    """Tempo di calculate_thrust_curve per la configurazione predefinita (il minimo di repeat misure)"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        calculate_thrust_curve(2.0, 33.0, 6.0, 8.0, include_air_phase, sampling=(n_water, max(n_air, 2)))
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+class ConvergenceStudy:
+    """Errori delle grandezze alle varie risoluzioni, per un regime e un insieme di configurazioni.
+
+    Le righe già calcolate vengono conservate: la ricerca dei profili
+    valuta ogni risoluzione una sola volta.
+    """
+
+    def __init__(self, regime, configs=None, percentile=100, coefficients=None):
+        if regime not in REGIMES:
+            raise ValueError(f"Unknown regime: {regime}")
+        self.regime = regime
+        self.include_air_phase = REGIMES[regime]
+        self.configs = sample_configs() if configs is None else configs
+        self.percentile = percentile
+        self.coefficients = model_coefficients(coefficients)
+        self.reference = reference_metrics(self.configs, self.include_air_phase, coefficients=self.coefficients)
+        self._rows = {}
+
+    def row(self, n_water, n_air=0):
+        """Riga di convergenza per n_water e n_air campioni (n_air ignorato senza fase aria)"""
+        if not self.include_air_phase:
+            n_air = 0
+        key = (n_water, n_air)
+        if key not in self._rows:
+            metrics = batch_metrics(self.configs, self.include_air_phase, n_water, max(n_air, 2),
+                                    self.coefficients)
+            errors = relative_errors(metrics, self.reference)
+            self._rows[key] = ConvergenceRow(
+                n_water, n_air,
+                {name: float(np.percentile(values, self.percentile)) for name, values in errors.items()},
+                {name: int(np.argmax(values)) for name, values in errors.items()},
+                time_per_curve(self.include_air_phase, n_water, n_air))
+        return self._rows[key]
+
+    def rows(self, n_water=None):
+        """Righe di tutte le RESOLUTIONS (della fase aria, per n_water campioni d'acqua, con fase aria)"""
+        if not self.include_air_phase:
+            return [self.row(n) for n in RESOLUTIONS]
+        return [self.row(n_water, n) for n in RESOLUTIONS]
+
+    def config(self, index):
+        """Parametri (L, %, bar, mm) di una configurazione dell'insieme"""
+        return dict(zip(_PARAMS, (float(values[index]) for values in self.configs)))
+
+    def select(self, budget, n_water=None):
+        """Riga meno costosa da cui il budget è rispettato anche a tutte le risoluzioni maggiori.
+
+        L'errore del tempo di combustione non decresce in modo monotono (la
+        fine della combustione cade sul primo campione dopo lo spegnimento):
+        una risoluzione che rispetta il budget per caso non basta. Senza
+        fase aria si sceglie n_water, con fase aria n_air per n_water
+        campioni d'acqua. Restituisce None se nessuna risoluzione va bene.
+        """
+        selected = None
+        for row in reversed(self.rows(n_water)):
+            if any(row.errors[name] > limit for name, limit in budget.items()):
+                break
+            selected = row
+        return selected
+
+
+def select_profiles(budgets=ERROR_BUDGETS, configs=None, percentile=100, coefficients=None):
+    """Risoluzioni (n_water, n_air) di ogni profilo e studi dei due regimi.
+
+    n_water è quella scelta senza fase aria, aumentata se con la fase aria
+    nessun n_air rispetta il budget; il profilo è None se il budget non è
+    raggiungibile entro RESOLUTIONS.
+    """
+    configs = sample_configs() if configs is None else configs
+    studies = {regime: ConvergenceStudy(regime, configs, percentile, coefficients) for regime in REGIMES}
+    profiles = {}
+    for name, budget in budgets.items():
+        profiles[name] = None
+        water = studies['water'].select(budget)
+        if water is None:
+            continue
+        for n_water in RESOLUTIONS[RESOLUTIONS.index(water.n_water):]:
+            air = studies['air'].select(budget, n_water)
+            if air is not None:
+                profiles[name] = (n_water, air.n_air)
+                break
+    return profiles, studies
+
+
+def _format_row(row):
+    errors = '  '.join(f"{row.errors[name]:>13.2e}" for name in CONVERGENCE_METRICS)
+    return f"{row.n_water:>7} {row.n_air:>5}  {errors}  {row.time_per_curve * 1e6:>9.1f}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="WaRMS sampling convergence study")
+    parser.add_argument('--configs', type=int, default=N_CONFIGS,
+                        help="random configurations besides the corners (default %(default)s)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--percentile', type=float, default=100,
+                        help="percentile of the relative errors over the configurations (default: worst case)")
+    parser.add_argument('--check', action='store_true',
+                        help="exit with status 1 if the current SAMPLING_PROFILES exceed their budgets")
+    args = parser.parse_args(argv)
+    if not 0 <= args.percentile <= 100:
+        parser.error("the percentile must be between 0 and 100")
+
+    configs = sample_configs(args.configs, args.seed)
+    profiles, studies = select_profiles(ERROR_BUDGETS, configs, args.percentile)
+    header = (f"{'n_water':>7} {'n_air':>5}  " + '  '.join(f"{name:>13}" for name in CONVERGENCE_METRICS)
+              + f"  {'µs/curve':>9}")
+    # Tabella della fase aria per ogni n_water dei profili
+    tables = [('water', None)] + [('air', n_water) for n_water in
+                                  sorted({profile[0] for profile in profiles.values() if profile is not None})]
+    for regime, n_water in tables:
+        title = "water phase only" if regime == 'water' else f"with air phase, n_water={n_water}"
+        print(f"{title} ({len(configs[0])} configurations, p{args.percentile:g} relative error)")
+        print(header)
+        for row in studies[regime].rows(n_water):
+            print(_format_row(row))
+        print()
+
+    print("SAMPLING_PROFILES = {")
+    for name, profile in profiles.items():
+        print(f"    '{name}': {profile},")
+    print("}")
+
+    if not args.check:
+        return 0
+    failures = []
+    for name, budget in ERROR_BUDGETS.items():
+        current = SAMPLING_PROFILES.get(name)
+        if current is None:
+            failures.append(f"{name}: missing")
+            continue
+        for regime, study in studies.items():
+            row = study.row(*current)
+            over = [metric for metric, limit in budget.items() if row.errors[metric] > limit]
+            if over:
+                worst = study.config(row.worst[over[0]])
+                failures.append(f"{name} {current}, {regime}: {', '.join(over)} over budget (worst at "
+                                + ', '.join(f"{key}={value:.3g}" for key, value in worst.items()) + ")")
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
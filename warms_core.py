@@ -0,0 +1,728 @@
+"""Nucleo di calcolo di WaRMS, utilizzabile senza interfaccia grafica.
+
+Contiene il modello fisico della curva di spinta, l'integrazione degli
+impulsi, la classificazione NAR e la scrittura dei file RASP. Il modulo
+dipende solo da numpy e può essere importato su server senza display o in
+processi di calcolo paralleli.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+
+from warms_trace import span
+
+# Costanti fisiche del modello
+GAMMA = 1.4  # Rapporto calore specifico aria
+RHO_WATER = 1000  # kg/m³
+CD = 0.95  # Coefficiente di scarico
+AIR_EFFICIENCY = 0.7  # Fattore di efficienza della spinta in fase aria
+P_ATM = 1e5  # Pa
+R_AIR = 287  # J/(kg⋅K)
+T_AIR = 288  # K
+
+# Coefficienti del modello calibrabili (vedi warms_calibration), con i valori predefiniti
+MODEL_COEFFICIENTS = {
+    'cd': CD,
+    'air_efficiency': AIR_EFFICIENCY,
+    'gas_rt': R_AIR * T_AIR,  # J/kg
+}
+
+# Campionamento della curva di spinta
+N_WATER_SAMPLES = 500
+N_AIR_SAMPLES = 300
+AIR_TIME_ESTIMATE = 0.1  # secondi stimati per fase aria
+
+# Profili di campionamento (campioni delle fasi acqua e aria) per calculate_thrust_curve:
+# le risoluzioni minime entro i budget di errore di warms_convergence.ERROR_BUDGETS
+SAMPLING_PROFILES = {
+    'fast': (280, 50),
+    'accurate': (560, 200),
+}
+
+# Intervalli dei parametri operativi (gli stessi degli slider in unità metriche)
+PARAM_RANGES = {
+    'pressure': (1.0, 10.0),  # bar
+    'water_ratio': (10.0, 90.0),  # %
+    'nozzle_diameter': (4.0, 12.0),  # mm
+    'bottle_volume': (0.5, 5.0),  # L
+}
+
+# Limiti superiori di impulso (N⋅s) delle classi NAR
+IMPULSE_CLASS_BOUNDARIES = {
+    0.625: '1/4A', 1.25: '1/2A', 2.5: 'A', 5.0: 'B',
+    10.0: 'C', 20.0: 'D', 40.0: 'E', 80.0: 'F',
+    160.0: 'G', 320.0: 'H', 640.0: 'I'
+}
+
+
+def thrust_curve_batch(bottle_volume, water_ratio, pressure, nozzle_diameter, include_air_phase=False,
+                       cd=CD, air_efficiency=AIR_EFFICIENCY, gas_rt=R_AIR * T_AIR,
+                       n_water=N_WATER_SAMPLES, n_air=N_AIR_SAMPLES):
+    """Calcola in blocco le curve di spinta per array di configurazioni.
+
+    I parametri (in unità metriche: L, %, bar, mm) possono essere scalari o
+    array e vengono combinati con il broadcasting di numpy, così come i
+    coefficienti del modello (coefficiente di scarico cd, efficienza della
+    fase aria e prodotto R⋅T dell'aria, vedi MODEL_COEFFICIENTS). n_water e
+    n_air sono i punti di campionamento delle due fasi. Restituisce i tempi
+    in ms e la spinta in N come array 2-D (una riga per configurazione) e il
+    tempo di fine fase acqua in ms per ogni riga.
+    """
+    params = np.broadcast_arrays(*(np.atleast_1d(np.asarray(p, dtype=float)).ravel()
+                                   for p in (bottle_volume, water_ratio, pressure, nozzle_diameter,
+                                             cd, air_efficiency, gas_rt)))
+    (bottle_volume, water_ratio, pressure, nozzle_diameter,
+     cd, air_efficiency, gas_rt) = (p[:, np.newaxis] for p in params)
+    
+    # Conversione unità (assumendo input in unità metriche)
+    water_volume = bottle_volume * water_ratio/100
+    initial_pressure = pressure * 1e5 + P_ATM  # bar -> Pa assoluti
+    nozzle_area = np.pi * (nozzle_diameter/2000)**2  # mm -> m
+    initial_air_volume = bottle_volume - water_volume
+    
+    # FASE ACQUA: Calcolo tempo di esaurimento acqua
+    water_time = 0.5 * water_volume / (cd * nozzle_area * np.sqrt(2 * RHO_WATER * (initial_pressure - P_ATM)))
+    
+    # Punti temporali per fase acqua, una riga per configurazione
+    t_water = np.linspace(0, water_time[:, 0], n_water, axis=-1)
+    
+    # Volume acqua rimanente e pressione corrente (espansione adiabatica dell'aria)
+    water_remaining = np.maximum(0, water_volume * (1 - t_water/water_time))
+    air_volume = bottle_volume - water_remaining
+    with np.errstate(divide='ignore', invalid='ignore'):
+        current_pressure = np.where((air_volume > 0) & (initial_air_volume > 0),
+                                    initial_pressure * (initial_air_volume/air_volume)**GAMMA,
+                                    initial_pressure)
+    
+    overpressure = np.maximum(current_pressure - P_ATM, 0)
+    exit_velocity = cd * np.sqrt(2 * overpressure / RHO_WATER)
+    mass_flow = cd * nozzle_area * np.sqrt(2 * RHO_WATER * overpressure)
+    thrust_water = np.where((water_remaining > 0) & (current_pressure > P_ATM),
+                            mass_flow * exit_velocity, 0.0)
+    
+    if not include_air_phase:
+        return t_water * 1000, thrust_water, t_water[:, -1] * 1000  # tempo in ms
+    
+    # FASE ARIA: pressione all'inizio della fase aria e volume "virtuale" crescente
+    air_start_pressure = initial_pressure * (initial_air_volume/bottle_volume)**GAMMA
+    t_air = np.linspace(0, AIR_TIME_ESTIMATE, n_air)
+    volume_ratio = 1 + t_air/AIR_TIME_ESTIMATE * 2
+    current_pressure = air_start_pressure * (1/volume_ratio)**GAMMA
+    
+    # Velocità di uscita aria (flusso sonico critico oltre 1.89, altrimenti subsonico)
+    pressure_ratio = current_pressure / P_ATM
+    subsonic = 2 * GAMMA / (GAMMA-1) * gas_rt * (1 - (1/pressure_ratio)**((GAMMA-1)/GAMMA))
+    exit_velocity = np.where(pressure_ratio > 1.89, np.sqrt(GAMMA * gas_rt),
+                             np.sqrt(np.maximum(subsonic, 0)))
+    
+    # Densità aria all'uscita e portata massica
+    rho_air_exit = 1.225 * (current_pressure / P_ATM)
+    mass_flow = cd * nozzle_area * rho_air_exit * exit_velocity
+    
+    # La pressione decresce monotonamente: oltre la pressione ambiente la spinta è nulla
+    thrust_air = np.where(current_pressure > P_ATM, mass_flow * exit_velocity * air_efficiency, 0.0)
+    
+    # Combina le due fasi
+    t_total = np.concatenate([t_water, t_air + water_time], axis=1)
+    thrust_total = np.concatenate([thrust_water, thrust_air], axis=1)
+    
+    return t_total * 1000, thrust_total, water_time[:, 0] * 1000  # tempo in ms
+
+
+# Coefficienti di Dormand–Prince 5(4) per l'integrazione adattiva
+_DP_A = (
+    (),
+    (1/5,),
+    (3/40, 9/40),
+    (44/45, -56/15, 32/9),
+    (19372/6561, -25360/2187, 64448/6561, -212/729),
+    (9017/3168, -355/33, 46732/5247, 49/176, -5103/18656),
+    (35/384, 0, 500/1113, 125/192, -2187/6784, 11/84),
+)
+_DP_E = np.array([71/57600, 0, -71/16695, 71/1920, -17253/339200, 22/525, -1/40])
+
+DEFAULT_RTOL = 1e-4
+
+
+def _dp_step(rhs, y, h, f0):
+    """Un passo di Dormand–Prince da y con derivata iniziale f0.
+
+    Restituisce la soluzione di ordine 5, la stima d'errore e la derivata
+    nel nuovo punto (riutilizzata come primo stadio del passo successivo).
+    Con stati 2-D (una colonna per punto) e h 1-D esegue un passo diverso
+    per ogni colonna.
+    """
+    k = [f0]
+    for a in _DP_A[1:]:
+        # L'ultima riga coincide con i pesi di ordine 5 (FSAL)
+        y_new = y + h * sum(coef * ki for coef, ki in zip(a, k))
+        k.append(rhs(y_new))
+    return y_new, h * np.tensordot(_DP_E, k, axes=1), k[-1]
+
+
+def _integrate_until(rhs, y0, events, h0, rtol, max_steps=10000):
+    """Integra un sistema autonomo a passo adattivo fino al primo evento.
+
+    Gli eventi sono funzioni dello stato positive durante l'integrazione; il
+    passo che ne attraversa lo zero viene accorciato (regula falsi) in modo
+    da terminare esattamente sull'evento. Restituisce tempi, stati e
+    derivate nei punti accettati e l'indice dell'evento finale.
+    """
+    atol = rtol * 1e-3 * np.abs(y0)
+    t, y, h = 0.0, y0, h0
+    f = rhs(y)
+    ts, ys, fs = [t], [y], [f]
+    
+    for _ in range(max_steps):
+        y_new, error, f_new = _dp_step(rhs, y, h, f)
+        scale = atol + rtol * np.maximum(np.abs(y), np.abs(y_new))
+        error_norm = np.sqrt(np.mean((error / scale)**2))
+        
+        if not error_norm <= 1:  # Rifiuta anche stime non finite
+            if not np.isfinite(error_norm):
+                error_norm = 1e3
+            h *= max(0.2, 0.9 * error_norm**-0.2)
+            continue
+        
+        crossed = [i for i, event in enumerate(events) if event(y_new) <= 0]
+        if crossed:
+            # Localizza l'evento che si verifica per primo all'interno del passo
+            first = None
+            for i in crossed:
+                low, g_low, high, g_high = 0.0, events[i](y), h, events[i](y_new)
+                side = 0
+                for _ in range(50):
+                    mid = low - g_low * (high - low) / (g_high - g_low)
+                    g_mid = events[i](_dp_step(rhs, y, mid, f)[0])
+                    if abs(g_mid) <= 1e-12 * abs(events[i](y0)) or high - low <= 1e-12 * h:
+                        break
+                    # Illinois: se lo stesso estremo resta fermo due volte se ne dimezza il valore,
+                    # per evitare la convergenza da un solo lato
+                    if g_mid > 0:
+                        low, g_low = mid, g_mid
+                        if side == 1:
+                            g_high /= 2
+                        side = 1
+                    else:
+                        high, g_high = mid, g_mid
+                        if side == -1:
+                            g_low /= 2
+                        side = -1
+                if first is None or mid < first[1]:
+                    first = (i, mid)
+            event_index, h_event = first
+            y_event, _, f_event = _dp_step(rhs, y, h_event, f)
+            ts.append(t + h_event)
+            ys.append(y_event)
+            fs.append(f_event)
+            return np.array(ts), np.array(ys), np.array(fs), event_index
+        
+        t, y, f = t + h, y_new, f_new
+        ts.append(t)
+        ys.append(y)
+        fs.append(f)
+        h *= min(5.0, 0.9 * max(error_norm, 1e-10)**-0.2)
+        
+    raise RuntimeError("Adaptive integration did not reach a terminating event")
+
+
+def _sample_thrust(rhs, ts, ys, fs, thrust, rtol, max_substeps=64):
+    """Campiona la spinta lungo i passi accettati.
+
+    Ogni passo viene suddiviso quanto basta perché l'errore della regola dei
+    trapezi sul suo impulso (stimato con Simpson) resti entro rtol: le
+    grandezze integrate a valle restano così accurate anche con passi
+    lunghi. Lo stato all'interno di un passo si ottiene con un passo più
+    corto di Dormand–Prince dal nodo iniziale, accurato quanto i nodi
+    (un'interpolazione cubica non lo è sui passi lunghi).
+    """
+    h = np.diff(ts)
+    
+    def states(y, f, dt):
+        # Un passo per ogni riga di y e f, in blocco
+        return _dp_step(rhs, y.T, dt, f.T)[0].T
+    
+    thrust_nodes = thrust(ys)
+    thrust_mid = thrust(states(ys[:-1], fs[:-1], h / 2))
+    trapezoid = (thrust_nodes[:-1] + thrust_nodes[1:]) / 2
+    simpson = (thrust_nodes[:-1] + 4*thrust_mid + thrust_nodes[1:]) / 6
+    tolerance = rtol / 4 * np.maximum(np.abs(simpson), 1e-12)
+    substeps = np.clip(np.ceil(np.sqrt(np.abs(simpson - trapezoid) / tolerance)), 1, max_substeps)
+    
+    t_out, thrust_out = [ts[:1]], [thrust_nodes[:1]]
+    for i, n in enumerate(substeps.astype(int)):
+        s = np.arange(1, n) / n
+        t_out.append(ts[i] + np.append(s, 1.0) * h[i])
+        values = thrust(states(np.tile(ys[i], (n - 1, 1)), np.tile(fs[i], (n - 1, 1)), s * h[i]))
+        thrust_out.append(np.append(values, thrust_nodes[i + 1]))  # Il nodo finale è esatto
+    return np.concatenate(t_out), np.concatenate(thrust_out)
+
+
+def thrust_curve_adaptive(bottle_volume, water_ratio, pressure, nozzle_diameter,
+                          include_air_phase=False, rtol=DEFAULT_RTOL,
+                          cd=CD, air_efficiency=AIR_EFFICIENCY, gas_rt=R_AIR * T_AIR):
+    """Calcola la curva di spinta integrando pressione e volumi a passo adattivo.
+
+    Integra le stesse equazioni di thrust_curve_batch (svuotamento dell'acqua
+    nel tempo stimato, espansione adiabatica, fase aria con volume "virtuale"
+    crescente) in forma differenziale, così i due metodi concordano entro
+    rtol. La fase acqua termina con un evento quando l'acqua è esaurita (o
+    la pressione scende a quella ambiente); la fase aria, se richiesta,
+    quando la pressione raggiunge quella ambiente, al più dopo
+    AIR_TIME_ESTIMATE. rtol controlla l'errore relativo per passo; cd,
+    air_efficiency e gas_rt sono i coefficienti del modello. Restituisce
+    tempi in ms, spinta in N e tempo di fine fase acqua in ms, come
+    calculate_thrust_curve.
+    """
+    # Conversione unità come in thrust_curve_batch (volumi in L)
+    water_volume = bottle_volume * water_ratio/100
+    initial_pressure = pressure * 1e5 + P_ATM  # bar -> Pa assoluti
+    nozzle_area = np.pi * (nozzle_diameter/2000)**2  # mm -> m
+    initial_air_volume = bottle_volume - water_volume
+    water_time = 0.5 * water_volume / (cd * nozzle_area * np.sqrt(2 * RHO_WATER * (initial_pressure - P_ATM)))
+    water_flow = water_volume / water_time  # L/s, costante nel modello
+    
+    # FASE ACQUA: stato (sovrapressione, volume d'acqua); la spinta dipende dalla sovrapressione,
+    # che va quindi integrata con errore relativo a sé stessa e non alla pressione assoluta
+    def water_rhs(y):
+        overpressure, water_remaining = y
+        air_volume = bottle_volume - water_remaining
+        if initial_air_volume <= 0:
+            return np.array([np.zeros_like(overpressure), np.full_like(water_remaining, -water_flow)])
+        return np.array([-GAMMA * (overpressure + P_ATM) * water_flow / air_volume,
+                         np.full_like(water_remaining, -water_flow)])
+    
+    def water_thrust(states):
+        overpressure = np.maximum(states[..., 0], 0)
+        exit_velocity = cd * np.sqrt(2 * overpressure / RHO_WATER)
+        mass_flow = cd * nozzle_area * np.sqrt(2 * RHO_WATER * overpressure)
+        return mass_flow * exit_velocity
+    
+    ts, ys, fs, event = _integrate_until(
+        water_rhs, np.array([initial_pressure - P_ATM, water_volume]),
+        [lambda y: y[1], lambda y: y[0]],
+        h0=water_time / 50, rtol=rtol)
+    
+    t_water, thrust_water = _sample_thrust(water_rhs, ts, ys, fs, water_thrust, rtol)
+    if event != 0:
+        thrust_water[-1] = 0.0  # Pressione ambiente raggiunta prima dell'esaurimento dell'acqua
+    # La spinta dell'acqua si annulla a fine fase; senza pressione residua resta nulla fino a water_time
+    # (l'evento di fine acqua può superarlo per arrotondamento)
+    t_water = np.append(np.minimum(t_water, water_time), water_time)
+    thrust_water = np.append(thrust_water, 0.0)
+    air_start_overpressure = ys[-1, 0]
+    
+    if not include_air_phase or event != 0 or air_start_overpressure <= 0:
+        return t_water * 1000, thrust_water, water_time * 1000  # tempo in ms
+    
+    # FASE ARIA: stato (sovrapressione, rapporto del volume "virtuale"), fino al triplo del volume
+    volume_rate = 2 / AIR_TIME_ESTIMATE
+    
+    def air_rhs(y):
+        overpressure, volume_ratio = y
+        return np.array([-GAMMA * (overpressure + P_ATM) * volume_rate / volume_ratio,
+                         np.full_like(volume_ratio, volume_rate)])
+    
+    def air_thrust(states, sonic):
+        current_pressure = states[..., 0] + P_ATM
+        # Velocità di uscita aria (flusso sonico critico oltre 1.89, altrimenti subsonico)
+        pressure_ratio = current_pressure / P_ATM
+        subsonic = 2 * GAMMA / (GAMMA-1) * gas_rt * (1 - (1/pressure_ratio)**((GAMMA-1)/GAMMA))
+        exit_velocity = np.sqrt(GAMMA * gas_rt) if sonic else np.sqrt(np.maximum(subsonic, 0))
+        rho_air_exit = 1.225 * (current_pressure / P_ATM)
+        mass_flow = cd * nozzle_area * rho_air_exit * exit_velocity
+        return np.where(current_pressure > P_ATM, mass_flow * exit_velocity * air_efficiency, 0.0)
+    
+    # La velocità di uscita è discontinua al passaggio da flusso sonico a subsonico: un evento
+    # divide l'integrazione in due tratti, così la discontinuità cade su un nodo
+    sonic_overpressure = (1.89 - 1) * P_ATM
+    events = [lambda y: y[0], lambda y: 3.0 - y[1]]
+    y0, t0 = np.array([air_start_overpressure, 1.0]), 0.0
+    t_air, thrust_air = [], []
+    for sonic in ((True, False) if air_start_overpressure > sonic_overpressure else (False,)):
+        ts, ys, fs, event = _integrate_until(
+            air_rhs, y0, events + [lambda y: y[0] - sonic_overpressure] if sonic else events,
+            h0=AIR_TIME_ESTIMATE / 50, rtol=rtol)
+        t_segment, thrust_segment = _sample_thrust(air_rhs, ts, ys, fs, lambda y: air_thrust(y, sonic), rtol)
+        t_air.append(t_segment + t0)
+        thrust_air.append(thrust_segment)
+        if event != 2:  # Pressione ambiente o fine della fase aria
+            break
+        y0, t0 = ys[-1], t0 + ts[-1]
+    t_air, thrust_air = np.concatenate(t_air), np.concatenate(thrust_air)
+    
+    # Combina le due fasi
+    t_total = np.concatenate([t_water, t_air + water_time])
+    thrust_total = np.concatenate([thrust_water, thrust_air])
+    
+    return t_total * 1000, thrust_total, water_time * 1000  # tempo in ms
+
+
+def calculate_thrust_curve(bottle_volume, water_ratio, pressure, nozzle_diameter, include_air_phase=False,
+                           method='fixed', rtol=DEFAULT_RTOL, coefficients=None, sampling=None):
+    """Calcola la curva di spinta includendo opzionalmente la fase ad aria.
+
+    method='fixed' usa il campionamento a passo fisso di thrust_curve_batch,
+    con il profilo sampling (vedi sampling_resolution); method='adaptive'
+    l'integrazione a passo adattivo con tolleranza rtol. coefficients
+    sostituisce in parte o del tutto MODEL_COEFFICIENTS (ad esempio un
+    profilo calibrato con warms_calibration).
+    """
+    coefficients = model_coefficients(coefficients)
+    if method == 'adaptive':
+        return thrust_curve_adaptive(bottle_volume, water_ratio, pressure, nozzle_diameter,
+                                     include_air_phase, rtol, **coefficients)
+    if method != 'fixed':
+        raise ValueError(f"Unknown integration method: {method}")
+    
+    n_water, n_air = sampling_resolution(sampling)
+    t, thrust, water_end = thrust_curve_batch(bottle_volume, water_ratio, pressure, nozzle_diameter,
+                                              include_air_phase, n_water=n_water, n_air=n_air, **coefficients)
+    t, thrust = trim_empty_air_phase(t[0], thrust[0], n_water)
+    return t, thrust, water_end[0]  # tempo in ms
+
+
+def sampling_resolution(sampling=None):
+    """Campioni (fase acqua, fase aria) di un profilo di SAMPLING_PROFILES o di una coppia.
+
+    None indica il campionamento predefinito, N_WATER_SAMPLES e N_AIR_SAMPLES.
+    """
+    if sampling is None:
+        return N_WATER_SAMPLES, N_AIR_SAMPLES
+    if isinstance(sampling, str):
+        if sampling not in SAMPLING_PROFILES:
+            raise ValueError(f"Unknown sampling profile: {sampling}")
+        return SAMPLING_PROFILES[sampling]
+    n_water, n_air = (int(n) for n in sampling)
+    if n_water < 2 or n_air < 2:
+        raise ValueError("At least 2 samples per phase are required")
+    return n_water, n_air
+
+
+def model_coefficients(coefficients=None):
+    """MODEL_COEFFICIENTS aggiornati con i valori indicati"""
+    values = dict(MODEL_COEFFICIENTS)
+    if coefficients:
+        unknown = set(coefficients) - set(values)
+        if unknown:
+            raise ValueError(f"Unknown model coefficients: {', '.join(sorted(unknown))}")
+        values.update((name, float(value)) for name, value in coefficients.items())
+    return values
+
+
+def interp_rows(grid, t, values):
+    """Interpola ogni riga di values (tempi t crescenti per riga) sulla griglia.
+
+    grid è comune a tutte le righe (1-D) o ha una riga per curva (2-D). Le
+    righe vengono affiancate su un unico asse sommando uno scostamento per
+    riga, così un solo searchsorted trova gli intervalli di tutte le curve.
+    Oltre la fine di una curva la spinta è nulla.
+    """
+    n, size = t.shape
+    span = max(t[:, -1].max(), np.max(grid)) + 1.0
+    offsets = np.arange(n)[:, np.newaxis] * span
+    queries = np.broadcast_to(grid + offsets, (n, np.shape(grid)[-1]))
+
+    index = np.searchsorted((t + offsets).ravel(), queries.ravel(), side='right').reshape(n, -1)
+    row_start = np.arange(n)[:, np.newaxis] * size
+    upper = np.clip(index, row_start + 1, row_start + size - 1)
+    lower = upper - 1
+
+    t_flat, v_flat = t.ravel(), values.ravel()
+    t0, t1 = t_flat[lower] + offsets, t_flat[upper] + offsets
+    v0, v1 = v_flat[lower], v_flat[upper]
+    width = t1 - t0
+    weight = np.divide(queries - t0, width, out=np.zeros_like(width), where=width > 0)
+    result = v0 + np.clip(weight, 0, 1) * (v1 - v0)
+    return np.where(grid > t[:, -1:], 0.0, result)
+
+
+def trim_empty_air_phase(t, thrust, n_water=N_WATER_SAMPLES):
+    """Rimuove da una riga di thrust_curve_batch la fase aria se è tutta nulla.
+
+    Senza pressione residua la fase aria non produce spinta: resta solo la
+    fase acqua (n_water campioni), come nelle curve calcolate senza fase aria.
+    """
+    if len(thrust) > n_water and thrust[n_water] <= 0:
+        return t[:n_water], thrust[:n_water]
+    return t, thrust
+
+
+@dataclass
+class MotorConfig:
+    """Configurazione completa di un motore in unità metriche"""
+    bottle_volume: float = 2.0  # L
+    water_ratio: float = 33.0  # %
+    pressure: float = 3.0  # bar
+    nozzle_diameter: float = 8.0  # mm
+    length: float = 330.0  # mm
+    diameter: float = 110.0  # mm
+    bottle_mass: float = 100.0  # g
+    include_air_phase: bool = False
+    
+    @property
+    def propellant_mass(self):
+        """Massa d'acqua in kg"""
+        return self.bottle_volume * (self.water_ratio / 100)
+    
+    @property
+    def total_mass(self):
+        """Massa al lancio in kg (acqua + bottiglia)"""
+        return self.propellant_mass + self.bottle_mass / 1000
+    
+    def thrust_curve(self, method='fixed', rtol=DEFAULT_RTOL, coefficients=None, sampling=None):
+        """Calcola la curva di spinta per questa configurazione"""
+        return calculate_thrust_curve(self.bottle_volume, self.water_ratio, self.pressure,
+                                      self.nozzle_diameter, self.include_air_phase, method, rtol,
+                                      coefficients, sampling)
+
+
+# np.trapz è stato rinominato in np.trapezoid a partire da numpy 2.0
+_trapezoid = getattr(np, 'trapezoid', None) or np.trapz
+
+
+def total_impulse(t, thrust):
+    """Impulso totale in N⋅s per tempi in ms (integrazione trapezoidale)"""
+    return _trapezoid(thrust, np.asarray(t)/1000, axis=-1)
+
+
+def phase_impulses(t, thrust, water_end_time):
+    """Restituisce l'impulso totale e quelli delle fasi acqua e aria in N⋅s"""
+    impulse = total_impulse(t, thrust)
+    water_mask = t <= water_end_time
+    water_impulse = total_impulse(t[water_mask], thrust[water_mask])
+    return impulse, water_impulse, impulse - water_impulse
+
+
+def get_impulse_class(impulse):
+    """Determina la classe di impulso NAR dato l'impulso totale in N⋅s"""
+    for boundary, class_name in IMPULSE_CLASS_BOUNDARIES.items():
+        if impulse <= boundary:
+            return class_name
+    return 'I+'  # Per impulsi molto grandi
+
+
+def impulse_classes(impulse):
+    """Versione vettoriale di get_impulse_class per array di impulsi"""
+    boundaries = np.fromiter(IMPULSE_CLASS_BOUNDARIES, dtype=float)
+    names = np.array(list(IMPULSE_CLASS_BOUNDARIES.values()) + ['I+'])
+    return names[np.searchsorted(boundaries, impulse, side='left')]
+
+
+def curve_metrics(t, thrust, water_end_time):
+    """Calcola in un solo passaggio le grandezze principali di un blocco di curve.
+
+    Accetta curve singole o blocchi 2-D come quelli di thrust_curve_batch e
+    restituisce un dizionario di array: impulso totale, impulsi delle fasi
+    acqua e aria (N⋅s), tempo di combustione (s) e spinta massima (N).
+    """
+    t = np.atleast_2d(t) / 1000
+    thrust = np.atleast_2d(thrust)
+    water_end = np.reshape(water_end_time, (-1, 1)) / 1000
+    
+    # Contributi trapezoidali dei singoli intervalli
+    segments = 0.5 * (thrust[:, 1:] + thrust[:, :-1]) * np.diff(t, axis=1)
+    impulse = segments.sum(axis=1)
+    water_impulse = np.where(t[:, 1:] <= water_end, segments, 0.0).sum(axis=1)
+    
+    # Fine combustione: primo campione dopo l'ultimo con spinta positiva
+    burning = thrust > 0
+    last = thrust.shape[1] - 1 - np.argmax(burning[:, ::-1], axis=1)
+    end = np.where(burning.any(axis=1), np.minimum(last + 1, thrust.shape[1] - 1), 0)
+    burn_time = np.take_along_axis(t, end[:, np.newaxis], axis=1)[:, 0] - t[:, 0]
+    
+    return {
+        'total_impulse': impulse,
+        'water_impulse': water_impulse,
+        'air_impulse': impulse - water_impulse,
+        'burn_time': burn_time,
+        'peak_thrust': thrust.max(axis=1),
+    }
+
+
+class CurveResult:
+    """Curva di spinta con le grandezze derivate, calcolate una sola volta.
+
+    t (ms) e thrust (N) sono array float64 in sola lettura, senza copie se
+    già in float64; cumulative_impulse (N⋅s) è l'impulso integrato con i
+    trapezi fino a ogni campione. Le grandezze seguono le stesse convenzioni
+    di curve_metrics e dei file RASP: la spinta media e il nome del motore
+    usano la durata della curva.
+    """
+    __slots__ = ('t', 'thrust', 'water_end_time', 'cumulative_impulse', 'total_impulse', 'water_impulse',
+                 'air_impulse', 'peak_thrust', 'peak_time', 'burn_time', 'duration', 'average_thrust',
+                 'impulse_class', 'motor_name')
+
+    def __init__(self, t, thrust, water_end_time=None):
+        self.t = _read_only(t)
+        self.thrust = _read_only(thrust)
+        t, thrust = self.t, self.thrust
+        self.water_end_time = float(t[-1] if water_end_time is None else water_end_time)
+
+        # Un solo passaggio: impulso cumulativo, da cui si leggono totale e fasi
+        cumulative = np.empty(len(t))
+        cumulative[0] = 0.0
+        np.cumsum(0.5 * (thrust[1:] + thrust[:-1]) * np.diff(t) / 1000, out=cumulative[1:])
+        cumulative.flags.writeable = False
+        self.cumulative_impulse = cumulative
+        self.total_impulse = float(cumulative[-1])
+        water_index = max(int(np.searchsorted(t, self.water_end_time, side='right')) - 1, 0)
+        self.water_impulse = float(cumulative[water_index])
+        self.air_impulse = self.total_impulse - self.water_impulse
+
+        peak_index = int(np.argmax(thrust))
+        self.peak_thrust = float(thrust[peak_index])
+        self.peak_time = float(t[peak_index])
+        # Fine combustione come in curve_metrics: primo campione dopo l'ultimo con spinta positiva
+        burning = np.flatnonzero(thrust > 0)
+        end = min(int(burning[-1]) + 1, len(t) - 1) if len(burning) else 0
+        self.burn_time = float(t[end] - t[0]) / 1000
+        self.duration = float(t[-1] - t[0]) / 1000
+        self.average_thrust = self.total_impulse / self.duration if self.duration > 0 else 0.0
+        self.impulse_class = get_impulse_class(self.total_impulse)
+        self.motor_name = f"{self.impulse_class}{int(self.average_thrust)}"
+
+    @property
+    def nbytes(self):
+        return self.t.nbytes + self.thrust.nbytes + self.cumulative_impulse.nbytes
+
+    def impulse_at(self, time):
+        """Impulso erogato fino al tempo dato in ms (interpolato tra i campioni)"""
+        return np.interp(time, self.t, self.cumulative_impulse)
+
+
+def _read_only(values):
+    """Vista float64 in sola lettura (copia solo se il tipo è diverso)"""
+    values = np.asarray(values, dtype=float).view()
+    values.flags.writeable = False
+    return values
+
+
+def reduce_curve(t, thrust, tolerance):
+    """Riduce i punti di una curva con l'algoritmo di Douglas–Peucker.
+
+    tolerance è lo scarto massimo ammesso sulla spinta, come frazione della
+    spinta massima. Estremi, picco e discontinuità (tempi ripetuti) vengono
+    sempre mantenuti; i punti intermedi sono poi scalati in modo che
+    l'impulso totale resti quello della curva originale.
+    """
+    t = np.asarray(t, dtype=float)
+    thrust = np.asarray(thrust, dtype=float)
+    if len(t) <= 2 or not tolerance:
+        return t.copy(), thrust.copy()
+    
+    peak_index = int(np.argmax(thrust))
+    threshold = tolerance * thrust[peak_index]
+    keep = np.zeros(len(t), dtype=bool)
+    keep[[0, -1, peak_index]] = True
+    jumps = np.flatnonzero(np.diff(t) == 0)
+    keep[jumps] = keep[jumps + 1] = True
+    
+    # Suddivisione iterativa tra punti già mantenuti (scarto verticale dalla corda)
+    anchors = np.flatnonzero(keep)
+    stack = list(zip(anchors[:-1], anchors[1:]))
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        inner_t, inner_thrust = t[a + 1:b], thrust[a + 1:b]
+        chord = thrust[a] + (thrust[b] - thrust[a]) * (inner_t - t[a]) / (t[b] - t[a])
+        error = np.abs(inner_thrust - chord)
+        worst = int(np.argmax(error))
+        if error[worst] > threshold:
+            split = a + 1 + worst
+            keep[split] = True
+            stack.extend([(a, split), (split, b)])
+    
+    reduced_t, reduced_thrust = t[keep], thrust[keep]
+    
+    # Correzione dell'impulso sui punti intermedi, senza superare il picco
+    weights = np.zeros(len(reduced_t))
+    dt = np.diff(reduced_t)
+    weights[:-1] += dt / 2
+    weights[1:] += dt / 2
+    adjustable = np.ones(len(reduced_t), dtype=bool)
+    adjustable[[0, -1, int(np.count_nonzero(keep[:peak_index]))]] = False
+    share = np.sum(weights[adjustable] * reduced_thrust[adjustable])
+    if share > 0:
+        excess = _trapezoid(reduced_thrust, reduced_t) - _trapezoid(thrust, t)
+        reduced_thrust[adjustable] = np.minimum(reduced_thrust[adjustable] * (1 - excess / share),
+                                                thrust[peak_index])
+    return reduced_t, reduced_thrust
+
+
+def format_rasp(config, t, thrust, impulse=None, tolerance=None, result=None):
+    """Genera il contenuto di un file RASP (.eng) per la curva data.
+
+    I tempi sono in ms e la spinta in N; la configurazione fornisce le
+    dimensioni, le masse e i parametri riportati nell'intestazione.
+    L'impulso totale, se già noto, evita una nuova integrazione; result (la
+    CurveResult della curva) fornisce già impulso, durata e nome del motore.
+    Con tolerance i punti della curva vengono ridotti con reduce_curve.
+    """
+    if result is not None:
+        impulse, burn_time = result.total_impulse, result.duration
+        average_thrust, motor_name = result.average_thrust, result.motor_name
+    if tolerance:
+        t, thrust = reduce_curve(t, thrust, tolerance)
+    if result is None:
+        # Calcola impulso totale e spinta media
+        if impulse is None:
+            impulse = total_impulse(t, thrust)
+        burn_time = (t[-1] - t[0]) / 1000
+        average_thrust = impulse / burn_time
+        
+        # Genera nome motore secondo standard
+        motor_name = f"{get_impulse_class(impulse)}{int(average_thrust)}"
+    
+    lines = [
+        "; Water Rocket Motor File",
+        f"; Generated by WaRMS on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        "; Configuration:",
+        f";   Volume: {config.bottle_volume:.1f}L",
+        f";   Pressure: {config.pressure:.1f} bar",
+        f";   Water ratio: {config.water_ratio:.1f}%",
+        f";   Nozzle diameter: {config.nozzle_diameter:.1f} mm",
+        f";   Air phase included: {config.include_air_phase}",
+        f";   Total Impulse: {impulse:.2f} Ns",
+        f";   Average Thrust: {average_thrust:.2f} N",
+        f";   Burn Time: {burn_time:.3f} s",
+        "",
+        # RASP header line
+        f"{motor_name} {config.diameter:.1f} {config.length:.1f} P "
+        f"{config.propellant_mass:.4f} {config.total_mass:.4f} WaRMS",
+    ]
+    
+    # Dati curva di spinta (sempre in unità metriche: secondi e Newton)
+    lines.extend(f"{time:.4f} {value:.4f}" for time, value in zip(np.asarray(t)/1000, thrust))
+    
+    # Fine dati
+    lines.append(";")
+    return "\n".join(lines)
+
+
+def write_rasp(file_name, config, t, thrust, impulse=None, tolerance=None, result=None):
+    """Scrive la curva in un file RASP"""
+    with span('format'):
+        content = format_rasp(config, t, thrust, impulse, tolerance, result)
+    with span('write'), open(file_name, 'w') as f:
+        f.write(content)
+
+
+def write_rasp_library(file_name, motors, tolerance=None):
+    """Scrive più motori in un unico file RASP, con una sola scrittura per motore.
+
+    motors è un iterabile (anche un generatore) di tuple (config, t, thrust),
+    (config, t, thrust, impulse) o (config, CurveResult). Restituisce il
+    numero di motori scritti.
+    """
+    count = 0
+    with open(file_name, 'w') as f:
+        for count, motor in enumerate(motors, 1):
+            if len(motor) == 2:
+                config, result = motor
+                f.write(format_rasp(config, result.t, result.thrust, tolerance=tolerance, result=result) + "\n")
+            else:
+                f.write(format_rasp(*motor, tolerance=tolerance) + "\n")
+    return count
@@ -0,0 +1,233 @@
+"""Progetto inverso: configurazioni che raggiungono le prestazioni richieste.
+
+Dati uno o più obiettivi (impulso totale, classe NAR, spinta media, tempo
+di combustione) e gli intervalli ammessi per i parametri operativi, il
+solutore cerca le configurazioni migliori valutando migliaia di candidati
+per chiamata di thrust_curve_batch: un campionamento a ipercubo latino
+dell'intero spazio, alcuni raffinamenti locali attorno ai candidati
+migliori e infine il ricalcolo a piena risoluzione dei risultati, scelti
+distinti tra loro. Un parametro con intervallo di ampiezza nulla (o un
+solo valore) resta fisso.
+
+    python warms_design.py --impulse-class D --pressure 6 --bottle-volume 2
+    python warms_design.py --total-impulse 12 --burn-time 0.3 --air-phase
+"""
+import argparse
+import dataclasses
+import math
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+from warms_core import (IMPULSE_CLASS_BOUNDARIES, N_AIR_SAMPLES, N_WATER_SAMPLES, PARAM_RANGES, MotorConfig,
+                        curve_metrics, impulse_classes, model_coefficients, thrust_curve_batch)
+
+# Ordine dei parametri nei vettori dei candidati
+DESIGN_PARAMS = ('pressure', 'water_ratio', 'nozzle_diameter', 'bottle_volume')
+TARGET_NAMES = ('total_impulse', 'average_thrust', 'burn_time', 'impulse_class')
+
+DesignResult = namedtuple('DesignResult', [
+    'config',  # MotorConfig
+    'total_impulse',  # N⋅s
+    'average_thrust',  # N
+    'burn_time',  # s
+    'peak_thrust',  # N
+    'impulse_class',
+    'error',  # scarto dagli obiettivi (0 = tutti raggiunti)
+])
+
+N_COARSE = 2048  # candidati della ricerca iniziale
+N_SEEDS = 16  # candidati migliori raffinati a ogni passo
+N_LOCAL = 64  # campioni locali per candidato
+REFINE_STEPS = 4
+REFINE_SHRINK = 0.35  # riduzione della regione locale a ogni passo
+MIN_SEPARATION = 0.05  # distanza minima tra risultati, come frazione degli intervalli
+DEFAULT_RESULTS = 10
+
+# Campionamento ridotto delle curve durante la ricerca, come per il Monte Carlo
+N_WATER_SEARCH = 200
+N_AIR_SEARCH = 100
+
+# Peso della distanza dal centro della classe richiesta, a parità di classe
+CLASS_CENTER_WEIGHT = 0.01
+
+
+def impulse_class_range(name):
+    """Intervallo di impulso (N⋅s) di una classe NAR"""
+    upper = list(IMPULSE_CLASS_BOUNDARIES)
+    names = list(IMPULSE_CLASS_BOUNDARIES.values())
+    if name == 'I+':
+        return upper[-1], upper[-1] * 2
+    if name not in names:
+        raise ValueError(f"Unknown impulse class: {name}")
+    index = names.index(name)
+    return (upper[index - 1] if index else upper[0] / 2), upper[index]
+
+
+def _errors(metrics, targets):
+    """Scarto di ogni candidato: somma dei quadrati dei logaritmi dei rapporti con gli obiettivi"""
+    impulse = np.maximum(metrics['total_impulse'], 1e-12)
+    values = {
+        'total_impulse': impulse,
+        # Spinta media sulla durata della curva, come CurveResult e i file RASP
+        'average_thrust': impulse / np.maximum(metrics['duration'], 1e-12),
+        'burn_time': np.maximum(metrics['burn_time'], 1e-12),
+    }
+    error = np.zeros(len(impulse))
+    for name, target in targets.items():
+        if name == 'impulse_class':
+            low, high = impulse_class_range(target)
+            position = np.log(impulse / low) / math.log(high / low)
+            outside = np.where(impulse <= low, np.log(impulse / low), np.log(impulse / high))
+            error += np.where((impulse > low) & (impulse <= high),
+                              CLASS_CENTER_WEIGHT * (position - 0.5)**2,
+                              outside**2 + CLASS_CENTER_WEIGHT * 0.25)
+        else:
+            error += np.log(values[name] / target)**2
+    return error, values
+
+
+def _evaluate(points, include_air_phase, coefficients, targets, n_water, n_air):
+    """Scarti e grandezze per un blocco di candidati (una riga per candidato)"""
+    t, thrust, water_end = thrust_curve_batch(*(points[:, DESIGN_PARAMS.index(name)]
+                                                for name in ('bottle_volume', 'water_ratio', 'pressure',
+                                                             'nozzle_diameter')),
+                                              include_air_phase, n_water=n_water, n_air=n_air,
+                                              **coefficients)
+    metrics = curve_metrics(t, thrust, water_end)
+    metrics['duration'] = (t[:, -1] - t[:, 0]) / 1000
+    error, values = _errors(metrics, targets)
+    return error, dict(values, peak_thrust=metrics['peak_thrust'])
+
+
+def _bounds(bounds):
+    """Array (parametri × 2) degli intervalli ammessi, da PARAM_RANGES e da bounds"""
+    limits = np.array([PARAM_RANGES[name] for name in DESIGN_PARAMS], dtype=float)
+    for name, value in (bounds or {}).items():
+        if name not in DESIGN_PARAMS:
+            raise ValueError(f"Unknown design parameter: {name}")
+        low, high = (value, value) if np.isscalar(value) else value
+        limits[DESIGN_PARAMS.index(name)] = (low, high)
+    if np.any(limits[:, 0] > limits[:, 1]) or np.any(limits[:, 0] <= 0) or limits[1, 1] >= 100:
+        raise ValueError("Invalid parameter bounds")
+    return limits
+
+
+def design(targets, bounds=None, include_air_phase=False, n_results=DEFAULT_RESULTS, coefficients=None,
+           base_config=None, seed=0):
+    """Configurazioni ordinate dalla più vicina agli obiettivi.
+
+    targets associa ai nomi di TARGET_NAMES il valore richiesto (N⋅s, N, s
+    o il nome della classe); bounds associa ai parametri di DESIGN_PARAMS
+    un intervallo (min, max) o un valore fisso, in unità metriche; gli
+    altri parametri spaziano sull'intero intervallo dello slider.
+    base_config fornisce gli altri campi delle MotorConfig restituite.
+    """
+    targets = {name: value for name, value in targets.items() if value is not None and value != ''}
+    if not targets:
+        raise ValueError("At least one design target is needed")
+    unknown = set(targets) - set(TARGET_NAMES)
+    if unknown:
+        raise ValueError(f"Unknown design targets: {', '.join(sorted(unknown))}")
+    for name, value in targets.items():
+        if name != 'impulse_class' and not value > 0:
+            raise ValueError(f"Design target {name} must be positive")
+    limits = _bounds(bounds)
+    low, width = limits[:, 0], limits[:, 1] - limits[:, 0]
+    coefficients = model_coefficients(coefficients)
+    rng = np.random.default_rng(seed)
+
+    def search(unit):
+        return _evaluate(low + unit * width, include_air_phase, coefficients, targets,
+                         N_WATER_SEARCH, N_AIR_SEARCH)[0]
+
+    # Ipercubo latino sull'intero spazio (coordinate normalizzate in [0, 1])
+    size = len(DESIGN_PARAMS)
+    strata = np.argsort(rng.random((N_COARSE, size)), axis=0)
+    pool = (strata + rng.random((N_COARSE, size))) / N_COARSE
+    pool_error = search(pool)
+
+    # Raffinamenti locali attorno ai candidati migliori, in blocco
+    radius = 0.15
+    for _ in range(REFINE_STEPS):
+        seeds = pool[np.argsort(pool_error)[:N_SEEDS]]
+        local = np.repeat(seeds, N_LOCAL, axis=0) + rng.uniform(-radius, radius, (len(seeds) * N_LOCAL, size))
+        local = np.clip(local, 0.0, 1.0)
+        pool = np.concatenate([pool, local])
+        pool_error = np.concatenate([pool_error, search(local)])
+        radius *= REFINE_SHRINK
+
+    # Risultati distinti tra loro nei parametri liberi, in ordine di scarto
+    free = pool[:, width > 0]
+    chosen = []
+    for index in np.argsort(pool_error, kind='stable'):
+        if all(np.abs(free[index] - free[other]).max(initial=0.0) >= MIN_SEPARATION for other in chosen):
+            chosen.append(index)
+            if len(chosen) == n_results:
+                break
+
+    # Ricalcolo a piena risoluzione dei risultati scelti
+    points = low + pool[chosen] * width
+    error, values = _evaluate(points, include_air_phase, coefficients, targets,
+                              N_WATER_SAMPLES, N_AIR_SAMPLES)
+    classes = impulse_classes(values['total_impulse'])
+    base = dataclasses.asdict(base_config) if base_config is not None else {}
+    results = []
+    for row in np.argsort(error, kind='stable'):
+        config = MotorConfig(**dict(base, include_air_phase=include_air_phase,
+                                    **{name: float(value) for name, value in zip(DESIGN_PARAMS, points[row])}))
+        results.append(DesignResult(config, float(values['total_impulse'][row]),
+                                    float(values['average_thrust'][row]), float(values['burn_time'][row]),
+                                    float(values['peak_thrust'][row]), str(classes[row]), float(error[row])))
+    return results
+
+
+def _parse_bounds(name):
+    """Converte 'min:max' o un singolo valore (parametro fisso)"""
+    def parse(text):
+        parts = text.split(':')
+        if len(parts) in (1, 2):
+            try:
+                values = [float(part) for part in parts]
+            except ValueError:
+                pass
+            else:
+                return values[0] if len(values) == 1 else tuple(values)
+        raise argparse.ArgumentTypeError(f"{name}: expected VALUE or MIN:MAX, got '{text}'")
+    return parse
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="WaRMS inverse design")
+    parser.add_argument('--total-impulse', type=float, help="target total impulse (N s)")
+    parser.add_argument('--impulse-class', choices=list(IMPULSE_CLASS_BOUNDARIES.values()) + ['I+'],
+                        help="target NAR class")
+    parser.add_argument('--average-thrust', type=float, help="target average thrust (N)")
+    parser.add_argument('--burn-time', type=float, help="target burn time (s)")
+    for name in DESIGN_PARAMS:
+        low, high = PARAM_RANGES[name]
+        parser.add_argument('--' + name.replace('_', '-'), dest=name, type=_parse_bounds(name),
+                            help=f"VALUE or MIN:MAX (default {low:g}:{high:g})")
+    parser.add_argument('--air-phase', action='store_true', help="include the air phase")
+    parser.add_argument('-n', '--results', type=int, default=DEFAULT_RESULTS)
+    args = parser.parse_args(argv)
+
+    targets = {name: getattr(args, name) for name in TARGET_NAMES}
+    bounds = {name: getattr(args, name) for name in DESIGN_PARAMS if getattr(args, name) is not None}
+    try:
+        results = design(targets, bounds, args.air_phase, args.results)
+    except ValueError as e:
+        parser.error(str(e))
+
+    print("pressure,water_ratio,nozzle_diameter,bottle_volume,total_impulse,average_thrust,burn_time,"
+          "peak_thrust,impulse_class,error")
+    for result in results:
+        config = result.config
+        print(f"{config.pressure:.3f},{config.water_ratio:.2f},{config.nozzle_diameter:.2f},"
+              f"{config.bottle_volume:.3f},{result.total_impulse:.4f},{result.average_thrust:.3f},"
+              f"{result.burn_time:.4f},{result.peak_thrust:.3f},{result.impulse_class},{result.error:.3g}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""Mappa dello spazio di progetto: una grandezza in funzione di due parametri.
+
+I due parametri scelti come coordinate spaziano sull'intero intervallo dei
+loro slider (PARAM_RANGES), gli altri restano fissi ai valori correnti. La
+griglia si riempie per livelli, dal più grossolano al più fine: ogni livello
+dimezza il passo e calcola solo i punti che ancora mancano, così la mappa si
+mostra subito e viene poi raffinata in background, a blocchi brevi che si
+possono interrompere in qualsiasi momento. Impulso totale, tempo di
+combustione e spinta massima vengono ricavati insieme: cambiare la grandezza
+mostrata non richiede calcoli.
+
+HeatmapCache conserva le griglie già calcolate, indicizzate dai soli
+parametri che le determinano: spostare lo slider di una delle due coordinate
+non richiede calcoli, e tornare su valori già visti dei parametri fissi
+riprende la griglia dal punto in cui era arrivata.
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+from warms_core import PARAM_RANGES, curve_metrics, model_coefficients, thrust_curve_batch
+
+# Parametri che possono fare da coordinate della mappa
+EXPLORER_PARAMS = ('pressure', 'water_ratio', 'nozzle_diameter', 'bottle_volume')
+EXPLORER_METRICS = ('total_impulse', 'burn_time', 'peak_thrust')
+
+COARSE_POINTS = 9  # punti per asse del primo livello
+GRID_LEVELS = 5  # livelli di raffinamento: 9, 17, 33, 65 e 129 punti per asse
+CHUNK_SIZE = 1024  # punti calcolati per ogni passo di raffinamento
+KEY_DIGITS = 3  # cifre significative dei parametri fissi
+MAX_CACHED_GRIDS = 32
+
+# Campionamento ridotto delle curve, come per il Monte Carlo e il progetto inverso
+N_WATER_EXPLORER = 200
+N_AIR_EXPLORER = 100
+
+
+def _round(value):
+    """Arrotonda un parametro fisso a KEY_DIGITS cifre significative"""
+    return float(f'{value:.{KEY_DIGITS}g}')
+
+
+class HeatmapGrid:
+    """Griglia delle grandezze su due parametri, riempita dal livello più grossolano.
+
+    fixed associa agli altri parametri di EXPLORER_PARAMS il loro valore
+    (unità come MotorConfig). Con una SurrogateTable le grandezze si
+    ricavano dalla tabella invece che dalle curve.
+    """
+
+    def __init__(self, x_param, y_param, fixed, include_air_phase=False, coefficients=None, surrogate=None,
+                 coarse_points=COARSE_POINTS, levels=GRID_LEVELS):
+        if x_param == y_param or x_param not in EXPLORER_PARAMS or y_param not in EXPLORER_PARAMS:
+            raise ValueError(f"Invalid explorer axes: {x_param}, {y_param}")
+        missing = set(EXPLORER_PARAMS) - {x_param, y_param} - set(fixed)
+        if missing:
+            raise ValueError(f"Missing fixed parameters: {', '.join(sorted(missing))}")
+        self.x_param = x_param
+        self.y_param = y_param
+        self.fixed = {name: float(fixed[name]) for name in EXPLORER_PARAMS if name not in (x_param, y_param)}
+        self.include_air_phase = include_air_phase
+        self.coefficients = model_coefficients(coefficients)
+        self.surrogate = surrogate
+
+        size = (coarse_points - 1) * 2**(levels - 1) + 1
+        self.x = np.linspace(*PARAM_RANGES[x_param], size)
+        self.y = np.linspace(*PARAM_RANGES[y_param], size)
+        self.values = {name: np.full((size, size), np.nan) for name in EXPLORER_METRICS}
+        self.strides = [2**(levels - 1 - level) for level in range(levels)]
+        self.level = 0  # livelli completati
+        self._done = np.zeros((size, size), dtype=bool)
+
+    @property
+    def complete(self):
+        return self.level == len(self.strides)
+
+    @property
+    def progress(self):
+        """Frazione dei punti della griglia completa già calcolati"""
+        return float(self._done.mean())
+
+    def refine(self, max_points=CHUNK_SIZE):
+        """Calcola fino a max_points punti mancanti del livello in corso.
+
+        Restituisce True quando il passo completa un livello: la mappa
+        mostrata può allora passare alla risoluzione successiva.
+        """
+        if self.complete:
+            return False
+        stride = self.strides[self.level]
+        i, j = np.nonzero(~self._done[::stride, ::stride])
+        i, j = i[:max_points] * stride, j[:max_points] * stride
+        if len(i):
+            metrics = self._evaluate(self.x[i], self.y[j])
+            for name in EXPLORER_METRICS:
+                self.values[name][i, j] = metrics[name]
+            self._done[i, j] = True
+        if self._done[::stride, ::stride].all():
+            self.level += 1
+            return True
+        return False
+
+    def _evaluate(self, x, y):
+        params = dict(self.fixed, **{self.x_param: x, self.y_param: y})
+        args = [params[name] for name in ('bottle_volume', 'water_ratio', 'pressure', 'nozzle_diameter')]
+        if self.surrogate is not None:
+            return self.surrogate.metrics(*args, self.include_air_phase, self.coefficients)
+        curves = thrust_curve_batch(*args, self.include_air_phase, n_water=N_WATER_EXPLORER,
+                                    n_air=N_AIR_EXPLORER, **self.coefficients)
+        return curve_metrics(*curves)
+
+    def image(self, metric):
+        """Valori dell'ultimo livello completato (righe = asse y) e limiti dei pixel per imshow.
+
+        Restituisce (None, None) finché nessun livello è completo.
+        """
+        if not self.level:
+            return None, None
+        stride = self.strides[self.level - 1]
+        values = self.values[metric][::stride, ::stride].T
+        half_x = (self.x[-1] - self.x[0]) / (values.shape[1] - 1) / 2
+        half_y = (self.y[-1] - self.y[0]) / (values.shape[0] - 1) / 2
+        extent = (self.x[0] - half_x, self.x[-1] + half_x, self.y[0] - half_y, self.y[-1] + half_y)
+        return values, extent
+
+
+class HeatmapCache:
+    """Griglie già calcolate, le meno usate vengono scartate per prime"""
+
+    def __init__(self, max_grids=MAX_CACHED_GRIDS, surrogate=None):
+        self.max_grids = max_grids
+        self.surrogate = surrogate
+        self._grids = OrderedDict()
+
+    def __len__(self):
+        return len(self._grids)
+
+    def grid(self, x_param, y_param, config, coefficients=None):
+        """Griglia per le coordinate scelte e i parametri fissi di una MotorConfig"""
+        fixed = {name: _round(getattr(config, name)) for name in EXPLORER_PARAMS if name not in (x_param, y_param)}
+        coefficients = model_coefficients(coefficients)
+        key = (x_param, y_param, tuple(sorted(fixed.items())), bool(config.include_air_phase),
+               tuple(sorted(coefficients.items())))
+        grid = self._grids.get(key)
+        if grid is None:
+            grid = HeatmapGrid(x_param, y_param, fixed, bool(config.include_air_phase), coefficients,
+                               self.surrogate)
+            self._grids[key] = grid
+            while len(self._grids) > self.max_grids:
+                self._grids.popitem(last=False)
+        else:
+            self._grids.move_to_end(key)
+        return grid
+
+    def clear(self):
+        self._grids.clear()
@@ -0,0 +1,167 @@
+"""Simulazione del volo verticale: apogeo, velocità massima e tempo all'apogeo.
+
+La curva di spinta viene accoppiata alla massa del razzo, che diminuisce
+mentre l'acqua viene espulsa, e alla resistenza aerodinamica quadratica
+calcolata dal diametro della bottiglia. La fase propulsa è integrata sui
+campioni della curva stessa (metodo di Heun) per tutti i razzi di un blocco
+insieme, una colonna di campioni alla volta; la fase balistica successiva,
+con resistenza quadratica e gravità costante, ha soluzione in forma chiusa.
+
+Il razzo parte da fermo sulla rampa e resta a terra finché la spinta non
+supera il peso; il volo è verticale e la massa dell'aria compressa è
+trascurata.
+
+    python warms_flight.py --pressure 6 --water-ratio 33 --air-phase
+"""
+import argparse
+import sys
+
+import numpy as np
+
+from warms_core import RHO_WATER, MotorConfig, model_coefficients, thrust_curve_batch
+
+G = 9.80665  # m/s²
+RHO_AIR = 1.225  # kg/m³ al livello del mare
+DRAG_COEFFICIENT = 0.5  # Coefficiente di resistenza di una bottiglia con ogiva
+DEFAULT_CHUNK_SIZE = 2048
+
+FLIGHT_FIELDS = ('apogee', 'max_velocity', 'time_to_apogee', 'burnout_altitude', 'burnout_velocity')
+
+
+def flight_metrics(t, thrust, water_end_time, water_mass, dry_mass, diameter, drag_coefficient=DRAG_COEFFICIENT):
+    """Volo verticale di un blocco di razzi a partire dalle loro curve di spinta.
+
+    t (ms), thrust (N) e water_end_time (ms) sono come in thrust_curve_batch;
+    water_mass e dry_mass (kg), diameter (mm) e drag_coefficient sono scalari
+    o array con una voce per curva. L'acqua viene espulsa a portata costante
+    fino a water_end_time, come nel modello a passo fisso, e solo finché c'è
+    spinta. Restituisce un dizionario di array: apogeo (m), velocità massima
+    (m/s), tempo all'apogeo (s), quota e velocità a fine spinta.
+    """
+    t = np.atleast_2d(t) / 1000
+    thrust = np.atleast_2d(thrust)
+    n = len(thrust)
+    water_end = np.broadcast_to(np.asarray(water_end_time, dtype=float).ravel() / 1000, (n,))
+    water, dry_mass, diameter, drag_coefficient = (
+        np.broadcast_to(np.asarray(value, dtype=float).ravel(), (n,)).copy()
+        for value in (water_mass, dry_mass, diameter, drag_coefficient))
+    if np.any(dry_mass <= 0):
+        raise ValueError("The empty rocket mass must be positive")
+    # Resistenza = drag⋅v⋅|v|
+    drag = 0.5 * RHO_AIR * drag_coefficient * np.pi * (diameter / 2000)**2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        flow = np.where(water_end > 0, water / water_end, 0.0)  # kg/s
+
+    def acceleration(force, mass, velocity):
+        return (force - drag * velocity * np.abs(velocity)) / mass - G
+
+    altitude = np.zeros(n)
+    velocity = np.zeros(n)
+    apogee = np.zeros(n)
+    apogee_time = np.zeros(n)
+    max_velocity = np.zeros(n)
+
+    # Fase propulsa: un passo di Heun per ogni intervallo tra due campioni
+    for j in range(thrust.shape[1] - 1):
+        dt = t[:, j + 1] - t[:, j]
+        draining = (t[:, j] < water_end) & ((thrust[:, j] > 0) | (thrust[:, j + 1] > 0))
+        mass = dry_mass + water
+        water = np.where(draining, np.maximum(water - flow * dt, 0.0), water)
+        a0 = acceleration(thrust[:, j], mass, velocity)
+        a1 = acceleration(thrust[:, j + 1], dry_mass + water, velocity + a0 * dt)
+        new_velocity = velocity + 0.5 * (a0 + a1) * dt
+        altitude = altitude + 0.5 * (velocity + new_velocity) * dt
+        velocity = new_velocity
+
+        # Sulla rampa il razzo non scende sotto quota zero
+        grounded = altitude <= 0
+        altitude = np.where(grounded, 0.0, altitude)
+        velocity = np.where(grounded, np.maximum(velocity, 0.0), velocity)
+
+        higher = altitude > apogee
+        apogee = np.where(higher, altitude, apogee)
+        apogee_time = np.where(higher, t[:, j + 1], apogee_time)
+        max_velocity = np.maximum(max_velocity, velocity)
+
+    # Fase balistica in salita: soluzione esatta con resistenza quadratica
+    burnout_time = t[:, -1] - t[:, 0]
+    k = drag / (dry_mass + water)
+    climbing = velocity > 0
+    v = np.where(climbing, velocity, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        coast_time = np.where(k > 0, np.arctan(v * np.sqrt(k / G)) / np.sqrt(G * k), v / G)
+        coast_height = np.where(k > 0, np.log1p(k * v**2 / G) / (2 * k), v**2 / (2 * G))
+    coast_apogee = altitude + coast_height
+    coasting = climbing & (coast_apogee >= apogee)
+
+    return {
+        'apogee': np.where(coasting, coast_apogee, apogee),
+        'max_velocity': max_velocity,
+        'time_to_apogee': np.where(coasting, burnout_time + coast_time, apogee_time - t[:, 0]),
+        'burnout_altitude': altitude,
+        'burnout_velocity': velocity,
+    }
+
+
+def simulate_flight(bottle_volume, water_ratio, pressure, nozzle_diameter, include_air_phase=False,
+                    diameter=MotorConfig.diameter, bottle_mass=MotorConfig.bottle_mass,
+                    drag_coefficient=DRAG_COEFFICIENT, coefficients=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                    surrogate=None):
+    """Simula in blocco il volo di array di configurazioni (unità come MotorConfig).
+
+    I parametri sono combinati con il broadcasting di numpy; le curve sono
+    calcolate con thrust_curve_batch (o con la SurrogateTable surrogate) a
+    blocchi di chunk_size razzi, per limitare la memoria. Restituisce un
+    dizionario di array come flight_metrics.
+    """
+    params = np.broadcast_arrays(*(np.atleast_1d(np.asarray(p, dtype=float)).ravel()
+                                   for p in (bottle_volume, water_ratio, pressure, nozzle_diameter,
+                                             diameter, bottle_mass, drag_coefficient)))
+    coefficients = model_coefficients(coefficients)
+    parts = []
+    for start in range(0, len(params[0]), chunk_size):
+        (volume, ratio, p, nozzle, d, mass, drag) = (param[start:start + chunk_size] for param in params)
+        if surrogate is not None:
+            curves = surrogate.curves(volume, ratio, p, nozzle, include_air_phase, coefficients)
+        else:
+            curves = thrust_curve_batch(volume, ratio, p, nozzle, include_air_phase, **coefficients)
+        water_mass = volume / 1000 * ratio / 100 * RHO_WATER
+        parts.append(flight_metrics(*curves, water_mass, mass / 1000, d, drag))
+    if not parts:
+        return {name: np.empty(0) for name in FLIGHT_FIELDS}
+    return {name: np.concatenate([part[name] for part in parts]) for name in FLIGHT_FIELDS}
+
+
+def config_flight(config, t, thrust, water_end_time, drag_coefficient=DRAG_COEFFICIENT):
+    """Volo di una singola MotorConfig con la sua curva calcolata (valori scalari)"""
+    result = flight_metrics(t, thrust, water_end_time, config.propellant_mass, config.bottle_mass / 1000,
+                            config.diameter, drag_coefficient)
+    return {name: float(values[0]) for name, values in result.items()}
+
+
+def main(argv=None):
+    defaults = MotorConfig()
+    parser = argparse.ArgumentParser(description="WaRMS vertical flight simulation")
+    parser.add_argument('--bottle-volume', type=float, default=defaults.bottle_volume, help="L")
+    parser.add_argument('--water-ratio', type=float, default=defaults.water_ratio, help="%%")
+    parser.add_argument('--pressure', type=float, default=defaults.pressure, help="bar")
+    parser.add_argument('--nozzle-diameter', type=float, default=defaults.nozzle_diameter, help="mm")
+    parser.add_argument('--diameter', type=float, default=defaults.diameter, help="bottle diameter (mm)")
+    parser.add_argument('--bottle-mass', type=float, default=defaults.bottle_mass, help="empty mass (g)")
+    parser.add_argument('--drag-coefficient', type=float, default=DRAG_COEFFICIENT)
+    parser.add_argument('--air-phase', action='store_true', help="include the air phase")
+    args = parser.parse_args(argv)
+
+    try:
+        result = simulate_flight(args.bottle_volume, args.water_ratio, args.pressure, args.nozzle_diameter,
+                                 args.air_phase, args.diameter, args.bottle_mass, args.drag_coefficient)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"apogee: {result['apogee'][0]:.1f} m")
+    print(f"max velocity: {result['max_velocity'][0]:.1f} m/s")
+    print(f"time to apogee: {result['time_to_apogee'][0]:.2f} s")
+    print(f"burnout: {result['burnout_altitude'][0]:.2f} m at {result['burnout_velocity'][0]:.1f} m/s")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
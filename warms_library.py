@@ -0,0 +1,200 @@
+"""Libreria di motori RASP (.eng) con indice persistente.
+
+Il parser legge file anche con molti motori senza cicli Python per riga:
+i commenti vengono rimossi e le intestazioni individuate con espressioni
+regolari sull'intero testo, mentre i punti della curva di ogni motore
+vengono convertiti in blocco con numpy. L'indice (classe, impulso totale,
+spinta media e massima, tempo di combustione, dimensioni) è un array
+strutturato salvato in formato .npz, aggiornato solo per i file modificati.
+"""
+import os
+import re
+from collections import namedtuple
+
+import numpy as np
+
+from warms_core import curve_metrics, impulse_classes
+
+INDEX_VERSION = 1
+INDEX_FILE_NAME = '.warms_index.npz'
+RASP_EXTENSIONS = ('.eng',)
+
+RaspMotor = namedtuple('RaspMotor', [
+    'name', 'diameter', 'length', 'delays', 'propellant_mass', 'total_mass', 'manufacturer',
+    't',  # tempi in ms, a partire da 0
+    'thrust',  # N
+])
+
+INDEX_DTYPE = np.dtype([
+    ('path', 'U260'),
+    ('position', 'i4'),  # indice del motore all'interno del file
+    ('name', 'U32'),
+    ('manufacturer', 'U32'),
+    ('impulse_class', 'U4'),
+    ('total_impulse', 'f8'),  # N⋅s
+    ('average_thrust', 'f8'),  # N
+    ('peak_thrust', 'f8'),  # N
+    ('burn_time', 'f8'),  # s
+    ('diameter', 'f8'),  # mm
+    ('length', 'f8'),  # mm
+    ('propellant_mass', 'f8'),  # kg
+    ('total_mass', 'f8'),  # kg
+])
+
+_COMMENT = re.compile(r';[^\n]*')
+# Intestazione: nome diametro lunghezza ritardi massa_propellente massa_totale produttore
+# (il nome non è un numero, così le righe di dati con più coppie non vengono confuse)
+_HEADER = re.compile(r'^[ \t]*(?![-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?\s)'
+                     r'(\S+)[ \t]+(\S+)[ \t]+(\S+)[ \t]+(\S+)[ \t]+(\S+)[ \t]+(\S+)[ \t]+(\S+)[^\n]*$',
+                     re.MULTILINE)
+
+
+def parse_rasp(text):
+    """Restituisce la lista dei RaspMotor contenuti nel testo di un file RASP"""
+    text = _COMMENT.sub('', text)
+    headers = list(_HEADER.finditer(text))
+    motors = []
+    for header, following in zip(headers, headers[1:] + [None]):
+        block = text[header.end():following.start() if following else len(text)]
+        try:
+            name, diameter, length, delays, propellant_mass, total_mass, manufacturer = header.groups()
+            values = np.array(block.split(), dtype=float)
+            diameter, length = float(diameter), float(length)
+            propellant_mass, total_mass = float(propellant_mass), float(total_mass)
+        except ValueError:
+            continue  # Intestazione o dati non numerici: motore ignorato
+        if len(values) < 4 or len(values) % 2:
+            continue
+        points = values.reshape(-1, 2)
+        t, thrust = points[:, 0] * 1000, points[:, 1]
+        if t[0] > 0:
+            # Il formato RASP sottintende il punto iniziale (0, 0)
+            t, thrust = np.concatenate([[0.0], t]), np.concatenate([[0.0], thrust])
+        motors.append(RaspMotor(name, diameter, length, delays, propellant_mass, total_mass,
+                                manufacturer, t, thrust))
+    return motors
+
+
+def read_rasp(path):
+    """Legge tutti i motori di un file RASP"""
+    with open(path, encoding='utf-8', errors='replace') as f:
+        return parse_rasp(f.read())
+
+
+def index_rows(path, motors):
+    """Righe dell'indice (INDEX_DTYPE) per i motori di un file"""
+    rows = np.zeros(len(motors), dtype=INDEX_DTYPE)
+    if not motors:
+        return rows
+    for position, motor in enumerate(motors):
+        metrics = curve_metrics(motor.t, motor.thrust, motor.t[-1])
+        burn_time = (motor.t[-1] - motor.t[0]) / 1000
+        impulse = metrics['total_impulse'][0]
+        rows[position] = (path, position, motor.name[:32], motor.manufacturer[:32], '',
+                          impulse, impulse / burn_time if burn_time > 0 else 0.0,
+                          metrics['peak_thrust'][0], burn_time, motor.diameter, motor.length,
+                          motor.propellant_mass, motor.total_mass)
+    rows['impulse_class'] = impulse_classes(rows['total_impulse'])
+    return rows
+
+
+class MotorLibrary:
+    """Indice interrogabile dei motori RASP contenuti in una o più directory.
+
+    Con index_file l'indice viene caricato all'avvio e save() lo conserva;
+    scan() rilegge solo i file nuovi o modificati (dimensione e data).
+    """
+
+    def __init__(self, index_file=None):
+        self.index_file = index_file
+        self.motors = np.zeros(0, dtype=INDEX_DTYPE)
+        self._files = {}  # percorso -> (dimensione, data di modifica)
+        if index_file and os.path.exists(index_file):
+            self._load(index_file)
+
+    def __len__(self):
+        return len(self.motors)
+
+    def _load(self, index_file):
+        try:
+            with np.load(index_file) as data:
+                if int(data['version']) != INDEX_VERSION:
+                    return
+                self.motors = data['motors'].astype(INDEX_DTYPE)
+                self._files = {path: (int(size), float(mtime))
+                               for path, size, mtime in zip(data['files'], data['sizes'], data['mtimes'])}
+        except (OSError, KeyError, ValueError):
+            pass  # Indice illeggibile: verrà ricostruito
+
+    def save(self, index_file=None):
+        index_file = index_file or self.index_file
+        paths = sorted(self._files)
+        temp_path = index_file + '.tmp.npz'
+        np.savez(temp_path, version=INDEX_VERSION, motors=self.motors,
+                 files=np.array(paths, dtype='U260'),
+                 sizes=np.array([self._files[p][0] for p in paths], dtype=np.int64),
+                 mtimes=np.array([self._files[p][1] for p in paths], dtype=float))
+        os.replace(temp_path, index_file)
+
+    def scan(self, directory, progress=None):
+        """Indicizza i file RASP della directory (e sottodirectory); restituisce i file letti"""
+        found = {}
+        for root, _, names in os.walk(directory):
+            for name in names:
+                if name.lower().endswith(RASP_EXTENSIONS):
+                    path = os.path.abspath(os.path.join(root, name))
+                    stat = os.stat(path)
+                    found[path] = (stat.st_size, stat.st_mtime)
+
+        prefix = os.path.join(os.path.abspath(directory), '')
+        stale = {path for path in self._files if path.startswith(prefix) and found.get(path) != self._files[path]}
+        changed = [path for path, signature in found.items() if self._files.get(path) != signature]
+
+        parts = [self.motors[~np.isin(self.motors['path'], list(stale))]] if stale else [self.motors]
+        for path in stale:
+            del self._files[path]
+        for count, path in enumerate(changed, 1):
+            try:
+                parts.append(index_rows(path, read_rasp(path)))
+            except OSError:
+                continue  # File non leggibile: verrà riprovato alla prossima scansione
+            self._files[path] = found[path]
+            if progress:
+                progress(count / len(changed))
+        self.motors = np.concatenate(parts)
+        return len(changed)
+
+    def query(self, impulse_class=None, name=None, total_impulse=None, average_thrust=None,
+              burn_time=None, diameter=None):
+        """Motori che soddisfano tutti i criteri, ordinati per impulso totale.
+
+        impulse_class è una classe o una sequenza di classi, name una
+        sottostringa (senza distinzione di maiuscole) del nome o del
+        produttore; gli altri criteri sono intervalli (min, max) con
+        estremi facoltativi (None).
+        """
+        motors = self.motors
+        mask = np.ones(len(motors), dtype=bool)
+        if impulse_class:
+            classes = [impulse_class] if isinstance(impulse_class, str) else list(impulse_class)
+            mask &= np.isin(motors['impulse_class'], classes)
+        if name:
+            needle = name.lower()
+            mask &= ((np.char.find(np.char.lower(motors['name']), needle) >= 0)
+                     | (np.char.find(np.char.lower(motors['manufacturer']), needle) >= 0))
+        for field, bounds in (('total_impulse', total_impulse), ('average_thrust', average_thrust),
+                              ('burn_time', burn_time), ('diameter', diameter)):
+            if bounds is None:
+                continue
+            low, high = bounds
+            if low is not None:
+                mask &= motors[field] >= low
+            if high is not None:
+                mask &= motors[field] <= high
+        selected = motors[mask]
+        return selected[np.argsort(selected['total_impulse'], kind='stable')]
+
+    @staticmethod
+    def load_motor(entry):
+        """Curva completa (RaspMotor) di una riga dell'indice"""
+        return read_rasp(str(entry['path']))[int(entry['position'])]
@@ -0,0 +1,281 @@
+"""Importazione dei log di cella di carico delle prove statiche.
+
+I log registrati a 10-50 kHz (CSV/testo o binari grezzi) vengono letti a
+blocchi, senza caricarli interamente in memoria: i file di testo in modo
+sequenziale, quelli binari con np.memmap. Durante la lettura ogni gruppo di
+BLOCK_SIZE campioni viene riassunto (minimo, massimo e impulso parziale
+integrato con i trapezi, come per le curve calcolate); sui riassunti si
+individua la finestra di accensione e si costruisce la curva decimata per
+il grafico, mentre l'impulso misurato è la somma esatta sui campioni della
+finestra.
+"""
+import math
+import os
+import re
+from collections import namedtuple
+
+import numpy as np
+
+BLOCK_SIZE = 64  # campioni per blocco riassunto
+CHUNK_BYTES = 1024 * 1024  # lettura dei file di testo
+CHUNK_SAMPLES = 1 << 20  # lettura dei file binari
+TARE_SAMPLES = 2048  # campioni iniziali usati per lo zero della cella
+IGNITION_FRACTION = 0.05  # soglia di accensione come frazione della spinta massima
+NOISE_FACTOR = 5.0  # soglia minima in multipli del rumore a vuoto
+DEFAULT_MAX_POINTS = 4000
+
+# Fattori di conversione in N delle unità riconosciute nell'intestazione della colonna di spinta
+LOG_UNITS = {'n': 1.0, 'kn': 1000.0, 'kg': 9.80665, 'kgf': 9.80665, 'g': 0.00980665,
+             'gf': 0.00980665, 'lb': 4.44822, 'lbf': 4.44822}
+_UNIT = re.compile(r'[\s(\[_]([a-z]+)[)\]]?\s*$')
+
+LoadCellLog = namedtuple('LoadCellLog', [
+    't',  # tempi decimati in ms, da 0 all'accensione
+    'thrust',  # spinta decimata in N (al netto dello zero)
+    'total_impulse',  # N⋅s, integrato su tutti i campioni della finestra
+    'peak_thrust',  # N
+    'burn_time',  # s
+    'ignition_time',  # s, istante di accensione nel tempo del log
+    'sample_rate',  # Hz (stimata dai tempi)
+    'n_samples',  # campioni letti
+    'tare',  # zero sottratto, nelle unità del log moltiplicate per scale
+])
+
+
+def _text_chunks(path, time_column, thrust_column, sample_rate, chunk_bytes, progress=None):
+    """Legge un log di testo a blocchi di righe e genera array (tempi in s, spinta).
+
+    Tutte le righe di dati devono avere lo stesso numero di campi della
+    prima (le righe vuote sono ignorate): una riga troncata o con campi in
+    più sposterebbe i campioni successivi nella colonna sbagliata, quindi
+    solleva ValueError con il numero di riga.
+    """
+    size = os.path.getsize(path) or 1
+    with open(path, encoding='utf-8', errors='replace') as f:
+        # Salta le righe di intestazione (prima colonna non numerica)
+        position = f.tell()
+        line = f.readline()
+        line_number = 0  # righe già lette prima del blocco corrente
+        while line and not _is_numeric_row(line):
+            position = f.tell()
+            line = f.readline()
+            line_number += 1
+        f.seek(position)
+        # Separatore ';' con virgola decimale (formato dei fogli di calcolo italiani)
+        decimal_comma = ';' in line
+        columns = len(_split(line, decimal_comma))
+
+        start = 0
+        consumed = position
+        while True:
+            lines = f.readlines(chunk_bytes)
+            if not lines:
+                return
+            consumed += sum(map(len, lines))
+            rows = [_split(line, decimal_comma) for line in lines]
+            lengths = np.fromiter(map(len, rows), dtype=int, count=len(rows))
+            bad = np.flatnonzero((lengths != columns) & (lengths > 0))
+            if bad.size:
+                raise ValueError(f"Line {line_number + bad[0] + 1}: expected {columns} fields, "
+                                 f"found {lengths[bad[0]]}")
+            line_number += len(lines)
+            values = np.array([field for row in rows for field in row], dtype=float).reshape(-1, columns)
+            thrust = values[:, thrust_column]
+            if time_column is None:
+                t = (start + np.arange(len(thrust))) / sample_rate
+            else:
+                t = values[:, time_column]
+            start += len(thrust)
+            if progress:
+                progress(min(consumed / size, 1.0))
+            yield t, thrust
+
+
+def _split(text, decimal_comma):
+    if decimal_comma:
+        text = text.replace(',', '.').replace(';', ' ')
+    else:
+        text = text.replace(',', ' ')
+    return text.replace('\t', ' ').split()
+
+
+def _header_scale(path, thrust_column):
+    """Fattore di conversione in N dedotto dall'intestazione di un log di testo (1 se assente)"""
+    header = None
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            if _is_numeric_row(line):
+                break
+            if line.strip():
+                header = line
+    if header is None:
+        return 1.0
+    names = [name.strip() for name in re.split(r'[;,\t]', header.strip())]
+    if thrust_column >= len(names):
+        return 1.0
+    match = _UNIT.search(' ' + names[thrust_column].lower())
+    return LOG_UNITS.get(match.group(1), 1.0) if match else 1.0
+
+
+def _is_numeric_row(line):
+    fields = _split(line, ';' in line)
+    if not fields:
+        return False
+    try:
+        float(fields[0])
+    except ValueError:
+        return False
+    return True
+
+
+def _binary_chunks(path, dtype, channels, thrust_column, sample_rate, header_bytes, chunk_samples, progress=None):
+    """Mappa in memoria un log binario e ne genera i blocchi (tempi in s, spinta)"""
+    data = np.memmap(path, dtype=dtype, mode='r', offset=header_bytes)
+    data = data[:len(data) // channels * channels].reshape(-1, channels)
+    for start in range(0, len(data), chunk_samples):
+        thrust = np.asarray(data[start:start + chunk_samples, thrust_column], dtype=float)
+        if progress:
+            progress(min((start + chunk_samples) / len(data), 1.0))
+        yield (start + np.arange(len(thrust))) / sample_rate, thrust
+
+
+def _summarize(chunks, tare, scale, block_size):
+    """Riassume il segnale a blocchi: tempi, minimo, massimo e impulso di ogni blocco.
+
+    I campioni che non completano un blocco passano al blocco successivo;
+    l'impulso di un blocco comprende il trapezio che lo collega al campione
+    precedente, così la somma su blocchi consecutivi è esatta.
+    """
+    parts = []
+    carry_t, carry_f = np.empty(0), np.empty(0)
+    previous = None
+    n_samples = 0
+
+    def summarize(t, f):
+        if previous is None:
+            segments = np.concatenate([[0.0], 0.5 * (f[1:] + f[:-1]) * np.diff(t)])
+        else:
+            segments = 0.5 * (f + np.concatenate([[previous[1]], f[:-1]])) * np.diff(t, prepend=previous[0])
+        size = min(block_size, len(f))
+        blocks = (f.reshape(-1, size), t.reshape(-1, size))
+        rows = np.arange(len(blocks[0]))
+        at_max, at_min = blocks[0].argmax(axis=1), blocks[0].argmin(axis=1)
+        parts.append((blocks[1][:, 0], blocks[1][:, -1],
+                      blocks[0][rows, at_max], blocks[1][rows, at_max],
+                      blocks[0][rows, at_min], blocks[1][rows, at_min],
+                      segments.reshape(-1, size).sum(axis=1)))
+
+    for t, f in chunks:
+        n_samples += len(f)
+        t = np.concatenate([carry_t, t])
+        f = np.concatenate([carry_f, (f * scale) - tare])
+        complete = len(f) // block_size * block_size
+        carry_t, carry_f = t[complete:], f[complete:]
+        if complete:
+            summarize(t[:complete], f[:complete])
+            previous = (t[complete - 1], f[complete - 1])
+    if len(carry_f):
+        summarize(carry_t, carry_f)
+
+    if not parts:
+        raise ValueError("The log contains no samples")
+    return n_samples, [np.concatenate(column) for column in zip(*parts)]
+
+
+def _decimate(t_max, f_max, t_min, f_min, max_points):
+    """Curva min/max con al più max_points punti dai riassunti dei blocchi"""
+    group = max(1, math.ceil(len(f_max) / max(max_points // 2, 1)))
+    pad = -len(f_max) % group
+    if pad:
+        t_max, t_min = np.pad(t_max, (0, pad), mode='edge'), np.pad(t_min, (0, pad), mode='edge')
+        f_max = np.pad(f_max, (0, pad), constant_values=-np.inf)
+        f_min = np.pad(f_min, (0, pad), constant_values=np.inf)
+    rows = np.arange(len(f_max) // group)
+    i_max = f_max.reshape(-1, group).argmax(axis=1)
+    i_min = f_min.reshape(-1, group).argmin(axis=1)
+    points_t = np.column_stack([t_max.reshape(-1, group)[rows, i_max], t_min.reshape(-1, group)[rows, i_min]])
+    points_f = np.column_stack([f_max.reshape(-1, group)[rows, i_max], f_min.reshape(-1, group)[rows, i_min]])
+    # Ogni coppia in ordine di tempo
+    order = np.argsort(points_t, axis=1, kind='stable')
+    return (np.take_along_axis(points_t, order, axis=1).ravel(),
+            np.take_along_axis(points_f, order, axis=1).ravel())
+
+
+def import_log(path, binary=False, time_column=0, thrust_column=1, sample_rate=None, scale=None,
+               tare=None, dtype='<f4', channels=1, header_bytes=0, max_points=DEFAULT_MAX_POINTS,
+               progress=None):
+    """Importa un log di cella di carico e ne ricava la curva di spinta misurata.
+
+    I log di testo hanno una colonna di tempi in secondi (time_column, o
+    None per usare sample_rate) e una di spinta; quelli binari contengono
+    campioni dtype interlacciati su channels canali, a sample_rate Hz, dopo
+    header_bytes byte di intestazione. scale converte la spinta in N (ad
+    esempio 9.80665 per i kg); di default è dedotto dall'unità indicata
+    nell'intestazione della colonna ("load_kg", "Forza (N)", "thrust [lbf]")
+    e vale 1 per i log binari. tare è lo zero della cella; di default è la
+    mediana dei primi campioni, che devono precedere l'accensione.
+    progress, se indicato, riceve la frazione del file letta.
+    """
+    if binary:
+        if not sample_rate:
+            raise ValueError("Binary logs need a sample rate")
+        chunks = _binary_chunks(path, dtype, channels, thrust_column, sample_rate, header_bytes, CHUNK_SAMPLES,
+                                progress)
+    else:
+        if time_column is None and not sample_rate:
+            raise ValueError("Logs without a time column need a sample rate")
+        if scale is None:
+            scale = _header_scale(path, thrust_column)
+        chunks = _text_chunks(path, time_column, thrust_column, sample_rate, CHUNK_BYTES, progress)
+
+    scale = 1.0 if scale is None else scale
+
+    # Zero e rumore a vuoto dai primi campioni del primo blocco letto
+    first = next(chunks, None)
+    if first is None or not len(first[1]):
+        raise ValueError("The log contains no samples")
+    head = first[1][:TARE_SAMPLES] * scale
+    if tare is None:
+        tare = float(np.median(head))
+    noise = float(np.std(head - tare))
+
+    def all_chunks():
+        yield first
+        yield from chunks
+
+    n_samples, (t_start, t_end, f_max, t_max, f_min, t_min, impulses) = _summarize(
+        all_chunks(), tare, scale, BLOCK_SIZE)
+
+    # Accensione: blocchi con picco oltre la soglia, dal primo all'ultimo
+    peak = float(f_max.max())
+    threshold = max(IGNITION_FRACTION * peak, NOISE_FACTOR * noise)
+    burning = np.flatnonzero(f_max > threshold)
+    if peak <= 0 or not len(burning):
+        raise ValueError("No ignition found in the log")
+
+    # La finestra si estende finché la spinta media del blocco supera il rumore
+    durations = np.diff(t_end, prepend=t_start[0])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        quiet = ~(impulses / durations > NOISE_FACTOR * noise / math.sqrt(BLOCK_SIZE))
+    before = np.flatnonzero(quiet[:burning[0]])
+    after = np.flatnonzero(quiet[burning[-1] + 1:])
+    first_block = before[-1] + 1 if len(before) else 0
+    last_block = burning[-1] + 1 + after[0] if len(after) else len(quiet)
+
+    window = slice(first_block, last_block)
+    ignition_time = float(t_start[first_block])
+    t, thrust = _decimate(t_max[window], f_max[window], t_min[window], f_min[window], max_points)
+    duration = float(t_end[-1] - t_start[0])
+
+    return LoadCellLog(
+        t=(t - ignition_time) * 1000,
+        thrust=thrust,
+        total_impulse=float(impulses[window].sum()),
+        peak_thrust=peak,
+        burn_time=float(t_end[last_block - 1] - ignition_time),
+        ignition_time=ignition_time,
+        sample_rate=(n_samples - 1) / duration if duration > 0 else float(sample_rate or 0),
+        n_samples=n_samples,
+        tare=tare,
+    )
+
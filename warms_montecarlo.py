@@ -0,0 +1,132 @@
+"""Analisi Monte Carlo dell'incertezza sulla curva di spinta.
+
+I parametri di lancio reali non sono mai esatti: pressione, riempimento e
+coefficiente di scarico variano da un lancio all'altro. Il modulo estrae
+migliaia di configurazioni perturbate secondo le tolleranze indicate, le
+valuta in blocco con thrust_curve_batch e ricava le bande percentili della
+spinta su una griglia temporale comune, la dispersione dell'impulso totale
+e la distribuzione delle classi NAR. Dipende solo da numpy.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from warms_core import (IMPULSE_CLASS_BOUNDARIES, curve_metrics, impulse_classes, interp_rows, model_coefficients,
+                        thrust_curve_batch)
+
+# Distribuzione di un parametro: 'normal' (spread = deviazione standard) o
+# 'uniform' (spread = semiampiezza), come frazione del valore nominale
+Tolerance = namedtuple('Tolerance', ['distribution', 'spread'])
+
+MonteCarloResult = namedtuple('MonteCarloResult', [
+    't',  # griglia temporale delle bande (ms)
+    'bands',  # {percentile: spinta (N) sulla griglia}
+    'impulses',  # impulso totale di ogni campione (N⋅s)
+    'impulse_percentiles',  # {percentile: impulso totale (N⋅s)}
+    'class_fractions',  # [(classe NAR, frazione dei campioni)] in ordine di classe
+])
+
+# Parametri perturbabili, con i limiti fisici entro cui vengono riportati i campioni
+MC_LIMITS = {
+    'bottle_volume': (1e-3, np.inf),  # L
+    'water_ratio': (0.1, 99.9),  # %
+    'pressure': (0.01, np.inf),  # bar
+    'nozzle_diameter': (0.1, np.inf),  # mm
+    'cd': (0.01, 1.0),
+    'air_efficiency': (0.0, 1.0),
+    'gas_rt': (1.0, np.inf),  # J/kg
+}
+
+DEFAULT_TOLERANCES = {
+    'pressure': Tolerance('normal', 0.03),
+    'water_ratio': Tolerance('normal', 0.05),
+    'cd': Tolerance('normal', 0.03),
+    'air_efficiency': Tolerance('normal', 0.10),
+}
+
+DEFAULT_SAMPLES = 10000
+PERCENTILES = (5, 50, 95)
+N_BAND_POINTS = 200
+DEFAULT_CHUNK_SIZE = 2500
+
+# Campionamento ridotto delle curve: basta per impulsi e bande e dimezza i tempi
+N_WATER_MC = 200
+N_AIR_MC = 100
+
+
+def sample_parameters(nominal, tolerances, n_samples, rng):
+    """Estrae n_samples valori per ogni parametro nominale secondo le tolleranze"""
+    samples = {}
+    for name, value in nominal.items():
+        tolerance = tolerances.get(name)
+        if tolerance is None or tolerance.spread == 0:
+            samples[name] = np.full(n_samples, float(value))
+            continue
+        if tolerance.distribution == 'normal':
+            noise = rng.standard_normal(n_samples)
+        elif tolerance.distribution == 'uniform':
+            noise = rng.uniform(-1.0, 1.0, n_samples)
+        else:
+            raise ValueError(f"Unknown distribution for {name}: {tolerance.distribution}")
+        low, high = MC_LIMITS[name]
+        samples[name] = np.clip(value * (1 + tolerance.spread * noise), low, high)
+    return samples
+
+
+def class_fractions(classes):
+    """Frazione dei campioni in ogni classe NAR, nell'ordine delle classi"""
+    names, counts = np.unique(classes, return_counts=True)
+    order = list(IMPULSE_CLASS_BOUNDARIES.values()) + ['I+']
+    fractions = dict(zip(names.tolist(), (counts / counts.sum()).tolist()))
+    return [(name, fractions[name]) for name in order if name in fractions]
+
+
+def monte_carlo(config, n_samples=DEFAULT_SAMPLES, tolerances=None, seed=None,
+                chunk_size=DEFAULT_CHUNK_SIZE, progress=None, coefficients=None):
+    """Valuta n_samples varianti perturbate di una MotorConfig.
+
+    tolerances associa ai nomi di MC_LIMITS una Tolerance (default
+    DEFAULT_TOLERANCES); coefficients sono i coefficienti nominali del
+    modello (default MODEL_COEFFICIENTS). I campioni sono valutati a blocchi di chunk_size
+    righe; progress, se indicato, riceve la frazione completata dopo ogni
+    blocco (e può sollevare un'eccezione per interrompere il calcolo).
+    """
+    tolerances = DEFAULT_TOLERANCES if tolerances is None else tolerances
+    rng = np.random.default_rng(seed)
+    nominal = {
+        'bottle_volume': config.bottle_volume,
+        'water_ratio': config.water_ratio,
+        'pressure': config.pressure,
+        'nozzle_diameter': config.nozzle_diameter,
+        **model_coefficients(coefficients),
+    }
+    samples = sample_parameters(nominal, tolerances, n_samples, rng)
+
+    curves = []
+    impulses = np.empty(n_samples)
+    burn_end = 0.0
+    for start in range(0, n_samples, chunk_size):
+        chunk = {name: values[start:start + chunk_size] for name, values in samples.items()}
+        t, thrust, water_end = thrust_curve_batch(include_air_phase=config.include_air_phase,
+                                                  n_water=N_WATER_MC, n_air=N_AIR_MC, **chunk)
+        metrics = curve_metrics(t, thrust, water_end)
+        impulses[start:start + len(t)] = metrics['total_impulse']
+        burn_end = max(burn_end, metrics['burn_time'].max() * 1000)
+        curves.append((t, thrust))
+        if progress:
+            progress(0.8 * min(start + chunk_size, n_samples) / n_samples)
+
+    # Bande percentili sulla griglia comune, fino alla fine della combustione più lunga
+    grid = np.linspace(0, burn_end, N_BAND_POINTS)
+    block = np.concatenate([interp_rows(grid, t, thrust) for t, thrust in curves])
+    bands = dict(zip(PERCENTILES, np.percentile(block, PERCENTILES, axis=0)))
+    if progress:
+        progress(1.0)
+
+    return MonteCarloResult(
+        t=grid,
+        bands=bands,
+        impulses=impulses,
+        impulse_percentiles=dict(zip(PERCENTILES, np.percentile(impulses, PERCENTILES))),
+        class_fractions=class_fractions(impulse_classes(impulses)),
+    )
@@ -0,0 +1,207 @@
+"""Disegno scalabile delle curve di spinta.
+
+Tutte le curve calcolate vengono disegnate come un'unica LineCollection,
+dopo averle ridotte con LTTB (Largest-Triangle-Three-Buckets) al numero di
+punti che la larghezza in pixel del grafico può mostrare. Le transizioni
+acqua/aria sono a loro volta un'unica collezione di segmenti verticali
+tratteggiati, dall'asse dei tempi fino alla curva; le curve possono avere
+una banda di incertezza (ad esempio i percentili Monte Carlo). Le curve
+aggiunte in blocco (sessioni salvate) usano una riduzione min/max
+vettoriale, molto più rapida di LTTB. Il modulo usa solo matplotlib e
+funziona anche con il backend Agg.
+"""
+import numpy as np
+from matplotlib.collections import LineCollection
+from matplotlib.colors import to_rgba
+
+CURVE_COLORS = ['b', 'g', 'r', 'c', 'm', 'y', 'orange', 'purple', 'brown', 'pink']
+# Punti complessivi al massimo per le curve aggiunte in blocco (tempo di disegno)
+MAX_BULK_POINTS = 1_000_000
+MIN_BULK_CURVE_POINTS = 32
+
+
+def lttb(x, y, n_out):
+    """Riduce una curva a n_out punti con l'algoritmo Largest-Triangle-Three-Buckets.
+
+    Il primo e l'ultimo punto sono sempre mantenuti; per ogni intervallo
+    intermedio viene scelto il punto che forma il triangolo di area massima
+    con il punto scelto in precedenza e la media dell'intervallo successivo,
+    preservando picchi e cambi di pendenza.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return x, y
+
+    every = (n - 2) / (n_out - 2)
+    edges = np.floor(np.arange(n_out - 1) * every).astype(int) + 1
+    bounds = np.append(edges, n)
+
+    # Medie di ogni intervallo (l'ultimo contiene solo il punto finale)
+    counts = np.diff(bounds)
+    mean_x = np.add.reduceat(x, bounds[:-1]) / counts
+    mean_y = np.add.reduceat(y, bounds[:-1]) / counts
+
+    indices = np.empty(n_out, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = bounds[i], bounds[i + 1]
+        area = np.abs((x[a] - mean_x[i + 1]) * (y[start:end] - y[a])
+                      - (x[a] - x[start:end]) * (mean_y[i + 1] - y[a]))
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+    return x[indices], y[indices]
+
+
+def minmax(x, y, n_out):
+    """Riduce una curva a circa n_out punti, con minimo e massimo di ogni gruppo di campioni"""
+    n = len(x)
+    if n_out >= n or n_out < 4:
+        return x, y
+    group = -(-n // (n_out // 2))
+    starts = np.arange(0, n, group)
+    # Gruppi completati ripetendo l'ultimo campione
+    blocks = y[np.minimum(starts[:, np.newaxis] + np.arange(group), n - 1)]
+    indices = np.sort(np.column_stack([blocks.argmin(axis=1), blocks.argmax(axis=1)]), axis=1)
+    indices = np.minimum(indices + starts[:, np.newaxis], n - 1).ravel()
+    indices[[0, -1]] = 0, n - 1
+    return x[indices], y[indices]
+
+
+class CurvePlot:
+    """Insieme di curve disegnate su un Axes come collezioni di linee"""
+
+    def __init__(self, ax, linewidth=2):
+        self.ax = ax
+        self.labels = []
+        self.colors = []
+        self._segments = []
+        self._transitions = []
+        self._transition_colors = []
+        self._bands = []
+
+        self.linewidth = linewidth
+        self.lines = LineCollection([], linewidths=linewidth)
+        ax.add_collection(self.lines, autolim=False)
+        self.transition_lines = LineCollection([], linestyles='--', alpha=0.5)
+        ax.add_collection(self.transition_lines, autolim=False)
+        self.annotation = None
+        self.highlight_line, = ax.plot([], [], linewidth=5, alpha=0.35, label='_highlight')
+
+    def __len__(self):
+        return len(self._segments)
+
+    def next_color(self):
+        return self.color(len(self._segments))
+
+    @staticmethod
+    def color(index):
+        """Colore della curva con l'indice dato, a rotazione su CURVE_COLORS"""
+        return CURVE_COLORS[index % len(CURVE_COLORS)]
+
+    def max_points(self):
+        """Numero di punti utile per curva: uno per ogni spessore di linea in orizzontale"""
+        return max(int(self.ax.bbox.width / self.linewidth), 100)
+
+    def add(self, t, thrust, label, color=None, water_end_time=None, annotation=None, band=None, scale=1.0):
+        """Aggiunge una curva (ridotta alla risoluzione del grafico) e ne restituisce l'indice.
+
+        band, se indicata, è una coppia (inferiore, superiore) di array sugli
+        stessi tempi della curva, disegnata come area semitrasparente. scale
+        converte la spinta nell'unità del grafico: si applica ai soli punti
+        ridotti, senza copiare la curva.
+        """
+        color = color or self.next_color()
+        t, thrust = np.asarray(t, dtype=float), np.asarray(thrust, dtype=float)
+        points = self._append(t, thrust, lttb, self.max_points(), label, color, water_end_time, scale)
+        self._update_collections()
+
+        # Una sola annotazione, sulla curva più recente
+        if self.annotation is not None:
+            self.annotation.remove()
+            self.annotation = None
+        if annotation is not None:
+            text, xy, xytext = annotation
+            self.annotation = self.ax.annotate(text, xy=xy, xytext=xytext,
+                                               arrowprops=dict(arrowstyle='->', color=color, alpha=0.7),
+                                               fontsize=8, color=color)
+
+        if band is not None:
+            low, high = (np.asarray(values) * scale for values in band) if scale != 1.0 else band
+            self._bands.append(self.ax.fill_between(t, low, high, color=color, alpha=0.2, linewidth=0))
+            self.ax.update_datalim(np.column_stack([t, high]))
+
+        self.ax.update_datalim(points)
+        self.ax.autoscale_view()
+        return len(self._segments) - 1
+
+    def add_many(self, curves, labels, colors=None, water_end_times=None, scale=1.0):
+        """Aggiunge in blocco coppie (t, thrust) con un solo aggiornamento del grafico.
+
+        water_end_times contiene per ogni curva il tempo di transizione o
+        None; restituisce l'indice della prima curva aggiunta. Con molte
+        curve i punti di ognuna si riducono entro MAX_BULK_POINTS complessivi.
+        """
+        first = len(self._segments)
+        n_out = max(min(self.max_points(), MAX_BULK_POINTS // max(len(labels), 1)), MIN_BULK_CURVE_POINTS)
+        colors = colors or [CURVE_COLORS[(first + i) % len(CURVE_COLORS)] for i in range(len(labels))]
+        water_end_times = water_end_times or [None] * len(labels)
+        for (t, thrust), label, color, water_end_time in zip(curves, labels, colors, water_end_times):
+            self._append(np.asarray(t, dtype=float), np.asarray(thrust, dtype=float), minmax, n_out, label, color,
+                         water_end_time, scale)
+        if len(self._segments) > first:
+            self._update_collections()
+            self.ax.update_datalim(np.concatenate(self._segments[first:]))
+            self.ax.autoscale_view()
+        return first
+
+    def _append(self, t, thrust, reduce, n_out, label, color, water_end_time, scale):
+        """Riduce e registra una curva (e la sua transizione); restituisce i punti disegnati"""
+        x, y = reduce(t, thrust, n_out)
+        points = np.column_stack([x, y])
+        if scale != 1.0:
+            points[:, 1] *= scale
+        self._segments.append(points)
+        self.labels.append(label)
+        self.colors.append(color)
+        if water_end_time is not None:
+            # Segmento dall'asse alla spinta all'inizio della fase aria
+            top = thrust[max(np.searchsorted(t, water_end_time, side='right') - 1, 0)] * scale
+            self._transitions.append([(water_end_time, 0), (water_end_time, top)])
+            self._transition_colors.append(to_rgba(color))
+        return points
+
+    def _update_collections(self):
+        self.lines.set_segments(self._segments)
+        self.lines.set_color([to_rgba(c) for c in self.colors])
+        if self._transitions:
+            self.transition_lines.set_segments(self._transitions)
+            self.transition_lines.set_color(self._transition_colors)
+
+    def highlight(self, index=None):
+        """Evidenzia la curva con l'indice dato (None toglie l'evidenziazione)"""
+        if index is None or not 0 <= index < len(self._segments):
+            self.highlight_line.set_data([], [])
+            return
+        points = self._segments[index]
+        self.highlight_line.set_data(points[:, 0], points[:, 1])
+        self.highlight_line.set_color(self.colors[index])
+
+    def clear(self):
+        """Rimuove tutte le curve"""
+        self.labels = []
+        self.colors = []
+        self._segments = []
+        self._transitions = []
+        self._transition_colors = []
+        for band in self._bands:
+            band.remove()
+        self._bands = []
+        self.lines.set_segments([])
+        self.transition_lines.set_segments([])
+        self.highlight_line.set_data([], [])
+        if self.annotation is not None:
+            self.annotation.remove()
+            self.annotation = None
+        self.ax.relim()
+        self.ax.autoscale_view()
@@ -0,0 +1,502 @@
+"""Servizio HTTP/JSON locale di WaRMS (asyncio, senza dipendenze esterne).
+
+Espone la curva di spinta, le grandezze derivate e l'export RASP:
+
+    POST /curve    grandezze, tempi (ms) e spinta (N) della curva
+    POST /impulse  solo le grandezze (impulsi, spinta massima e media, classe NAR)
+    POST /rasp     grandezze e contenuto del file .eng
+    GET  /health   stato del servizio
+    GET  /stats    contatori delle richieste e dei blocchi calcolati
+
+Il corpo è un oggetto JSON con i campi di MotorConfig (unità metriche,
+come warms_batch) e le opzioni facoltative method ('fixed' o 'adaptive'),
+sampling (profilo di SAMPLING_PROFILES), profile (profilo calibrato) e,
+per /rasp, tolerance (riduzione dei punti, frazione della spinta massima);
+una lista di oggetti restituisce una lista di risultati.
+
+Le richieste che arrivano entro BATCH_WINDOW vengono accorpate in blocchi
+con le stesse opzioni di calcolo e valutate con una sola chiamata di
+thrust_curve_batch; i blocchi grandi (o con l'integrazione adattiva) vanno
+a un pool di processi, gli altri a un thread, così il ciclo degli eventi
+continua a servire le connessioni. Se un blocco fallisce le sue voci sono
+ricalcolate una per una e l'errore arriva solo a quelle che lo causano.
+Richieste identiche a una ancora in corso ne attendono il risultato invece
+di ricalcolarlo.
+Con --load-test il servizio viene avviato in un processo separato (o si usa
+quello indicato da --url) e sottoposto a un carico di richieste concorrenti.
+
+    python warms_service.py --port 8765
+    curl -d '{"pressure": 6, "include_air_phase": true}' localhost:8765/impulse
+    python warms_service.py --load-test --requests 20000 --concurrency 100
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import astuple
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from warms_batch import config_from_record
+from warms_calibration import load_profiles
+from warms_core import (PARAM_RANGES, SAMPLING_PROFILES, CurveResult, calculate_thrust_curve, format_rasp,
+                        model_coefficients, sampling_resolution, thrust_curve_batch, trim_empty_air_phase)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+BATCH_WINDOW = 0.002  # s, attesa massima per accorpare le richieste
+MAX_BATCH = 1024  # configurazioni per blocco
+POOL_MIN_BATCH = 256  # blocchi più piccoli vengono calcolati in un thread del servizio
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+
+ROUTES = {'/curve': 'curve', '/impulse': 'impulse', '/rasp': 'rasp'}
+METHODS = ('fixed', 'adaptive')
+
+# Carico predefinito del generatore
+LOAD_REQUESTS = 20000
+LOAD_CONCURRENCY = 64
+LOAD_DISTINCT = 500  # configurazioni diverse: le altre richieste sono ripetizioni
+LOAD_MIN_RPS = 1000  # sotto questa soglia il carico non è sostenuto (codice di uscita 1)
+STARTUP_TIMEOUT = 30  # s, attesa dell'avvio del servizio per il generatore
+
+_PARAMS = ('bottle_volume', 'water_ratio', 'pressure', 'nozzle_diameter')
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            413: 'Payload Too Large', 431: 'Request Header Fields Too Large', 500: 'Internal Server Error',
+            501: 'Not Implemented'}
+
+
+class RequestError(ValueError):
+    """Richiesta non valida (risposta con codice status)"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def evaluate_batch(kind, configs, method='fixed', sampling=None, coefficients=None, tolerances=None):
+    """Risposte JSON (bytes) per un blocco di configurazioni con le stesse opzioni di calcolo.
+
+    Tutte le configurazioni hanno la stessa opzione della fase aria; con
+    il metodo a passo fisso le curve si calcolano con una sola chiamata di
+    thrust_curve_batch. Eseguita anche nei processi del pool.
+    """
+    coefficients = model_coefficients(coefficients)
+    if method == 'fixed':
+        n_water, n_air = sampling_resolution(sampling)
+        columns = [[getattr(config, name) for config in configs] for name in _PARAMS]
+        t, thrust, water_end = thrust_curve_batch(*columns, configs[0].include_air_phase, n_water=n_water,
+                                                  n_air=n_air, **coefficients)
+        curves = [CurveResult(*trim_empty_air_phase(t[i], thrust[i], n_water), water_end[i])
+                  for i in range(len(configs))]
+    else:
+        curves = [CurveResult(*calculate_thrust_curve(*(getattr(config, name) for name in _PARAMS),
+                                                      config.include_air_phase, method,
+                                                      coefficients=coefficients))
+                  for config in configs]
+    tolerances = tolerances or [None] * len(configs)
+    return [_encode(kind, config, curve, tolerance) for config, curve, tolerance in zip(configs, curves, tolerances)]
+
+
+def _encode(kind, config, curve, tolerance=None):
+    result = {
+        'total_impulse': curve.total_impulse,
+        'water_impulse': curve.water_impulse,
+        'air_impulse': curve.air_impulse,
+        'peak_thrust': curve.peak_thrust,
+        'burn_time': curve.burn_time,
+        'average_thrust': curve.average_thrust,
+        'impulse_class': curve.impulse_class,
+        'motor_name': curve.motor_name,
+        'water_end_time': curve.water_end_time,
+    }
+    if kind == 'curve':
+        result['t'] = curve.t.tolist()
+        result['thrust'] = curve.thrust.tolist()
+    elif kind == 'rasp':
+        result['rasp'] = format_rasp(config, curve.t, curve.thrust, tolerance=tolerance, result=curve)
+    return json.dumps(result).encode()
+
+
+class SimulationService:
+    """Valutazione delle richieste con accorpamento in blocchi e deduplicazione.
+
+    workers è il numero di processi del pool (0 = tutto nel processo del
+    servizio); profiles sono i profili calibrati (predefiniti: quelli
+    salvati da warms_calibration).
+    """
+
+    def __init__(self, workers=None, batch_window=BATCH_WINDOW, max_batch=MAX_BATCH, pool_min_batch=POOL_MIN_BATCH,
+                 profiles=None):
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.pool_min_batch = pool_min_batch
+        self.profiles = load_profiles() if profiles is None else profiles
+        if workers is None:
+            workers = os.cpu_count() or 1
+        # Con 'spawn' i processi del pool non ereditano i socket delle connessioni aperte
+        self._pool = (ProcessPoolExecutor(workers, multiprocessing.get_context('spawn')) if workers > 0
+                      else None)
+        self._thread = ThreadPoolExecutor(1, thread_name_prefix='warms-service')
+        self.stats = {'requests': 0, 'evaluations': 0, 'deduplicated': 0, 'computed': 0, 'batches': 0,
+                      'pool_batches': 0, 'errors': 0}
+        self._pending = {}  # opzioni di calcolo -> [(chiave, configurazione, tolleranza)]
+        self._pending_count = 0
+        self._inflight = {}  # chiave -> Future del risultato
+        self._flush_handle = None
+        self._tasks = set()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+        self._thread.shutdown(wait=False)
+
+    def parse(self, kind, record):
+        """Opzioni di calcolo, chiave, MotorConfig e tolleranza di una richiesta; RequestError se non valida"""
+        if not isinstance(record, dict):
+            raise RequestError("expected a JSON object")
+        try:
+            config = config_from_record(record)
+        except ValueError as e:
+            raise RequestError(str(e))
+        method = record.get('method') or 'fixed'
+        if method not in METHODS:
+            raise RequestError(f"unknown method: {method}")
+        sampling = record.get('sampling') or None
+        if sampling is not None and (not isinstance(sampling, str) or sampling not in SAMPLING_PROFILES):
+            raise RequestError(f"unknown sampling profile: {sampling}")
+        coefficients = None
+        profile = record.get('profile')
+        if profile:
+            if isinstance(profile, str):
+                coefficients = self.profiles.get(profile)
+            if coefficients is None:
+                raise RequestError(f"unknown profile: {profile}")
+        tolerance = None
+        if kind == 'rasp' and record.get('tolerance'):
+            try:
+                tolerance = float(record['tolerance'])
+            except (TypeError, ValueError):
+                raise RequestError("tolerance: not a number")
+            if not 0 <= tolerance < 1:
+                raise RequestError("tolerance out of range")
+        coefficients = tuple(sorted(model_coefficients(coefficients).items()))
+        group = (kind, config.include_air_phase, method, sampling if method == 'fixed' else None, coefficients)
+        return group, group + (astuple(config), tolerance), config, tolerance
+
+    async def evaluate(self, kind, record):
+        """Risposta JSON (bytes) per una richiesta"""
+        return await self.submit(*self.parse(kind, record))
+
+    def submit(self, group, key, config, tolerance):
+        """Accoda una richiesta già validata (o si unisce a una identica in corso); restituisce un awaitable"""
+        self.stats['evaluations'] += 1
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats['deduplicated'] += 1
+            return asyncio.shield(future)
+        loop = asyncio.get_running_loop()
+        future = self._inflight[key] = loop.create_future()
+        self._pending.setdefault(group, []).append((key, config, tolerance))
+        self._pending_count += 1
+        if self._pending_count >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+        # Una richiesta interrotta non annulla il calcolo condiviso con le altre
+        return asyncio.shield(future)
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending, self._pending_count = self._pending, {}, 0
+        loop = asyncio.get_running_loop()
+        for group, items in pending.items():
+            for start in range(0, len(items), self.max_batch):
+                task = loop.create_task(self._run_batch(group, items[start:start + self.max_batch]))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, group, items):
+        kind, _, method, sampling, coefficients = group
+        configs = [config for _, config, _ in items]
+        tolerances = [tolerance for _, _, tolerance in items]
+        args = (kind, configs, method, sampling, dict(coefficients), tolerances)
+        self.stats['batches'] += 1
+        self.stats['computed'] += len(items)
+        executor = self._thread
+        if self._pool is not None and (len(items) >= self.pool_min_batch or method != 'fixed'):
+            self.stats['pool_batches'] += 1
+            executor = self._pool
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(executor, evaluate_batch, *args)
+        except Exception as e:
+            if len(items) == 1:
+                self._inflight.pop(items[0][0]).set_exception(e)
+                return
+            # Una voce che fallisce non deve far fallire le altre accorpate con lei
+            for key, config, tolerance in items:
+                try:
+                    result = (await loop.run_in_executor(executor, evaluate_batch, kind, [config], method, sampling,
+                                                         dict(coefficients), [tolerance]))[0]
+                except Exception as e:
+                    self._inflight.pop(key).set_exception(e)
+                else:
+                    self._inflight.pop(key).set_result(result)
+            return
+        for (key, _, _), result in zip(items, results):
+            self._inflight.pop(key).set_result(result)
+
+    async def dispatch(self, method, path, body):
+        """Stato e corpo JSON della risposta a una richiesta HTTP"""
+        path = urlsplit(path).path.rstrip('/') or '/'
+        if path in ('/health', '/stats'):
+            if method != 'GET':
+                raise RequestError("use GET", 405)
+            if path == '/health':
+                return 200, b'{"status": "ok"}'
+            return 200, json.dumps(self.stats).encode()
+        kind = ROUTES.get(path)
+        if kind is None:
+            raise RequestError(f"unknown endpoint: {path}", 404)
+        if method != 'POST':
+            raise RequestError("use POST", 405)
+        try:
+            request = json.loads(body or b'{}')
+        except ValueError as e:
+            raise RequestError(f"invalid JSON ({e})")
+        if not isinstance(request, list):
+            return 200, await self.evaluate(kind, request)
+        # Tutte le voci vengono validate prima di accodarne una
+        parsed = []
+        for index, record in enumerate(request):
+            try:
+                parsed.append(self.parse(kind, record))
+            except RequestError as e:
+                raise RequestError(f"item {index}: {e}")
+        results = await asyncio.gather(*(self.submit(*item) for item in parsed))
+        return 200, b'[' + b','.join(results) + b']'
+
+    async def handle_connection(self, reader, writer):
+        """Richieste HTTP/1.1 di una connessione (keep-alive, anche in pipeline)"""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except asyncio.LimitOverrunError:
+                    await self._respond(writer, 431, b'{"error": "headers too large"}', False)
+                    return
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                request_line, *header_lines = head.decode('latin-1').split('\r\n')
+                headers = {}
+                for line in header_lines:
+                    name, separator, value = line.partition(':')
+                    if separator:
+                        headers[name.strip().lower()] = value.strip()
+                try:
+                    method, path, version = request_line.split(' ', 2)
+                    keep_alive = headers.get('connection', '').lower() != 'close' if version == 'HTTP/1.1' \
+                        else headers.get('connection', '').lower() == 'keep-alive'
+                    if 'transfer-encoding' in headers:
+                        raise RequestError("chunked requests are not supported", 501)
+                    length = int(headers.get('content-length') or 0)
+                    if not 0 <= length <= MAX_BODY_BYTES:
+                        raise RequestError("request body too large", 413)
+                except (ValueError, RequestError) as e:
+                    status = e.status if isinstance(e, RequestError) else 400
+                    await self._respond(writer, status, json.dumps({'error': str(e)}).encode(), False)
+                    return
+                body = await reader.readexactly(length) if length else b''
+                self.stats['requests'] += 1
+                try:
+                    status, payload = await self.dispatch(method, path, body)
+                except RequestError as e:
+                    status, payload = e.status, json.dumps({'error': str(e)}).encode()
+                except Exception as e:
+                    status, payload = 500, json.dumps({'error': str(e)}).encode()
+                if status != 200:
+                    self.stats['errors'] += 1
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    return
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status, payload, keep_alive):
+        writer.write(f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                     f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n"
+                     f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + payload)
+        await writer.drain()
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, service=None, ready=None):
+    """Avvia il servizio e resta in ascolto; ready(port) viene chiamata quando accetta connessioni"""
+    service = service or SimulationService()
+    server = await asyncio.start_server(service.handle_connection, host, port, limit=MAX_HEADER_BYTES)
+    try:
+        if ready is not None:
+            ready(server.sockets[0].getsockname()[1])
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def load_bodies(distinct=LOAD_DISTINCT, seed=0, include_air_phase=True):
+    """Corpi JSON di distinct configurazioni casuali negli intervalli degli slider"""
+    rng = np.random.default_rng(seed)
+    values = [rng.uniform(*PARAM_RANGES[name], distinct).round(2) for name in _PARAMS]
+    return [json.dumps(dict(zip(_PARAMS, map(float, row)), include_air_phase=include_air_phase)).encode()
+            for row in zip(*values)]
+
+
+async def _client(host, port, path, bodies, order, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for index in order:
+            body = bodies[index]
+            start = time.perf_counter()
+            writer.write(f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+            head = await reader.readuntil(b'\r\n\r\n')
+            length = 0
+            for line in head.split(b'\r\n'):
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':', 1)[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            if not head.startswith(b'HTTP/1.1 200'):
+                errors.append(head.split(b'\r\n', 1)[0].decode('latin-1'))
+    finally:
+        writer.close()
+
+
+async def load_test(host, port, path='/impulse', requests=LOAD_REQUESTS, concurrency=LOAD_CONCURRENCY,
+                    distinct=LOAD_DISTINCT, seed=0):
+    """Invia requests richieste da concurrency connessioni keep-alive e ne misura le prestazioni.
+
+    Le richieste scelgono a caso tra distinct configurazioni, così una
+    parte trova in corso una richiesta identica. Restituisce un dizionario
+    con richieste al secondo, latenze (ms) ed errori.
+    """
+    bodies = load_bodies(distinct, seed)
+    order = np.random.default_rng(seed).integers(len(bodies), size=requests)
+    latencies, errors = [], []
+    start = time.perf_counter()
+    results = await asyncio.gather(*(_client(host, port, path, bodies, order[i::concurrency], latencies, errors)
+                                     for i in range(concurrency)), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    errors.extend(str(result) for result in results if isinstance(result, Exception))
+    latencies = np.array(latencies) * 1000
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'seconds': elapsed,
+        'requests_per_second': len(latencies) / elapsed if elapsed > 0 else 0.0,
+        'latency_ms': {f'p{p}': float(np.percentile(latencies, p)) if len(latencies) else None for p in (50, 95, 99)},
+    }
+
+
+async def _fetch_json(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+        response = await reader.read()
+    finally:
+        writer.close()
+    return json.loads(response.split(b'\r\n\r\n', 1)[1])
+
+
+def _free_port(host):
+    with socket.socket() as s:
+        s.bind((host, 0))
+        return s.getsockname()[1]
+
+
+def _wait_for_service(host, port, process, timeout=STARTUP_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("the service exited during startup")
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("the service did not start in time")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="WaRMS local HTTP/JSON service")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, help="processes of the pool (default: one per CPU, 0 = none)")
+    parser.add_argument('--batch-window', type=float, default=BATCH_WINDOW * 1000,
+                        help="ms to wait for requests to coalesce (default %(default)s)")
+    parser.add_argument('--load-test', action='store_true', help="run the load generator against a local service")
+    parser.add_argument('--url', help="load test this running service instead of starting one")
+    parser.add_argument('--endpoint', choices=sorted(ROUTES), default='/impulse', help="load test endpoint")
+    parser.add_argument('--requests', type=int, default=LOAD_REQUESTS)
+    parser.add_argument('--concurrency', type=int, default=LOAD_CONCURRENCY)
+    parser.add_argument('--distinct', type=int, default=LOAD_DISTINCT, help="distinct configurations in the load")
+    parser.add_argument('--min-rps', type=float, default=LOAD_MIN_RPS,
+                        help="fail the load test below this throughput (default %(default)s)")
+    args = parser.parse_args(argv)
+
+    if not args.load_test:
+        service = SimulationService(args.workers, args.batch_window / 1000)
+        ready = lambda port: print(f"WaRMS service on http://{args.host}:{port}", file=sys.stderr, flush=True)
+        try:
+            asyncio.run(serve(args.host, args.port, service, ready))
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    if min(args.requests, args.concurrency, args.distinct) < 1:
+        parser.error("--requests, --concurrency and --distinct must be positive")
+    process = None
+    if args.url:
+        url = urlsplit(args.url if '//' in args.url else '//' + args.url)
+        host, port = url.hostname or DEFAULT_HOST, url.port or DEFAULT_PORT
+    else:
+        # Servizio in un processo separato, per non dividere la CPU con il generatore
+        host, port = args.host, _free_port(args.host)
+        command = [sys.executable, os.path.abspath(__file__), '--host', host, '--port', str(port),
+                   '--batch-window', str(args.batch_window)]
+        if args.workers is not None:
+            command += ['--workers', str(args.workers)]
+        process = subprocess.Popen(command, stderr=subprocess.DEVNULL)
+    try:
+        if process is not None:
+            _wait_for_service(host, port, process)
+        result = asyncio.run(load_test(host, port, args.endpoint, args.requests, args.concurrency, args.distinct))
+        result['service'] = asyncio.run(_fetch_json(host, port, '/stats'))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+    json.dump(result, sys.stdout, indent=2)
+    print()
+    if result['errors'] or result['requests_per_second'] < args.min_rps:
+        print(f"load test failed: {result['errors']} error(s), {result['requests_per_second']:.0f} requests/s",
+              file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,241 @@
+"""Archivio compatto delle curve calcolate e salvataggio delle sessioni.
+
+Parametri e grandezze di ogni curva sono righe di un array strutturato
+(CURVE_DTYPE); i campioni di tutte le curve sono accodati in due array
+contigui di tempi e spinte, indicizzati da inizio e lunghezza di ogni
+curva. Gli array sono preallocati e raddoppiano quando si riempiono. I
+nomi dei profili dei coefficienti sono in una tabella a parte, senza
+limiti di lunghezza: le righe ne conservano l'indice.
+
+Una sessione è un singolo file .npz non compresso: all'apertura i suoi
+membri vengono mappati in memoria (np.memmap) senza leggerli, così anche
+archivi di decine di migliaia di curve si riaprono subito e ogni curva
+viene letta dal disco solo quando serve (grafico o export). Un archivio
+aperto così è in sola lettura finché non gli si aggiunge una curva: a quel
+punto i dati vengono copiati in memoria.
+"""
+import dataclasses
+import os
+import struct
+import zipfile
+
+import numpy as np
+
+from warms_core import CurveResult, MotorConfig
+
+STORE_VERSION = 2
+
+CURVE_DTYPE = np.dtype([
+    ('bottle_volume', 'f8'),  # L
+    ('water_ratio', 'f8'),  # %
+    ('pressure', 'f8'),  # bar
+    ('nozzle_diameter', 'f8'),  # mm
+    ('length', 'f8'),  # mm
+    ('diameter', 'f8'),  # mm
+    ('bottle_mass', 'f8'),  # g
+    ('include_air_phase', '?'),
+    ('profile', 'i4'),  # indice del profilo dei coefficienti nella tabella dei nomi (0 = valori predefiniti)
+    ('start', 'i8'),  # primo campione della curva negli array dei campioni
+    ('size', 'i8'),  # numero di campioni
+    ('water_end_time', 'f8'),  # ms
+    ('total_impulse', 'f8'),  # N⋅s
+    ('water_impulse', 'f8'),  # N⋅s
+    ('air_impulse', 'f8'),  # N⋅s
+    ('peak_thrust', 'f8'),  # N
+    ('burn_time', 'f8'),  # s
+    ('average_thrust', 'f8'),  # N
+    ('impulse_class', 'U4'),
+    ('apogee', 'f8'),  # m (NaN senza simulazione del volo)
+    ('max_velocity', 'f8'),  # m/s
+    ('time_to_apogee', 'f8'),  # s
+])
+
+CONFIG_FIELDS = tuple(field.name for field in dataclasses.fields(MotorConfig))
+FLIGHT_FIELDS = ('apogee', 'max_velocity', 'time_to_apogee')
+METRIC_FIELDS = ('water_end_time', 'total_impulse', 'water_impulse', 'air_impulse', 'peak_thrust', 'burn_time',
+                 'average_thrust', 'impulse_class')
+
+INITIAL_CURVES = 64
+INITIAL_SAMPLES = 64 * 1024
+MMAP_MIN_BYTES = 1 << 16  # i membri più piccoli vengono letti subito
+
+
+class CurveStore:
+    """Curve calcolate con parametri e grandezze, in array contigui"""
+
+    def __init__(self, capacity=INITIAL_CURVES, sample_capacity=INITIAL_SAMPLES):
+        self._records = np.zeros(capacity, dtype=CURVE_DTYPE)
+        self._t = np.empty(sample_capacity)
+        self._thrust = np.empty(sample_capacity)
+        self._count = 0
+        self._samples = 0
+        self._set_profiles([''])
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def records(self):
+        """Righe CURVE_DTYPE delle curve archiviate (vista, senza copie)"""
+        return self._records[:self._count]
+
+    def _reserve(self, curves, samples):
+        """Raddoppia gli array che non hanno spazio sufficiente (copiandoli in memoria)"""
+        if self._count + curves > len(self._records):
+            records = np.zeros(max(2 * len(self._records), self._count + curves, INITIAL_CURVES), dtype=CURVE_DTYPE)
+            records[:self._count] = self._records[:self._count]
+            self._records = records
+        if self._samples + samples > len(self._t):
+            size = max(2 * len(self._t), self._samples + samples, INITIAL_SAMPLES)
+            for name in ('_t', '_thrust'):
+                values = np.empty(size)
+                values[:self._samples] = getattr(self, name)[:self._samples]
+                setattr(self, name, values)
+
+    def append(self, config, curve, profile='', flight=None):
+        """Archivia una curva (CurveResult) con la sua MotorConfig e ne restituisce l'indice.
+
+        flight è il risultato facoltativo della simulazione del volo
+        (vedi warms_flight.config_flight).
+        """
+        size = len(curve.t)
+        self._reserve(1, size)
+        start = self._samples
+        self._t[start:start + size] = curve.t
+        self._thrust[start:start + size] = curve.thrust
+        row = self._records[self._count]
+        for name in CONFIG_FIELDS:
+            row[name] = getattr(config, name)
+        for name in METRIC_FIELDS:
+            row[name] = getattr(curve, name)
+        for name in FLIGHT_FIELDS:
+            row[name] = flight[name] if flight is not None else np.nan
+        profile = profile or ''
+        if profile not in self._profile_ids:
+            self._profile_ids[profile] = len(self._profiles)
+            self._profiles.append(profile)
+        row['profile'] = self._profile_ids[profile]
+        row['start'] = start
+        row['size'] = size
+        self._samples += size
+        self._count += 1
+        return self._count - 1
+
+    def _set_profiles(self, names):
+        self._profiles = list(names)
+        self._profile_ids = {name: i for i, name in enumerate(self._profiles)}
+
+    def _row(self, index):
+        if not -self._count <= index < self._count:
+            raise IndexError("Curve index out of range")
+        return self._records[index % self._count]
+
+    def samples(self, index):
+        """Tempi (ms) e spinta (N) di una curva, come viste sugli array dei campioni"""
+        row = self._row(index)
+        start, size = int(row['start']), int(row['size'])
+        return self._t[start:start + size], self._thrust[start:start + size]
+
+    def curve(self, index):
+        """CurveResult di una curva archiviata"""
+        t, thrust = self.samples(index)
+        return CurveResult(t, thrust, float(self._row(index)['water_end_time']))
+
+    def config(self, index):
+        """MotorConfig con cui la curva è stata calcolata"""
+        row = self._row(index)
+        values = {name: row[name].item() for name in CONFIG_FIELDS}
+        return MotorConfig(**values)
+
+    def profile(self, index):
+        """Nome del profilo dei coefficienti della curva ('' = valori predefiniti)"""
+        return self._profiles[int(self._row(index)['profile'])]
+
+    def flight(self, index):
+        """Risultato del volo archiviato con la curva (None se non simulato)"""
+        row = self._row(index)
+        if np.isnan(row['apogee']):
+            return None
+        return {name: float(row[name]) for name in FLIGHT_FIELDS}
+
+    def motors(self, indices=None):
+        """Genera le coppie (MotorConfig, CurveResult) per write_rasp_library"""
+        for index in range(self._count) if indices is None else indices:
+            yield self.config(index), self.curve(index)
+
+    def clear(self):
+        self.__init__()
+
+    def save(self, path):
+        """Salva l'archivio in un file .npz non compresso (scrittura atomica)"""
+        temp_path = path + '.tmp.npz'
+        np.savez(temp_path, version=np.array(STORE_VERSION), records=self.records,
+                 profiles=np.array(self._profiles), t=self._t[:self._samples], thrust=self._thrust[:self._samples])
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Apre un archivio salvato; con mmap i dati restano sul disco fino all'uso"""
+        arrays = _map_npz(path) if mmap else None
+        if arrays is None:
+            with np.load(path) as data:
+                arrays = {name: data[name] for name in data.files}
+        try:
+            version = int(arrays['version'])
+            records, t, thrust = arrays['records'], arrays['t'], arrays['thrust']
+        except KeyError:
+            raise ValueError("Not a WaRMS session file")
+        if version == 1 and records.dtype.names == CURVE_DTYPE.names:
+            records, profiles = _convert_v1(records)
+        elif version == STORE_VERSION and records.dtype == CURVE_DTYPE and 'profiles' in arrays:
+            profiles = [str(name) for name in arrays['profiles']]
+        else:
+            raise ValueError(f"Unsupported session file version: {version}")
+        store = cls.__new__(cls)
+        store._records, store._t, store._thrust = records, t, thrust
+        store._count, store._samples = len(records), len(t)
+        store._set_profiles(profiles)
+        return store
+
+
+def _convert_v1(records):
+    """Righe CURVE_DTYPE e tabella dei profili da quelle della versione 1 (nomi nelle righe)"""
+    converted = np.zeros(len(records), dtype=CURVE_DTYPE)
+    for name in CURVE_DTYPE.names:
+        if name != 'profile':
+            converted[name] = records[name]
+    names, inverse = np.unique(records['profile'], return_inverse=True)
+    profiles = [''] + [str(name) for name in names if name]
+    ids = {name: i for i, name in enumerate(profiles)}
+    converted['profile'] = np.array([ids[str(name)] for name in names], dtype='i4')[inverse]
+    return converted, profiles
+
+
+def _map_npz(path):
+    """Mappa in memoria i membri di un .npz non compresso (None se non è possibile)"""
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED or not info.filename.endswith('.npy'):
+                return None
+            # Dati del membro: dopo l'intestazione locale dello zip e quella .npy
+            f.seek(info.header_offset)
+            local = f.read(30)
+            name_length, extra_length = struct.unpack('<HH', local[26:30])
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            if dtype.hasobject:
+                return None
+            name = info.filename[:-4]
+            if info.file_size < MMAP_MIN_BYTES or 0 in shape:
+                count = int(np.prod(shape))
+                arrays[name] = np.fromfile(f, dtype=dtype, count=count).reshape(
+                    shape, order='F' if fortran_order else 'C')
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=f.tell(), shape=shape,
+                                         order='F' if fortran_order else 'C')
+    return arrays
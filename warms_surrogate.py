@@ -0,0 +1,286 @@
+"""Tabella adimensionale precalcolata delle curve di spinta.
+
+Nel modello a passo fisso la fase acqua dipende solo da due gruppi
+adimensionali: la frazione di riempimento r e il rapporto di pressione
+Π = p0 / p_atm. Con s = t / T il tempo normalizzato sulla durata della fase,
+
+    spinta(s) = 2⋅cd²⋅A⋅p_atm ⋅ max(Π⋅Q(r, s) - 1, 0)
+    T = 0.5⋅V⋅r / (cd⋅A⋅√(2⋅ρ⋅p_atm⋅(Π - 1)))
+
+dove Q(r, s) = ((1 - r) / (1 - r⋅(1 - s)))^γ: volume, ugello e cd sono solo
+fattori di scala. La fase aria dipende dal solo rapporto iniziale
+Π_aria = Π⋅(1 - r)^γ attraverso una funzione F della pressione relativa.
+La tabella conserva Q e le sue somme cumulative su una griglia di r, F e
+la somma dei campioni subsonici della fase aria su griglie di pressione
+(i campioni sonici sono lineari in Π_aria e si sommano esattamente): le curve
+si ottengono riscalando e interpolando, le grandezze (impulsi, picco, tempo
+di combustione) con un numero costante di operazioni per configurazione.
+
+Le tabelle sono versionate: un file creato con un'altra versione o con
+altri parametri del modello viene ignorato e ricostruito.
+
+    python warms_surrogate.py build -o surrogate.npz
+    python warms_surrogate.py check surrogate.npz --samples 2000
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from warms_core import (AIR_TIME_ESTIMATE, GAMMA, N_AIR_SAMPLES, N_WATER_SAMPLES, P_ATM, PARAM_RANGES, RHO_WATER,
+                        curve_metrics, model_coefficients, thrust_curve_batch)
+
+SURROGATE_VERSION = 1
+
+N_RATIO = 1001  # nodi della griglia del riempimento
+N_SUBSONIC = 2001  # nodi di F nel tratto subsonico della fase aria
+N_AIR_RATIO = 4001  # nodi della somma subsonica della fase aria
+MAX_PRESSURE = 20.0  # bar, pressione massima coperta dalla tabella
+RATIO_LIMITS = (0.0, 0.99)  # frazione di riempimento coperta
+SONIC_RATIO = 1.89  # rapporto di pressione oltre il quale il flusso d'aria è sonico (come nel kernel)
+RHO_AIR_EXIT = 1.225  # kg/m³ a pressione ambiente, come nel kernel
+
+
+def _subsonic(x):
+    """F(x) = x⋅v²/(R⋅T) per il tratto subsonico (1 < x ≤ SONIC_RATIO)"""
+    return x * 2 * GAMMA / (GAMMA - 1) * np.maximum(1 - (1 / x)**((GAMMA - 1) / GAMMA), 0)
+
+
+class SurrogateTable:
+    """Curve normalizzate precalcolate per n_water e n_air campioni per fase"""
+
+    def __init__(self, n_water=N_WATER_SAMPLES, n_air=N_AIR_SAMPLES, n_ratio=N_RATIO):
+        self.n_water = n_water
+        self.n_air = n_air
+        self.n_ratio = n_ratio
+        self._build()
+
+    def _model_signature(self):
+        return np.array([SURROGATE_VERSION, self.n_water, self.n_air, self.n_ratio, GAMMA, P_ATM, RHO_WATER,
+                         AIR_TIME_ESTIMATE, MAX_PRESSURE, SONIC_RATIO, RHO_AIR_EXIT], dtype=float)
+
+    def _build(self):
+        s = np.linspace(0, 1, self.n_water)
+        self.ratios = np.linspace(*RATIO_LIMITS, self.n_ratio)
+        r = self.ratios[:, np.newaxis]
+        # Q(r, s) e somme cumulative sui campioni (P[:, k] = somma dei primi k)
+        self.q = ((1 - r) / (1 - r * (1 - s)))**GAMMA
+        self.prefix = np.concatenate([np.zeros((self.n_ratio, 1)), np.cumsum(self.q, axis=1)], axis=1)
+
+        # Fase aria: pressione relativa x = Π_aria⋅b(u), con b comune a tutte le curve
+        u = np.linspace(0, 1, self.n_air)
+        self.air_decay = (1 / (1 + 2 * u))**GAMMA
+        self.subsonic = _subsonic(np.linspace(1, SONIC_RATIO, N_SUBSONIC))
+        self._air_tables()
+
+    def _air_tables(self):
+        """Somme cumulative di b(u) e somma dei campioni subsonici in funzione di Π_aria.
+
+        Nel tratto subsonico F ha un salto in SONIC_RATIO: si tabula la parte
+        continua G(x) = F(x) - F(SONIC_RATIO)⋅(x - 1)/(SONIC_RATIO - 1), nulla
+        ai due estremi, mentre la parte lineare si somma esattamente.
+        """
+        self.air_prefix = np.concatenate([[0.0], np.cumsum(self.air_decay)])
+        self.air_ratios = np.linspace(0, MAX_PRESSURE + 1, N_AIR_RATIO)
+        x = self.air_ratios[:, np.newaxis] * self.air_decay
+        band = (x > 1) & (x <= SONIC_RATIO)
+        linear = self.subsonic[-1] * (x - 1) / (SONIC_RATIO - 1)
+        self.air_subsonic = np.where(band, _subsonic(np.maximum(x, 1.0)) - linear, 0.0).sum(axis=1)
+
+    def _air_thrust(self, x):
+        """F(x) dalla tabella subsonica e dalla forma lineare del tratto sonico"""
+        position = np.clip((x - 1) / (SONIC_RATIO - 1) * (N_SUBSONIC - 1), 0, N_SUBSONIC - 1)
+        index = np.minimum(position.astype(int), N_SUBSONIC - 2)
+        weight = position - index
+        subsonic = self.subsonic[index] * (1 - weight) + self.subsonic[index + 1] * weight
+        return np.where(x > SONIC_RATIO, GAMMA * x, np.where(x > 1, subsonic, 0.0))
+
+    def save(self, path):
+        """Salva la tabella in formato .npz"""
+        np.savez(path, signature=self._model_signature(), q=self.q, prefix=self.prefix,
+                 subsonic=self.subsonic, air_subsonic=self.air_subsonic)
+
+    @classmethod
+    def load(cls, path, n_water=N_WATER_SAMPLES, n_air=N_AIR_SAMPLES, n_ratio=N_RATIO):
+        """Carica una tabella salvata; se manca o è di un'altra versione la ricostruisce e la salva"""
+        table = cls.__new__(cls)
+        table.n_water, table.n_air, table.n_ratio = n_water, n_air, n_ratio
+        try:
+            with np.load(path) as data:
+                if not np.array_equal(data['signature'], table._model_signature()):
+                    raise ValueError("surrogate table built for another model version")
+                table.q, table.prefix = data['q'], data['prefix']
+                table.subsonic, table.air_subsonic = data['subsonic'], data['air_subsonic']
+        except (OSError, KeyError, ValueError):
+            table._build()
+            try:
+                table.save(path)
+            except OSError:
+                pass  # Directory in sola lettura: la tabella resta solo in memoria
+            return table
+        table.ratios = np.linspace(*RATIO_LIMITS, n_ratio)
+        table.air_decay = (1 / (1 + 2 * np.linspace(0, 1, n_air)))**GAMMA
+        table.air_prefix = np.concatenate([[0.0], np.cumsum(table.air_decay)])
+        table.air_ratios = np.linspace(0, MAX_PRESSURE + 1, N_AIR_RATIO)
+        return table
+
+    def _groups(self, bottle_volume, water_ratio, pressure, nozzle_diameter, coefficients):
+        """Gruppi adimensionali e fattori di scala di un blocco di configurazioni"""
+        coefficients = model_coefficients(coefficients)
+        params = np.broadcast_arrays(*(np.atleast_1d(np.asarray(p, dtype=float)).ravel()
+                                       for p in (bottle_volume, water_ratio, pressure, nozzle_diameter,
+                                                 coefficients['cd'], coefficients['air_efficiency'],
+                                                 coefficients['gas_rt'])))
+        bottle_volume, water_ratio, pressure, nozzle_diameter, cd, air_efficiency, gas_rt = params
+        r = water_ratio / 100
+        if np.any((r < RATIO_LIMITS[0]) | (r > RATIO_LIMITS[1]) | (pressure <= 0) | (pressure > MAX_PRESSURE)):
+            raise ValueError("Configuration outside the surrogate table domain")
+        ratio = (pressure * 1e5 + P_ATM) / P_ATM
+        nozzle_area = np.pi * (nozzle_diameter / 2000)**2
+        water_time = 0.5 * bottle_volume * r / (cd * nozzle_area * np.sqrt(2 * RHO_WATER * P_ATM * (ratio - 1)))
+
+        # Interpolazione lineare tra le righe della tabella più vicine
+        position = (r - RATIO_LIMITS[0]) / (RATIO_LIMITS[1] - RATIO_LIMITS[0]) * (self.n_ratio - 1)
+        row = np.minimum(position.astype(int), self.n_ratio - 2)
+        weight = position - row
+        return {
+            'ratio': ratio,
+            'air_ratio': ratio * (1 - r)**GAMMA,
+            'water_time': water_time,  # s
+            'water_scale': 2 * cd**2 * nozzle_area * P_ATM,  # N
+            'air_scale': cd * nozzle_area * RHO_AIR_EXIT * gas_rt * air_efficiency,  # N
+            'r': r,
+            'row': row,
+            'weight': weight,
+        }
+
+    def curves(self, bottle_volume, water_ratio, pressure, nozzle_diameter, include_air_phase=False,
+               coefficients=None):
+        """Curve come thrust_curve_batch (ms, N, fine fase acqua in ms), senza integrazione"""
+        g = self._groups(bottle_volume, water_ratio, pressure, nozzle_diameter, coefficients)
+        weight = g['weight'][:, np.newaxis]
+        q = self.q[g['row']] * (1 - weight) + self.q[g['row'] + 1] * weight
+        thrust = np.maximum(g['ratio'][:, np.newaxis] * q - 1, 0) * g['water_scale'][:, np.newaxis]
+        thrust[:, -1] = 0.0  # Acqua esaurita
+        water_time = g['water_time'][:, np.newaxis]
+        t = np.linspace(0, 1, self.n_water) * water_time
+        if not include_air_phase:
+            return t * 1000, thrust, water_time[:, 0] * 1000
+
+        x = g['air_ratio'][:, np.newaxis] * self.air_decay
+        thrust_air = self._air_thrust(x) * g['air_scale'][:, np.newaxis]
+        t_air = np.linspace(0, AIR_TIME_ESTIMATE, self.n_air) + water_time
+        return (np.concatenate([t, t_air], axis=1) * 1000, np.concatenate([thrust, thrust_air], axis=1),
+                water_time[:, 0] * 1000)
+
+    def metrics(self, bottle_volume, water_ratio, pressure, nozzle_diameter, include_air_phase=False,
+                coefficients=None):
+        """Grandezze come curve_metrics, con un numero costante di operazioni per configurazione"""
+        g = self._groups(bottle_volume, water_ratio, pressure, nozzle_diameter, coefficients)
+        n = self.n_water
+        r, ratio = g['r'], g['ratio']
+
+        # Campioni con spinta positiva: Q(s) decresce, Π⋅Q = 1 in s* (forma chiusa)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            crossing = 1 - (1 - (1 - r) * ratio**(1 / GAMMA)) / r
+        positive = np.clip(np.ceil(np.nan_to_num(crossing, nan=1.0, posinf=1.0) * (n - 1)), 1, n - 1).astype(int)
+        row, weight = g['row'], g['weight']
+        prefix = self.prefix[row, positive] * (1 - weight) + self.prefix[row + 1, positive] * weight
+        step = g['water_time'] / (n - 1)
+        water_impulse = g['water_scale'] * step * (ratio * prefix - positive - 0.5 * (ratio - 1))
+        peak = g['water_scale'] * (ratio - 1)
+        burn_time = positive * step
+
+        if include_air_phase:
+            air_ratio = g['air_ratio']
+            # Campioni sonici (x > SONIC_RATIO) e con pressione sopra quella ambiente (x > 1)
+            with np.errstate(divide='ignore'):
+                sonic = np.searchsorted(-self.air_decay, -SONIC_RATIO / air_ratio, side='left')
+                burning = np.searchsorted(-self.air_decay, -1 / air_ratio, side='left')
+            subsonic_sum = self.air_prefix[burning] - self.air_prefix[sonic]
+            position = np.clip(air_ratio / self.air_ratios[-1] * (N_AIR_RATIO - 1), 0, N_AIR_RATIO - 1)
+            index = np.minimum(position.astype(int), N_AIR_RATIO - 2)
+            fraction = position - index
+            total = (GAMMA * air_ratio * self.air_prefix[sonic]
+                     + self.air_subsonic[index] * (1 - fraction) + self.air_subsonic[index + 1] * fraction
+                     + self.subsonic[-1] / (SONIC_RATIO - 1) * (air_ratio * subsonic_sum - (burning - sonic)))
+            first = self._air_thrust(air_ratio)
+            last = self._air_thrust(air_ratio * self.air_decay[-1])
+            air_step = AIR_TIME_ESTIMATE / (self.n_air - 1)
+            air_impulse = g['air_scale'] * air_step * (total - 0.5 * (first + last))
+            peak = np.maximum(peak, g['air_scale'] * first)
+            # Fine della fase aria: primo campione con pressione non superiore a quella ambiente
+            burn_time = np.where(burning > 0, g['water_time'] + np.minimum(burning, self.n_air - 1) * air_step,
+                                 burn_time)
+        else:
+            air_impulse = np.zeros_like(water_impulse)
+
+        return {
+            'total_impulse': water_impulse + air_impulse,
+            'water_impulse': water_impulse,
+            'air_impulse': air_impulse,
+            'burn_time': burn_time,
+            'peak_thrust': peak,
+        }
+
+
+def check(table, n_samples=1000, include_air_phase=None, seed=0):
+    """Confronta la tabella con il kernel diretto su configurazioni casuali in PARAM_RANGES.
+
+    Restituisce un dizionario con lo scarto massimo delle curve (come
+    frazione del picco), gli scarti relativi massimi delle grandezze e i
+    tempi di calcolo. Con include_air_phase=None si verificano entrambe le
+    varianti.
+    """
+    rng = np.random.default_rng(seed)
+    columns = [rng.uniform(*PARAM_RANGES[name], n_samples)
+               for name in ('bottle_volume', 'water_ratio', 'pressure', 'nozzle_diameter')]
+    report = {}
+    for air in ((False, True) if include_air_phase is None else (include_air_phase,)):
+        prefix = 'air_' if air else 'water_'
+        start = time.perf_counter()
+        t, thrust, water_end = thrust_curve_batch(*columns, include_air_phase=air,
+                                                  n_water=table.n_water, n_air=table.n_air)
+        expected = curve_metrics(t, thrust, water_end)
+        report[prefix + 'kernel_s'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        t_s, thrust_s, _ = table.curves(*columns, include_air_phase=air)
+        report[prefix + 'curves_s'] = time.perf_counter() - start
+        start = time.perf_counter()
+        metrics = table.metrics(*columns, include_air_phase=air)
+        report[prefix + 'metrics_s'] = time.perf_counter() - start
+
+        peak = expected['peak_thrust'][:, np.newaxis]
+        report[prefix + 'curve_error'] = float(np.max(np.abs(thrust_s - thrust) / peak))
+        report[prefix + 'time_error'] = float(np.max(np.abs(t_s - t) / t[:, -1:]))
+        for name, values in expected.items():
+            # Impulsi riferiti all'impulso totale (quello della fase aria può essere nullo)
+            scale = expected['total_impulse'] if name.endswith('impulse') else np.maximum(np.abs(values), 1e-12)
+            report[prefix + name + '_error'] = float(np.max(np.abs(metrics[name] - values) / scale))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="WaRMS surrogate table")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="build and save the table")
+    build.add_argument('-o', '--output', default='warms_surrogate.npz')
+    verify = commands.add_parser('check', help="compare the table with the direct kernel")
+    verify.add_argument('table', nargs='?', help="saved table (default: build in memory)")
+    verify.add_argument('--samples', type=int, default=1000)
+    verify.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        SurrogateTable().save(args.output)
+        return 0
+    table = SurrogateTable.load(args.table) if args.table else SurrogateTable()
+    for name, value in check(table, args.samples, seed=args.seed).items():
+        print(f"{name:28s} {value:.3g}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,208 @@
+"""Esplorazione parametrica multiprocesso di WaRMS.
+
+Valuta la griglia cartesiana di pressione, rapporto acqua, diametro ugello
+e volume bottiglia suddividendola in blocchi distribuiti su un pool di
+processi. Il risultato è una tabella strutturata numpy con una riga per
+punto della griglia.
+
+Uso da riga di comando (intervalli nel formato inizio:fine:punti):
+
+    python warms_sweep.py --pressure 1:10:46 --water-ratio 10:90:81 -o sweep.csv
+    python warms_sweep.py --pressure 1:10:451 --water-ratio 10:90:801 --surrogate -o sweep.csv
+    python warms_sweep.py --air-phase --flight --bottle-mass 120 -o sweep.csv
+
+Con la tabella adimensionale (warms_surrogate) le grandezze si ricavano
+senza calcolare le curve, nel processo corrente. Con --flight la tabella
+comprende anche apogeo, velocità massima e tempo all'apogeo (warms_flight).
+
+Su Windows e macOS il pool usa 'spawn': richiamare sweep() da script
+protetti da ``if __name__ == '__main__'``.
+"""
+import argparse
+import csv
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from warms_core import PARAM_RANGES, RHO_WATER, MotorConfig, curve_metrics, impulse_classes, thrust_curve_batch
+from warms_flight import DRAG_COEFFICIENT, flight_metrics
+from warms_surrogate import SurrogateTable
+
+# Ordine dei parametri nella griglia e nella tabella dei risultati
+SWEEP_PARAMS = ('pressure', 'water_ratio', 'nozzle_diameter', 'bottle_volume')
+
+SWEEP_DTYPE = np.dtype([
+    ('pressure', 'f8'),  # bar
+    ('water_ratio', 'f8'),  # %
+    ('nozzle_diameter', 'f8'),  # mm
+    ('bottle_volume', 'f8'),  # L
+    ('total_impulse', 'f8'),  # N⋅s
+    ('water_impulse', 'f8'),  # N⋅s
+    ('air_impulse', 'f8'),  # N⋅s
+    ('burn_time', 'f8'),  # s
+    ('peak_thrust', 'f8'),  # N
+    ('impulse_class', 'U4'),
+])
+
+# Colonne aggiunte dalla simulazione del volo
+FLIGHT_DTYPE = np.dtype(SWEEP_DTYPE.descr + [
+    ('apogee', 'f8'),  # m
+    ('max_velocity', 'f8'),  # m/s
+    ('time_to_apogee', 'f8'),  # s
+])
+
+DEFAULT_CHUNK_SIZE = 2048
+
+
+def param_range(name, num):
+    """Valori equispaziati sull'intero intervallo dello slider del parametro"""
+    low, high = PARAM_RANGES[name]
+    return np.linspace(low, high, num)
+
+
+def evaluate_points(pressure, water_ratio, nozzle_diameter, bottle_volume, include_air_phase=False,
+                    surrogate=None, flight=None):
+    """Valuta un insieme di configurazioni e restituisce le righe della tabella.
+
+    flight, se indicato, è un dizionario con diameter (mm), bottle_mass (g)
+    e drag_coefficient del razzo: le righe comprendono allora il volo.
+    """
+    if flight is None and surrogate is not None:
+        metrics = surrogate.metrics(bottle_volume, water_ratio, pressure, nozzle_diameter, include_air_phase)
+    else:
+        if surrogate is not None:
+            curves = surrogate.curves(bottle_volume, water_ratio, pressure, nozzle_diameter, include_air_phase)
+        else:
+            curves = thrust_curve_batch(bottle_volume, water_ratio, pressure, nozzle_diameter, include_air_phase)
+        metrics = curve_metrics(*curves)
+        if flight is not None:
+            water_mass = np.asarray(bottle_volume) * np.asarray(water_ratio) / 100 * RHO_WATER / 1000
+            result = flight_metrics(*curves, water_mass, flight['bottle_mass'] / 1000, flight['diameter'],
+                                    flight['drag_coefficient'])
+            metrics.update((name, result[name]) for name in ('apogee', 'max_velocity', 'time_to_apogee'))
+
+    rows = np.empty(len(metrics['total_impulse']), dtype=SWEEP_DTYPE if flight is None else FLIGHT_DTYPE)
+    for name, values in zip(SWEEP_PARAMS, np.broadcast_arrays(pressure, water_ratio,
+                                                               nozzle_diameter, bottle_volume)):
+        rows[name] = values
+    for name, values in metrics.items():
+        rows[name] = values
+    rows['impulse_class'] = impulse_classes(metrics['total_impulse'])
+    return rows
+
+
+def _evaluate_chunk(args):
+    """Punto d'ingresso dei processi del pool (deve essere a livello di modulo)"""
+    columns, include_air_phase, flight = args
+    return evaluate_points(*columns, include_air_phase=include_air_phase, flight=flight)
+
+
+def sweep(pressure, water_ratio, nozzle_diameter, bottle_volume, include_air_phase=False,
+          workers=None, chunk_size=DEFAULT_CHUNK_SIZE, surrogate=None, flight=None):
+    """Valuta la griglia cartesiana dei quattro parametri operativi.
+
+    Ogni parametro può essere uno scalare o una sequenza di valori in unità
+    metriche (bar, %, mm, L). La griglia viene divisa in blocchi di
+    chunk_size punti distribuiti su workers processi (di default uno per
+    CPU; con workers=1 il calcolo avviene nel processo corrente).
+    Restituisce un array strutturato SWEEP_DTYPE nell'ordine della griglia,
+    con la pressione che varia più lentamente. Con surrogate (una
+    SurrogateTable) le grandezze vengono ricavate dalla tabella, in blocchi
+    nel processo corrente. Con flight (vedi evaluate_points) il risultato è
+    un array FLIGHT_DTYPE con il volo di ogni punto.
+    """
+    axes = [np.atleast_1d(np.asarray(values, dtype=float)).ravel()
+            for values in (pressure, water_ratio, nozzle_diameter, bottle_volume)]
+    grid = [g.ravel() for g in np.meshgrid(*axes, indexing='ij')]
+    total = grid[0].size
+
+    chunks = [(tuple(column[start:start + chunk_size] for column in grid), include_air_phase, flight)
+              for start in range(0, total, chunk_size)]
+    dtype = SWEEP_DTYPE if flight is None else FLIGHT_DTYPE
+
+    if surrogate is not None:
+        parts = [evaluate_points(*columns, include_air_phase=air, surrogate=surrogate, flight=flight)
+                 for columns, air, _ in chunks]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(chunks))
+
+    if workers <= 1:
+        parts = [_evaluate_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_evaluate_chunk, chunks))
+
+    return np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+
+
+def write_csv(results, file):
+    """Scrive la tabella dei risultati in formato CSV"""
+    writer = csv.writer(file)
+    writer.writerow(results.dtype.names)
+    for row in results.tolist():
+        writer.writerow(row)
+
+
+def _parse_range(name):
+    """Converte 'inizio:fine:punti' o un singolo valore in un array di valori"""
+    def parse(text):
+        parts = text.split(':')
+        if len(parts) == 1:
+            return np.array([float(parts[0])])
+        if len(parts) == 3:
+            return np.linspace(float(parts[0]), float(parts[1]), int(parts[2]))
+        raise argparse.ArgumentTypeError(f"{name}: expected VALUE or START:STOP:NUM, got '{text}'")
+    return parse
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="WaRMS parameter sweep")
+    defaults = {'pressure': 10, 'water_ratio': 9, 'nozzle_diameter': 9, 'bottle_volume': 10}
+    for name in SWEEP_PARAMS:
+        low, high = PARAM_RANGES[name]
+        parser.add_argument('--' + name.replace('_', '-'), dest=name, type=_parse_range(name),
+                            default=param_range(name, defaults[name]),
+                            help=f"VALUE or START:STOP:NUM (default {low:g}:{high:g}:{defaults[name]})")
+    parser.add_argument('--air-phase', action='store_true', help="include the air phase")
+    parser.add_argument('--workers', type=int, default=None, help="number of processes")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--surrogate', nargs='?', const='', metavar='TABLE',
+                        help="use the precomputed surrogate table (saved in TABLE, if given)")
+    parser.add_argument('--flight', action='store_true', help="add apogee, max velocity and time to apogee")
+    parser.add_argument('--diameter', type=float, default=MotorConfig.diameter, help="bottle diameter (mm)")
+    parser.add_argument('--bottle-mass', type=float, default=MotorConfig.bottle_mass, help="empty mass (g)")
+    parser.add_argument('--drag-coefficient', type=float, default=DRAG_COEFFICIENT)
+    parser.add_argument('-o', '--output', help="CSV output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    surrogate = None
+    if args.surrogate is not None:
+        surrogate = SurrogateTable.load(args.surrogate) if args.surrogate else SurrogateTable()
+    flight = None
+    if args.flight:
+        flight = {'diameter': args.diameter, 'bottle_mass': args.bottle_mass,
+                  'drag_coefficient': args.drag_coefficient}
+    results = sweep(args.pressure, args.water_ratio, args.nozzle_diameter, args.bottle_volume,
+                    include_air_phase=args.air_phase, workers=args.workers, chunk_size=args.chunk_size,
+                    surrogate=surrogate, flight=flight)
+
+    if args.output:
+        with open(args.output, 'w', newline='') as f:
+            write_csv(results, f)
+    else:
+        try:
+            write_csv(results, sys.stdout)
+            sys.stdout.flush()
+        except BrokenPipeError:
+            # Uscita chiusa in anticipo (ad esempio da head): si termina senza traceback,
+            # anche alla chiusura di stdout all'uscita dell'interprete
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+
+
+if __name__ == '__main__':
+    main()
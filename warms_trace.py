@@ -0,0 +1,180 @@
+"""Misura dei tempi delle operazioni dell'interfaccia, per fasi.
+
+Un'operazione (ad esempio il calcolo di una curva) raccoglie gli intervalli
+di tempo delle sue fasi, anche quando si svolgono su thread diversi: il
+thread che lavora per l'operazione la attiva con activate(), e la funzione
+span() registra le fasi nell'operazione attiva del thread corrente. Senza
+un'operazione attiva span() non fa nulla, così i moduli di calcolo possono
+essere strumentati senza costi apprezzabili quando sono usati da script. Una
+fase misurata costa pochi microsecondi: la misura può restare sempre attiva.
+
+Le fasi e le operazioni concluse restano in un buffer circolare ed esportate
+nel formato JSON Trace Event, che si apre con chrome://tracing o Perfetto.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+TRACE_CAPACITY = 100_000  # intervalli conservati (i più vecchi vengono scartati)
+
+_local = threading.local()
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('operation', 'name', 'start')
+
+    def __init__(self, operation, name):
+        self.operation = operation
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.operation.add(self.name, self.start, time.perf_counter_ns())
+        return False
+
+
+class _Activation:
+    __slots__ = ('operation', 'previous')
+
+    def __init__(self, operation):
+        self.operation = operation
+
+    def __enter__(self):
+        self.previous = getattr(_local, 'operation', None)
+        _local.operation = self.operation
+        return self.operation
+
+    def __exit__(self, *exc):
+        _local.operation = self.previous
+        return False
+
+
+def span(name):
+    """Misura una fase dell'operazione attiva nel thread corrente (nulla se non ce n'è una)"""
+    operation = getattr(_local, 'operation', None)
+    if operation is None:
+        return _NULL_SPAN
+    return _Span(operation, name)
+
+
+class Operation:
+    """Un'operazione con i tempi delle sue fasi.
+
+    Usata come context manager viene attivata nel thread corrente e
+    conclusa all'uscita; per le operazioni che proseguono in background si
+    usano activate() nei singoli thread e finish() alla fine.
+    """
+
+    def __init__(self, tracer, name, start=None):
+        self.tracer = tracer
+        self.name = name
+        self.start = time.perf_counter_ns() if start is None else start
+        self.end = None
+        self.stages = {}  # nome della fase -> durata complessiva in ns, in ordine di comparsa
+
+    @property
+    def duration(self):
+        """Durata in secondi (fino a ora se l'operazione è ancora in corso)"""
+        end = self.end if self.end is not None else time.perf_counter_ns()
+        return (end - self.start) / 1e9
+
+    def span(self, name):
+        return _Span(self, name)
+
+    def activate(self):
+        """Rende l'operazione quella attiva del thread corrente, per la durata del blocco with"""
+        return _Activation(self)
+
+    def add(self, name, start, end):
+        self.stages[name] = self.stages.get(name, 0) + end - start
+        self.tracer.record(name, self.name, start, end)
+
+    def finish(self):
+        """Conclude l'operazione e la rende l'ultima del tracer"""
+        if self.end is None:
+            self.end = time.perf_counter_ns()
+            self.tracer.record(self.name, 'operation', self.start, self.end)
+            self.tracer.last = self
+        return self
+
+    def summary(self):
+        """Riepilogo su una riga: durata totale e tempo di ogni fase in ms"""
+        stages = ', '.join(f'{name} {duration / 1e6:.1f}' for name, duration in self.stages.items())
+        text = f'{self.name}: {self.duration * 1000:.1f} ms'
+        return f'{text} ({stages})' if stages else text
+
+    def __enter__(self):
+        self._activation = _Activation(self)
+        self._activation.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        self._activation.__exit__(*exc)
+        self.finish()
+        return False
+
+
+class Tracer:
+    """Buffer circolare delle fasi e delle operazioni misurate"""
+
+    def __init__(self, capacity=TRACE_CAPACITY, origin=None):
+        self.last = None  # ultima operazione conclusa
+        self._events = deque(maxlen=capacity)
+        self._threads = {}
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter_ns() if origin is None else origin
+
+    def __len__(self):
+        return len(self._events)
+
+    def operation(self, name, start=None):
+        """Inizia un'operazione (start: istante di inizio di time.perf_counter_ns, se già trascorso)"""
+        return Operation(self, name, start)
+
+    def record(self, name, category, start, end):
+        """Registra un intervallo (tempi di time.perf_counter_ns) nel thread corrente"""
+        thread = threading.current_thread()
+        with self._lock:
+            self._events.append((name, category, start, end, thread.ident))
+            if thread.ident not in self._threads:
+                self._threads[thread.ident] = thread.name
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+        self.last = None
+
+    def trace_events(self):
+        """Documento JSON Trace Event ("ph": "X", tempi in µs dall'origine del tracer)"""
+        with self._lock:
+            events, threads = list(self._events), dict(self._threads)
+        pid = os.getpid()
+        trace = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                 for tid, name in threads.items()]
+        trace.extend({'name': name, 'cat': category, 'ph': 'X', 'pid': pid, 'tid': tid,
+                      'ts': (start - self._origin) / 1000, 'dur': (end - start) / 1000}
+                     for name, category, start, end, tid in events)
+        return {'traceEvents': trace, 'displayTimeUnit': 'ms'}
+
+    def save(self, path):
+        """Salva la traccia in formato JSON Trace Event"""
+        with open(path, 'w') as f:
+            json.dump(self.trace_events(), f)
@@ -0,0 +1,120 @@
+"""Esecuzione dei calcoli in background per l'interfaccia grafica.
+
+I job girano su un pool di thread, lontano dal thread di Tk. Avanzamento,
+risultati ed errori vengono accodati e consegnati alle callback solo da
+poll(), che l'interfaccia richiama periodicamente con root.after: così le
+callback possono aggiornare i widget in sicurezza. Il modulo non importa
+tkinter e può essere usato anche senza interfaccia.
+"""
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobCancelled(Exception):
+    """Sollevata all'interno di un job quando è stato annullato"""
+
+
+class Job:
+    """Un calcolo in background, con avanzamento e annullamento cooperativo.
+
+    La funzione del job riceve il Job come primo argomento e può chiamare
+    report() per segnalare l'avanzamento (0-1) o check_cancelled() nei punti
+    in cui può interrompersi; entrambi sollevano JobCancelled dopo cancel().
+    """
+
+    def __init__(self, worker, on_done=None, on_error=None, on_progress=None, on_cancel=None):
+        self.progress = 0.0
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.on_cancel = on_cancel
+        self._worker = worker
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        """Richiede l'interruzione del job (i job in attesa terminano appena avviati)"""
+        self._cancel_event.set()
+
+    def check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    def report(self, fraction):
+        """Segnala l'avanzamento del job (frazione tra 0 e 1)"""
+        self.check_cancelled()
+        self._worker._events.put((self, 'progress', fraction))
+
+
+class BackgroundWorker:
+    """Pool di thread per i job, con consegna degli eventi tramite poll()"""
+
+    def __init__(self, max_workers=1):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='warms-worker')
+        self._events = queue.Queue()
+        self._jobs = set()
+
+    @property
+    def busy(self):
+        """True se ci sono job in corso o eventi non ancora consegnati"""
+        return bool(self._jobs)
+
+    @property
+    def progress(self):
+        """Avanzamento medio dei job in corso"""
+        if not self._jobs:
+            return 0.0
+        return sum(job.progress for job in self._jobs) / len(self._jobs)
+
+    def submit(self, function, *args, on_done=None, on_error=None, on_progress=None, on_cancel=None, **kwargs):
+        """Avvia function(job, *args, **kwargs) in background e restituisce il Job"""
+        job = Job(self, on_done, on_error, on_progress, on_cancel)
+        self._jobs.add(job)
+        self._executor.submit(self._run, job, function, args, kwargs)
+        return job
+
+    def _run(self, job, function, args, kwargs):
+        try:
+            job.check_cancelled()
+            result = function(job, *args, **kwargs)
+        except JobCancelled:
+            self._events.put((job, 'cancelled', None))
+        except Exception as error:
+            self._events.put((job, 'error', error))
+        else:
+            self._events.put((job, 'done', result))
+
+    def poll(self):
+        """Consegna gli eventi accodati alle callback; va chiamato dal thread dell'interfaccia"""
+        while True:
+            try:
+                job, kind, value = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'progress':
+                job.progress = value
+                if job.on_progress:
+                    job.on_progress(value)
+                continue
+
+            self._jobs.discard(job)
+            if kind == 'done' and job.on_done:
+                job.on_done(value)
+            elif kind == 'error' and job.on_error:
+                job.on_error(value)
+            elif kind == 'cancelled' and job.on_cancel:
+                job.on_cancel()
+        return self.busy
+
+    def cancel_all(self):
+        """Annulla tutti i job in corso o in attesa"""
+        for job in list(self._jobs):
+            job.cancel()
+
+    def shutdown(self, wait=False):
+        self.cancel_all()
+        self._executor.shutdown(wait=wait)